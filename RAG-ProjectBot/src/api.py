@@ -2,11 +2,21 @@
 
 import os
 import sys
+import time
+import uuid
+import asyncio
+import json
+import hashlib
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import asynccontextmanager
 from pathlib import Path
-from fastapi import FastAPI, HTTPException, UploadFile, File
+from fastapi import FastAPI, HTTPException, UploadFile, File, Query, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import List
+from typing import Iterator, List, Optional, Tuple
 
 # Add current directory to path
 script_dir = Path(__file__).parent.absolute()
@@ -20,13 +30,34 @@ if venv_path.exists():
 # Change to script directory
 os.chdir(script_dir)
 
-from langchain_community.vectorstores import Chroma
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_community.chat_models import ChatOllama
-from query_data import PROMPT_TEMPLATE, CHROMA_PATH
+from chat_session import ChatSession, SessionStore
+from llm_backend import get_llm_backend
+from model_router import ModelRouter, routed_answer
+from vector_store import open_vector_store
+from index_versions import current_version
+from index_writer import get_index_writer
+from document_catalog import DocumentCatalog, page_count, SORTABLE_COLUMNS, STATUS_PROCESSED, STATUS_PROCESSING, STATUS_FAILED
+from parent_retrieval import ParentDocstore, CHILD_K
+
+# Event-loop lag: how late a periodic wake-up fires, i.e. how long blocking work held the loop
+LOOP_LAG_INTERVAL = 0.1
+loop_lag_samples = deque(maxlen=36000)
+
+async def monitor_event_loop_lag():
+    loop = asyncio.get_running_loop()
+    while True:
+        start = loop.time()
+        await asyncio.sleep(LOOP_LAG_INTERVAL)
+        loop_lag_samples.append(max(loop.time() - start - LOOP_LAG_INTERVAL, 0.0))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    monitor = asyncio.create_task(monitor_event_loop_lag())
+    yield
+    monitor.cancel()
 
 # Initialize FastAPI app
-app = FastAPI(title="RAG Chatbot API", description="API for querying documents using RAG")
+app = FastAPI(title="RAG Chatbot API", description="API for querying documents using RAG", lifespan=lifespan)
 
 # Enable CORS
 app.add_middleware(
@@ -35,34 +66,62 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Total-Count"],  # Total for /files pagination
 )
 
 # File upload settings
 UPLOAD_DIR = Path("data/books")
 UPLOAD_DIR.mkdir(exist_ok=True)
+UPLOAD_CHUNK_SIZE = 1024 * 1024  # 1MB per read while streaming uploads to disk
+MAX_UPLOAD_BYTES = int(os.environ.get("MAX_UPLOAD_MB", "200")) * 1024 * 1024
+
+MAX_BATCH_QUESTIONS = int(os.environ.get("MAX_BATCH_QUESTIONS", "1000"))
+
+# Document catalog: hashes, sizes and ingestion status for everything in UPLOAD_DIR
+catalog = DocumentCatalog()
+catalog.sync_directory(UPLOAD_DIR)
 
 # Initialize RAG components
 db = None
-model = ChatOllama(model="llama3.2:3b")
+loaded_version = None
+docstore = None
+_reload_lock = threading.Lock()
+RETIRED_STORE_GRACE_SECONDS = 60  # Queries still running on a replaced version finish before it is closed
+sessions = SessionStore()  # Chat sessions keep their Ollama context between turns
+router = ModelRouter()  # Picks no-LLM, small or large model per question
 
 # Table extraction is handled by EnhancedDocumentLoader
 print("✅ Table extraction using Tesseract + Tabula/Camelot")
 
 def initialize_db():
-    global db
+    global db, docstore, loaded_version
+    previous = db
     try:
-        if os.path.exists(CHROMA_PATH):
-            # Use local model path to avoid network requests
-            model_path = os.path.expanduser("~/.cache/huggingface/hub/models--sentence-transformers--all-MiniLM-L6-v2/snapshots/c9745ed1d9f207416be6d2e6f8de32d1f16199bf")
-            embedding_function = HuggingFaceEmbeddings(model_name=model_path)
-            db = Chroma(persist_directory=CHROMA_PATH, embedding_function=embedding_function)
-            print("✅ ChromaDB initialized successfully")
+        loaded_version = current_version()
+        store = open_vector_store()
+        docstore = ParentDocstore()
+        if store.exists():
+            db = store
+            print(f"✅ Vector store initialized successfully ({type(store).__name__}, version {loaded_version or 'unversioned'})")
         else:
-            print("⚠️ ChromaDB database not found")
+            print("⚠️ Vector store not found")
             db = None
     except Exception as e:
-        print(f"❌ ChromaDB initialization failed: {e}")
+        print(f"❌ Vector store initialization failed: {e}")
         db = None
+    if previous is not None and (db is None or previous.path != db.path):
+        # The old version's client would otherwise stay loaded, holding handles to directories prune() removes
+        closer = threading.Timer(RETIRED_STORE_GRACE_SECONDS, previous.close)
+        closer.daemon = True
+        closer.start()
+
+def refresh_db():
+    """Hot-reload onto the live index version when the pointer has moved; one request thread reloads"""
+    if db is not None and current_version() == loaded_version:
+        return
+    with _reload_lock:
+        if db is None or current_version() != loaded_version:
+            initialize_db()
 
 # Initialize database
 initialize_db()
@@ -70,73 +129,162 @@ initialize_db()
 # Request model
 class QueryRequest(BaseModel):
     question: str
+    session_id: Optional[str] = None  # Reuse the conversation's Ollama context for follow-up questions
 
 # Response model
 class QueryResponse(BaseModel):
     response: str
+    session_id: Optional[str] = None
+    prefill_tokens_saved: Optional[int] = None
+
+# Batch request model
+class BatchQueryRequest(BaseModel):
+    questions: List[str]
 
 # File response model
 class FileResponse(BaseModel):
     filename: str
     size: int
     uploaded_at: float
+    status: str = "pending"
+    page_count: Optional[int] = None
+    chunk_count: Optional[int] = None
+    extraction_seconds: Optional[float] = None
+    embedding_seconds: Optional[float] = None
 
-def get_rag_response(question: str) -> str:
-    """Get RAG response for a given question"""
+def answer_from_results(question: str, results, session: Optional[ChatSession] = None) -> str:
+    """Generate an answer from retrieved chunks, continuing the session's conversation when given"""
+    if not results:
+        return "I'm sorry, I don't have relevant information to answer that question."
+    
+    # Route by retrieval confidence and question type; the large model gets parent sections as context
+    try:
+        response, _ = routed_answer(question, results, docstore, session or ChatSession(), router)
+        return response
+    
+    except Exception as e:
+        print(f"Error generating response: {e}")
+        return f"Error generating response: {str(e)}"
+
+def get_rag_response(question: str, session: Optional[ChatSession] = None) -> str:
+    """Get RAG response for a given question, continuing the session's conversation when given"""
     try:
         if db is None:
             return "Database is not available. Please try again later."
         
         # Search the database with proper error handling
         try:
-            results = db.similarity_search_with_relevance_scores(question, k=5)
+            results = db.similarity_search_with_relevance_scores(question, k=CHILD_K)
         except Exception as search_error:
             print(f"Search error: {search_error}")
             return f"Error searching database: {str(search_error)}"
         
-        if not results:
-            return "I'm sorry, I don't have relevant information to answer that question."
-        
-        # Prepare context
-        try:
-            context = "\n\n".join([doc.page_content for doc, _ in results])
-            prompt = PROMPT_TEMPLATE.format(context=context, question=question)
-            
-            response = model.predict(prompt)
-            return response
-        
-        except Exception as e:
-            print(f"Error generating response: {e}")
-            return f"Error generating response: {str(e)}"
+        return answer_from_results(question, results, session)
             
     except Exception as e:
         print(f"Error in get_rag_response: {e}")
         return f"Error processing question: {str(e)}"
 
+def get_rag_responses_batch(questions: List[str]) -> Iterator[Tuple[int, str]]:
+    """Answer many questions at once: one batched embedding pass and multi-query search, then generations run
+    concurrently up to the LLM backend's capacity. Yields (index, response) in completion order."""
+    if db is None:
+        for index in range(len(questions)):
+            yield index, "Database is not available. Please try again later."
+        return
+    
+    try:
+        all_results = db.batch_similarity_search_with_relevance_scores(questions, k=CHILD_K)
+    except Exception as search_error:
+        print(f"Batch search error: {search_error}")
+        for index in range(len(questions)):
+            yield index, f"Error searching database: {str(search_error)}"
+        return
+    
+    with ThreadPoolExecutor(max_workers=get_llm_backend().capacity) as pool:
+        futures = {pool.submit(answer_from_results, question, results): index
+                   for index, (question, results) in enumerate(zip(questions, all_results))}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+
 @app.post("/query", response_model=QueryResponse)
-async def query_endpoint(request: QueryRequest):
-    """Query endpoint for RAG chatbot"""
+def query_endpoint(request: QueryRequest):
+    """Query endpoint for RAG chatbot; a plain def so FastAPI runs the blocking retrieval and generation
+    in its threadpool and several queries per worker can wait on the LLM backend at once"""
     try:
-        # Reinitialize database if needed
+        # Pick up a newly promoted index version, or a first build that finished since startup.
+        # Rebuilds never run on the request path.
+        refresh_db()
         if db is None:
-            initialize_db()
-            # If still None, try to recreate database from existing files
-            if db is None:
-                try:
-                    from create_database import load_documents, split_text, save_to_chroma
-                    print("🔄 Recreating database from existing files...")
-                    documents = load_documents()
-                    chunks = split_text(documents)
-                    save_to_chroma(chunks)
-                    initialize_db()  # Try to initialize again
-                except Exception as e:
-                    return QueryResponse(response=f"Database unavailable: {str(e)}")
+            return QueryResponse(response="Database is not available yet. Please run create_database.py or upload a document.")
         
-        response = get_rag_response(request.question)
-        return QueryResponse(response=response)
+        session = sessions.get(request.session_id) if request.session_id else None
+        response = get_rag_response(request.question, session)
+        if session is None:
+            return QueryResponse(response=response)
+        return QueryResponse(response=response, session_id=session.id,
+                             prefill_tokens_saved=session.prefill_tokens_saved)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/query/batch")
+async def query_batch_endpoint(request: BatchQueryRequest):
+    """Answer many questions in one request; streams one JSON line per answer as each finishes"""
+    if not request.questions:
+        raise HTTPException(status_code=400, detail="questions must not be empty")
+    if len(request.questions) > MAX_BATCH_QUESTIONS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_QUESTIONS} questions per batch")
+    refresh_db()
+    if db is None:
+        raise HTTPException(status_code=503, detail="Database is not available yet. Please run create_database.py or upload a document.")
+    
+    def answer_lines():
+        for index, response in get_rag_responses_batch(request.questions):
+            yield json.dumps({"index": index, "question": request.questions[index], "response": response}) + "\n"
+    
+    return StreamingResponse(answer_lines(), media_type="application/x-ndjson")
+
+def name_taken(file_path: Path) -> bool:
+    """An existing file blocks its name unless the catalog shows its processing failed"""
+    if not file_path.exists():
+        return False
+    record = catalog.get(file_path.name)
+    return record is None or record["status"] != STATUS_FAILED
+
+
+async def stream_upload_to_disk(file: UploadFile, file_path: Path) -> Tuple[str, int]:
+    """Stream an upload to a temp file while hashing it, then atomically rename it into place"""
+    temp_path = file_path.with_name(f".{file_path.name}.{uuid.uuid4().hex}.part")
+    sha256 = hashlib.sha256()
+    size = 0
+    try:
+        with open(temp_path, "wb") as buffer:
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > MAX_UPLOAD_BYTES:
+                    raise HTTPException(status_code=413, detail=f"File exceeds the {MAX_UPLOAD_BYTES // (1024 * 1024)}MB upload limit")
+                sha256.update(chunk)
+                buffer.write(chunk)
+        
+        content_hash = sha256.hexdigest()
+        # Failed, pending or deleted copies do not block a re-submission; it is simply processed again
+        duplicate = catalog.find_by_hash(content_hash, statuses=(STATUS_PROCESSED, STATUS_PROCESSING), directory=UPLOAD_DIR)
+        if duplicate:
+            raise HTTPException(status_code=409, detail=f"Identical file already uploaded as {duplicate['filename']}")
+        
+        if name_taken(file_path):
+            raise HTTPException(status_code=409, detail="File already exists")
+        os.replace(temp_path, file_path)
+        catalog.register(file_path, sha256=content_hash, size=size)
+        catalog.mark_pending(file_path.name)
+        return content_hash, size
+    finally:
+        if temp_path.exists():
+            temp_path.unlink()
+
 @app.post("/upload")
 async def upload_file(file: UploadFile = File(...)):
     """Upload a file to the data/books directory"""
@@ -150,18 +298,17 @@ async def upload_file(file: UploadFile = File(...)):
         file_path = UPLOAD_DIR / safe_filename
         
         # Check if file already exists
-        if file_path.exists():
+        if name_taken(file_path):
             raise HTTPException(status_code=409, detail="File already exists")
         
-        # Save the file
-        with open(file_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
+        # Stream the file to disk
+        content_hash, size = await stream_upload_to_disk(file, file_path)
         
         return {
             "message": "File uploaded successfully",
             "filename": safe_filename,
-            "size": len(content)
+            "size": size,
+            "sha256": content_hash
         }
         
     except HTTPException:
@@ -182,26 +329,34 @@ async def process_document_with_tables(file: UploadFile = File(...)):
         file_path = UPLOAD_DIR / safe_filename
         
         # Check if file already exists
-        if file_path.exists():
+        if name_taken(file_path):
             raise HTTPException(status_code=409, detail="File already exists")
         
-        # Save the file
-        with open(file_path, "wb") as buffer:
-            content = await file.read()
-            buffer.write(content)
+        # Stream the file to disk
+        content_hash, size = await stream_upload_to_disk(file, file_path)
         
         # Process the document with table extraction
         try:
             from enhanced_document_loader import EnhancedDocumentLoader
+            from create_database import split_text, deduplicate
+            catalog.mark_processing(safe_filename)
+            
             # Initialize document loader
             loader = EnhancedDocumentLoader()
+            start = time.perf_counter()
             documents = loader.load_document_with_tables(str(file_path))
+            extraction_seconds = time.perf_counter() - start
             
             # Split documents into chunks
-            chunks = split_text(documents)
+            chunks = deduplicate(split_text(documents))
             
-            # Save to database
-            save_to_chroma(chunks)
+            # Queue an upsert of this file's chunks; queries keep using the live version meanwhile
+            start = time.perf_counter()
+            await asyncio.wrap_future(get_index_writer().submit(chunks, documents, {str(file_path): loader.tables}))
+            embedding_seconds = time.perf_counter() - start
+            catalog.mark_processed(safe_filename, page_count=page_count(documents), document_count=len(documents),
+                                   chunk_count=len(chunks), extraction_seconds=extraction_seconds,
+                                   embedding_seconds=embedding_seconds)
             
             # Count different types of content
             text_count = sum(1 for doc in documents if doc.metadata.get('content_type') == 'text')
@@ -215,7 +370,8 @@ async def process_document_with_tables(file: UploadFile = File(...)):
             return {
                 "message": "Document processed successfully with enhanced extraction",
                 "filename": safe_filename,
-                "size": len(content),
+                "size": size,
+                "sha256": content_hash,
                 "total_documents": len(documents),
                 "text_extractions": text_count,
                 "native_tables": native_table_count,
@@ -228,10 +384,12 @@ async def process_document_with_tables(file: UploadFile = File(...)):
             
         except Exception as e:
             # If table extraction fails, still save the file
+            catalog.mark_failed(safe_filename, str(e))
             return {
                 "message": "File uploaded but table extraction failed",
                 "filename": safe_filename,
-                "size": len(content),
+                "size": size,
+                "sha256": content_hash,
                 "error": str(e)
             }
         
@@ -241,22 +399,23 @@ async def process_document_with_tables(file: UploadFile = File(...)):
         raise HTTPException(status_code=500, detail=f"Error processing file: {str(e)}")
 
 @app.get("/files", response_model=List[FileResponse])
-async def list_files():
-    """List all uploaded files"""
+async def list_files(
+    response: Response,
+    limit: int = Query(100, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    sort_by: str = Query("uploaded_at"),
+    order: str = Query("desc", pattern="^(asc|desc)$"),
+    status: Optional[str] = None,
+):
+    """List uploaded files from the document catalog (newest first by default)"""
+    if sort_by not in SORTABLE_COLUMNS:
+        raise HTTPException(status_code=400, detail=f"sort_by must be one of {SORTABLE_COLUMNS}")
     try:
-        files = []
-        for file_path in UPLOAD_DIR.glob("*.*"):
-            if file_path.suffix.lower() in ['.docx', '.pdf']:
-                stat = file_path.stat()
-                files.append(FileResponse(
-                    filename=file_path.name,
-                    size=stat.st_size,
-                    uploaded_at=file_path.stat().st_mtime
-                ))
-        
-        # Sort by upload time (newest first)
-        files.sort(key=lambda x: x.uploaded_at, reverse=True)
-        return files
+        documents, total = catalog.list_documents(limit=limit, offset=offset, sort_by=sort_by,
+                                                  descending=order == "desc", status=status)
+        response.headers["X-Total-Count"] = str(total)
+        return [FileResponse(**{field: doc[field] for field in FileResponse.model_fields if doc.get(field) is not None})
+                for doc in documents]
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error listing files: {str(e)}")
@@ -266,6 +425,17 @@ async def health_check():
     """Health check endpoint"""
     return {"status": "healthy", "message": "RAG Chatbot API is running"}
 
+@app.get("/metrics/loop-lag")
+async def loop_lag(reset: bool = False):
+    """Event-loop lag percentiles since the last reset (used by load_test.py)"""
+    samples = sorted(loop_lag_samples)
+    if reset:
+        loop_lag_samples.clear()
+    if not samples:
+        return {"samples": 0}
+    percentile = lambda q: samples[min(int(q * len(samples)), len(samples) - 1)] * 1000
+    return {"samples": len(samples), "p50_ms": percentile(0.5), "p99_ms": percentile(0.99), "max_ms": samples[-1] * 1000}
+
 @app.get("/usage-stats")
 async def get_usage_stats():
     """Get usage statistics for API calls"""
@@ -273,7 +443,8 @@ async def get_usage_stats():
         return {
             "success": True,
             "ocr_enabled": True,
-            "api_status": "running"
+            "api_status": "running",
+            "llm_backends": get_llm_backend().stats()
         }
     except Exception as e:
         return {
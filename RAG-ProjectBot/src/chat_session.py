@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Multi-turn chat sessions that reuse Ollama's KV cache instead of re-prefilling the prompt every turn
+The stable system prompt is sent once; each follow-up passes the previous turn's `context` tokens plus only the
+passages not already sent and the new question. keep_alive holds the model (and its cache) between turns, and
+follow-ups prefer the endpoint that served the previous turn.
+"""
+
+import time
+import uuid
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from chunking import get_token_counter
+from query_data import SYSTEM_PROMPT, TURN_TEMPLATE
+from llm_backend import LLMBackend, get_llm_backend, CHAT_MODEL, OLLAMA_NUM_CTX
+
+SESSION_HEADROOM_TOKENS = 2048  # Room left in num_ctx for a new turn's context, question and answer
+MAX_SESSIONS = 256
+SESSION_IDLE_SECONDS = 30 * 60  # Matches the default keep_alive; the cache is gone after that anyway
+
+NO_NEW_CONTEXT = "(No new context; use the context from earlier in this conversation.)"
+
+
+def _passage_key(text: str) -> str:
+    return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+
+class ChatSession:
+    """One conversation; turns are serialized because each one extends the previous turn's context.
+    Each model keeps its own context, since KV caches are not shared between models."""
+
+    def __init__(self, session_id: Optional[str] = None, model: str = CHAT_MODEL, system_prompt: str = SYSTEM_PROMPT,
+                 backend: Optional[LLMBackend] = None):
+        self.id = session_id or uuid.uuid4().hex
+        self.model = model
+        self.backend = backend or get_llm_backend()
+        self.system_prompt = system_prompt
+        self.contexts: Dict[str, List[int]] = {}
+        self.sent_passages: Dict[str, set] = {}
+        self.endpoints: Dict[str, str] = {}  # Endpoint holding each model's KV cache for this session
+        self.turns = 0
+        self.prompt_tokens = 0  # Tokens Ollama actually prefilled
+        self.prefill_tokens_saved = 0  # System-prompt and passage tokens served from the KV cache instead of re-sent
+        self.last_used = time.time()
+        self._lock = threading.Lock()
+
+    def reset(self, model: Optional[str] = None):
+        for name in [model] if model else list(self.contexts):
+            self.contexts.pop(name, None)
+            self.sent_passages.pop(name, None)
+
+    def ask(self, question: str, passages: List[str], model: Optional[str] = None) -> str:
+        """Answer with only the passages this session has not sent yet to that model"""
+        model = model or self.model
+        with self._lock:
+            if len(self.contexts.get(model, [])) > OLLAMA_NUM_CTX - SESSION_HEADROOM_TOKENS:
+                # Ollama would truncate from the front and drop the guardrails; start over instead
+                self.reset(model)
+
+            context = self.contexts.get(model, [])
+            sent = self.sent_passages.setdefault(model, set())
+            new_passages = [passage for passage in passages if _passage_key(passage) not in sent]
+            # What a stateless request would have sent again: the system prompt and the already-sent passages.
+            # Earlier questions and answers also sit in the context, but the baseline never sends those.
+            reused = ([self.system_prompt] + [passage for passage in passages if _passage_key(passage) in sent]) if context else []
+            prompt = TURN_TEMPLATE.format(context="\n\n".join(new_passages) or NO_NEW_CONTEXT, question=question)
+            result = self.backend.generate(prompt, model=model,
+                                           system=None if context else self.system_prompt,
+                                           context=context or None, prefer=self.endpoints.get(model))
+
+            self.contexts[model] = result.get("context") or []
+            self.endpoints[model] = result.get("backend")
+            sent.update(_passage_key(passage) for passage in new_passages)
+            self.turns += 1
+            self.prompt_tokens += result.get("prompt_eval_count", 0)
+            count_tokens = get_token_counter()
+            self.prefill_tokens_saved += sum(count_tokens(text) for text in reused)
+            self.last_used = time.time()
+            return result.get("response", "")
+
+    def stats(self) -> Dict:
+        return {"session_id": self.id, "turns": self.turns, "prompt_tokens": self.prompt_tokens,
+                "prefill_tokens_saved": self.prefill_tokens_saved}
+
+
+class SessionStore:
+    """Least-recently-used sessions for the API, dropped after SESSION_IDLE_SECONDS"""
+
+    def __init__(self, max_sessions: int = MAX_SESSIONS, idle_seconds: float = SESSION_IDLE_SECONDS):
+        self.max_sessions = max_sessions
+        self.idle_seconds = idle_seconds
+        self._sessions: "OrderedDict[str, ChatSession]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id: Optional[str]) -> ChatSession:
+        """Existing session for session_id, or a new one registered under it"""
+        with self._lock:
+            now = time.time()
+            for stale_id in [sid for sid, session in self._sessions.items() if now - session.last_used > self.idle_seconds]:
+                del self._sessions[stale_id]
+            session = self._sessions.get(session_id) if session_id else None
+            if session is None:
+                session = ChatSession(session_id)
+                self._sessions[session.id] = session
+            self._sessions.move_to_end(session.id)
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+            return session
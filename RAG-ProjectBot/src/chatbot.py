@@ -20,16 +20,17 @@ if venv_path.exists():
 # Change to script directory
 os.chdir(script_dir)
 
-from langchain_community.vectorstores import Chroma
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_community.chat_models import ChatOllama
-from query_data import PROMPT_TEMPLATE, CHROMA_PATH
-from create_database import split_text, save_to_chroma
-from enhanced_document_loader import EnhancedDocumentLoader
+from chat_session import ChatSession
+from model_router import ModelRouter, routed_answer
+from vector_store import open_vector_store
+from index_versions import current_version
+from create_database import split_text, deduplicate, save_to_chroma, load_documents, record_ingestion
+from parent_retrieval import ParentDocstore, CHILD_K
+from document_catalog import DocumentCatalog
 
 class FileHandler(FileSystemEventHandler):
     def __init__(self):
-        self.loader = EnhancedDocumentLoader()
+        self.catalog = DocumentCatalog()
     
     def on_created(self, event):
         if not event.is_directory and Path(event.src_path).suffix.lower() in ['.docx', '.pdf']:
@@ -45,27 +46,15 @@ class FileHandler(FileSystemEventHandler):
         try:
             time.sleep(1)  # Wait for file to be fully written
             
-            # Use enhanced document loader
-            documents = []
-            for file_path in Path("data/books").glob("*.pdf"):
-                try:
-                    docs = self.loader.load_document_with_tables(str(file_path))
-                    documents.extend(docs)
-                    print(f"✅ Loaded {len(docs)} documents from {file_path.name}")
-                except Exception as e:
-                    print(f"❌ Error loading {file_path.name}: {e}")
-            
-            for file_path in Path("data/books").glob("*.docx"):
-                try:
-                    docs = self.loader.load_document_with_tables(str(file_path))
-                    documents.extend(docs)
-                    print(f"✅ Loaded {len(docs)} documents from {file_path.name}")
-                except Exception as e:
-                    print(f"❌ Error loading {file_path.name}: {e}")
+            # Use enhanced document loader, recording status in the document catalog
+            extraction_times, tables = {}, {}
+            documents = load_documents(self.catalog, extraction_times, tables=tables)
             
             if documents:
-                chunks = split_text(documents)
-                save_to_chroma(chunks)
+                chunks = deduplicate(split_text(documents))
+                start = time.perf_counter()
+                save_to_chroma(chunks, documents=documents, tables=tables)
+                record_ingestion(self.catalog, documents, chunks, extraction_times, time.perf_counter() - start)
                 print("✅ Database updated with new content")
             else:
                 print("⚠️ No documents found to process")
@@ -83,8 +72,11 @@ def start_file_watcher():
 
 def main():
     # Setup
-    db = Chroma(persist_directory=CHROMA_PATH, embedding_function=HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2"))
-    model = ChatOllama(model="llama3.2:3b")
+    db = open_vector_store()
+    session = ChatSession()
+    router = ModelRouter()
+    docstore = ParentDocstore()
+    loaded_version = current_version()
     
     # Start file watcher in background
     print("🔄 Starting file watcher...")
@@ -93,7 +85,7 @@ def main():
     print("🤖 RAG Chatbot with OCR Table Analysis - Ask questions!")
     print("📁 File watcher is active - new files will be automatically ingested")
     print("📊 Enhanced table extraction with OCR and Tesseract")
-    print("Type 'quit' to exit\n")
+    print("Type 'new' to start a new conversation, 'quit' to exit\n")
     
     while True:
         question = input("❓ Question: ").strip()
@@ -106,19 +98,28 @@ def main():
             
         if not question:
             continue
+        
+        if question.lower() == 'new':
+            session = ChatSession()
+            print("🆕 Started a new conversation\n")
+            continue
             
+        # Follow the live index version after a rebuild
+        if current_version() != loaded_version:
+            db, docstore, loaded_version = open_vector_store(), ParentDocstore(), current_version()
+        
         # Search and answer
-        results = db.similarity_search_with_relevance_scores(question, k=5)
+        results = db.similarity_search_with_relevance_scores(question, k=CHILD_K)
         if not results:
             print("❌ No relevant information found.\n")
             continue
             
-        context = "\n\n".join([doc.page_content for doc, _ in results])
-        prompt = PROMPT_TEMPLATE.format(context=context, question=question)
-        
         try:
-            response = model.predict(prompt)
+            response, decision = routed_answer(question, results, docstore, session, router)
             print(f"🤖 {response}\n")
+            print(f"🧭 Route: {decision.route} ({decision.reason})\n")
+            if session.prefill_tokens_saved:
+                print(f"⚡ Reused {session.prefill_tokens_saved} cached prompt tokens this conversation\n")
         except Exception as e:
             print(f"❌ Error: {e}\n")
 
@@ -0,0 +1,258 @@
+#!/usr/bin/env python3
+"""
+Structure-aware chunker: cuts on section and paragraph boundaries and keeps tables whole
+Chunk sizes are measured in embedding-model tokens rather than characters
+"""
+
+import os
+import re
+import sys
+import time
+import glob
+import argparse
+from typing import Callable, List, Optional, Tuple
+
+from langchain.schema import Document
+
+# Loaders mark headings with a leading "## " and separate blocks with blank lines
+HEADING_PREFIX = "## "
+TABLE_CONTENT_TYPES = {"native_table", "image_table", "docx_table"}
+TABLE_BANNER = "=" * 50
+
+CHUNK_TARGET_TOKENS = 192
+CHUNK_MAX_TOKENS = 256  # all-MiniLM-L6-v2 truncates input beyond 256 word pieces
+TABLE_MAX_TOKENS = 256
+
+TOKENIZER_PATH = os.path.expanduser("~/.cache/huggingface/hub/models--sentence-transformers--all-MiniLM-L6-v2/snapshots/c9745ed1d9f207416be6d2e6f8de32d1f16199bf")
+
+_token_counter: Optional[Callable[[str], int]] = None
+
+
+def _approximate_tokens(text: str) -> int:
+    # WordPiece averages roughly 1.3 tokens per whitespace-separated word on English prose
+    return int(len(text.split()) * 1.3) + 1
+
+
+def get_token_counter() -> Callable[[str], int]:
+    """Token counter for the embedding model's tokenizer, approximated when it is not installed"""
+    global _token_counter
+    if _token_counter is None:
+        try:
+            # Rust tokenizer from tokenizer.json; avoids importing transformers (and torch) just to count
+            from tokenizers import Tokenizer
+            fast_tokenizer = Tokenizer.from_file(os.path.join(TOKENIZER_PATH, "tokenizer.json"))
+            fast_tokenizer.no_truncation()
+            _token_counter = lambda text: len(fast_tokenizer.encode(text, add_special_tokens=False).ids)
+            return _token_counter
+        except Exception:
+            pass
+        try:
+            from transformers import AutoTokenizer
+            tokenizer = AutoTokenizer.from_pretrained(TOKENIZER_PATH)
+            _token_counter = lambda text: len(tokenizer.encode(text, add_special_tokens=False))
+        except Exception:
+            _token_counter = _approximate_tokens
+    return _token_counter
+
+
+class StructuredChunker:
+    def __init__(self, target_tokens: int = CHUNK_TARGET_TOKENS, max_tokens: int = CHUNK_MAX_TOKENS,
+                 table_max_tokens: int = TABLE_MAX_TOKENS, count_tokens: Optional[Callable[[str], int]] = None):
+        self.target_tokens = target_tokens
+        self.max_tokens = max_tokens
+        self.table_max_tokens = table_max_tokens
+        self.count_tokens = count_tokens or get_token_counter()
+
+    def split_documents(self, documents: List[Document]) -> List[Document]:
+        chunks = []
+        for doc in documents:
+            if doc.metadata.get("content_type") in TABLE_CONTENT_TYPES:
+                chunks.extend(self._split_table(doc))
+            else:
+                chunks.extend(self._split_text(doc))
+        return chunks
+
+    def _make_chunk(self, doc: Document, text: str, start_index: int, section: Optional[str]) -> Document:
+        metadata = dict(doc.metadata)
+        metadata["start_index"] = start_index
+        metadata["chunk_tokens"] = self.count_tokens(text)
+        if section:
+            metadata["section"] = section
+        return Document(page_content=text, metadata=metadata)
+
+    def _paragraphs(self, text: str) -> List[Tuple[int, str]]:
+        # Blank-line separated blocks with the character offset of their first non-space character
+        paragraphs = []
+        for match in re.finditer(r"(?:[^\n]|\n(?![ \t]*\n))+", text):
+            block = match.group()
+            if block.strip():
+                paragraphs.append((match.start() + len(block) - len(block.lstrip()), block.strip()))
+        return paragraphs
+
+    def _split_text(self, doc: Document) -> List[Document]:
+        chunks = []
+        section = doc.metadata.get("section")
+        buffer: List[str] = []
+        buffer_start = 0
+        buffer_tokens = 0
+
+        def flush():
+            nonlocal buffer, buffer_tokens
+            if buffer:
+                body = "\n\n".join(buffer)
+                text = f"{section}\n\n{body}" if section else body
+                chunks.append(self._make_chunk(doc, text, buffer_start, section))
+            buffer, buffer_tokens = [], 0
+
+        for offset, paragraph in self._paragraphs(doc.page_content):
+            if paragraph.startswith(HEADING_PREFIX):
+                # A heading always closes the current section
+                flush()
+                section = paragraph[len(HEADING_PREFIX):].strip()
+                continue
+
+            tokens = self.count_tokens(paragraph)
+            if tokens > self.max_tokens:
+                flush()
+                for piece_offset, piece in self._split_long_paragraph(paragraph):
+                    buffer, buffer_start, buffer_tokens = [piece], offset + piece_offset, self.count_tokens(piece)
+                    flush()
+                continue
+
+            if buffer and buffer_tokens + tokens > self.target_tokens:
+                flush()
+            if not buffer:
+                buffer_start = offset
+            buffer.append(paragraph)
+            buffer_tokens += tokens
+
+        flush()
+        return chunks
+
+    def _split_long_paragraph(self, paragraph: str) -> List[Tuple[int, str]]:
+        # Sentence packing for oversized paragraphs; single overlong sentences fall back to word windows
+        pieces = []
+        current, current_start, current_tokens = [], 0, 0
+        for match in re.finditer(r"[^.!?]+(?:[.!?]+|$)", paragraph):
+            sentence = match.group().strip()
+            if not sentence:
+                continue
+            sentence_start = match.start() + len(match.group()) - len(match.group().lstrip())
+            tokens = self.count_tokens(sentence)
+            if current and current_tokens + tokens > self.target_tokens:
+                pieces.append((current_start, " ".join(current)))
+                current, current_tokens = [], 0
+            if tokens > self.max_tokens:
+                words = sentence.split()
+                step = max(1, int(len(words) * self.target_tokens / tokens))
+                for i in range(0, len(words), step):
+                    pieces.append((sentence_start, " ".join(words[i:i + step])))
+                continue
+            if not current:
+                current_start = sentence_start
+            current.append(sentence)
+            current_tokens += tokens
+        if current:
+            pieces.append((current_start, " ".join(current)))
+        return pieces
+
+    def _split_table(self, doc: Document) -> List[Document]:
+        """Keep a table as one chunk, or split it into row groups that each repeat the title and header"""
+        text = doc.page_content.strip()
+        if self.count_tokens(text) <= self.table_max_tokens:
+            return [self._make_chunk(doc, text, 0, doc.metadata.get("section"))]
+
+        lines = [line for line in text.splitlines() if line.strip() and line.strip() != TABLE_BANNER]
+        title = lines[0] if lines and lines[0].startswith("[") else None
+        rows = lines[1:] if title else lines
+        if not rows:
+            return [self._make_chunk(doc, text, 0, doc.metadata.get("section"))]
+        header, rows = rows[0], rows[1:]
+        prefix = "\n".join(filter(None, [title, TABLE_BANNER, header]))
+        prefix_tokens = self.count_tokens(prefix)
+
+        chunks = []
+        group, group_tokens = [], prefix_tokens
+        for row in rows:
+            tokens = self.count_tokens(row)
+            if group and group_tokens + tokens > self.table_max_tokens:
+                chunks.append("\n".join([prefix, *group, TABLE_BANNER]))
+                group, group_tokens = [], prefix_tokens
+            group.append(row)
+            group_tokens += tokens
+        if group or not chunks:
+            chunks.append("\n".join([prefix, *group, TABLE_BANNER]))
+
+        results = []
+        for i, chunk_text in enumerate(chunks):
+            chunk = self._make_chunk(doc, chunk_text, 0, doc.metadata.get("section"))
+            chunk.metadata["row_group"] = i + 1
+            results.append(chunk)
+        return results
+
+
+def compare_chunking(documents: List[Document], embed: bool = True) -> dict:
+    """Chunk count, token volume and embedding time for the legacy 300/100 splitter vs. the structured chunker"""
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+    count_tokens = get_token_counter()
+    legacy = RecursiveCharacterTextSplitter(chunk_size=300, chunk_overlap=100, length_function=len, add_start_index=True)
+    strategies = {
+        "recursive_300_100": legacy.split_documents,
+        "structured": StructuredChunker(count_tokens=count_tokens).split_documents,
+    }
+
+    embedding_function = None
+    if embed:
+        from langchain_huggingface import HuggingFaceEmbeddings
+        embedding_function = HuggingFaceEmbeddings(model_name=TOKENIZER_PATH)
+
+    report = {}
+    for name, split in strategies.items():
+        start = time.perf_counter()
+        chunks = split(documents)
+        split_seconds = time.perf_counter() - start
+        texts = [chunk.page_content for chunk in chunks]
+        row = {
+            "chunks": len(chunks),
+            "characters": sum(len(text) for text in texts),
+            "tokens": sum(count_tokens(text) for text in texts),
+            "split_seconds": split_seconds,
+        }
+        if embedding_function is not None:
+            start = time.perf_counter()
+            embedding_function.embed_documents(texts)
+            row["embedding_seconds"] = time.perf_counter() - start
+        report[name] = row
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare legacy and structure-aware chunking on data/books")
+    parser.add_argument("--data-path", default="data/books")
+    parser.add_argument("--no-embed", action="store_true", help="Skip timing the embedding step")
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    from enhanced_document_loader import EnhancedDocumentLoader
+
+    loader = EnhancedDocumentLoader()
+    documents = []
+    for file_path in glob.glob(os.path.join(args.data_path, "*.*")):
+        if os.path.splitext(file_path)[1].lower() in ['.pdf', '.docx']:
+            documents.extend(loader.load_document_with_tables(file_path))
+
+    report = compare_chunking(documents, embed=not args.no_embed)
+    baseline = report["recursive_300_100"]
+    print(f"{'strategy':<20}{'chunks':>10}{'tokens':>12}{'embed s':>10}")
+    for name, row in report.items():
+        print(f"{name:<20}{row['chunks']:>10}{row['tokens']:>12}{row.get('embedding_seconds', float('nan')):>10.2f}")
+    structured = report["structured"]
+    if baseline["chunks"]:
+        print(f"Chunk count change: {100 * (structured['chunks'] - baseline['chunks']) / baseline['chunks']:+.1f}%")
+    if "embedding_seconds" in baseline and baseline["embedding_seconds"]:
+        print(f"Embedding time change: {100 * (structured['embedding_seconds'] - baseline['embedding_seconds']) / baseline['embedding_seconds']:+.1f}%")
+
+
+if __name__ == "__main__":
+    main()
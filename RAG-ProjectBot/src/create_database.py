@@ -1,55 +1,142 @@
 # from langchain.document_loaders import DirectoryLoader
 from langchain_community.document_loaders import Docx2txtLoader, PyMuPDFLoader
-from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.schema import Document
 # from langchain.embeddings import OpenAIEmbeddings
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_community.vectorstores import Chroma
 # import openai 
 # from dotenv import load_dotenv
 import os
-import shutil
+import time
 import glob
+import random
+import shutil
+import hashlib
+import argparse
+from collections import Counter
+from pathlib import Path
+import numpy as np
 from enhanced_document_loader import EnhancedDocumentLoader
+from document_catalog import DocumentCatalog, page_count
+from chunking import StructuredChunker
+from dedup import dedup_chunks, dedup_chunk_indices, DEDUP_ENABLED
+from parent_retrieval import ParentDocstore
+from vector_store import open_vector_store, validate_store, hnsw_metadata, embed_texts, get_embedding_function, \
+    VECTOR_STORE_BACKEND
+from index_bundle import write_bundle, read_bundle, read_manifest, check_compatible
+from index_versions import create_version, vector_path, docstore_path, table_store_path, promote, discard
+from table_store import default_table_store_path, write_tables
+from index_writer import writer_lock
 
 
-CHROMA_PATH = "chroma"
 DATA_PATH = "data/books"
+SHARD_DIR = "shards"
 
 
 def main():
-    generate_data_store()
+    parser = argparse.ArgumentParser(description="Build the vector store from data/books")
+    parser.add_argument("--hnsw-space", choices=["l2", "cosine", "ip"], help="Chroma HNSW distance")
+    parser.add_argument("--hnsw-m", type=int, help="Chroma HNSW graph degree (M)")
+    parser.add_argument("--hnsw-construction-ef", type=int, help="Chroma HNSW construction_ef")
+    parser.add_argument("--hnsw-search-ef", type=int, help="Chroma HNSW search_ef")
+    parser.add_argument("--shard", help="Build only shard i of N (e.g. 0/8) into a partial index under --shard-dir")
+    parser.add_argument("--merge", action="store_true", help="Merge the partial indexes in --shard-dir into a new live version")
+    parser.add_argument("--shard-dir", default=SHARD_DIR)
+    args = parser.parse_args()
+    hnsw_config = hnsw_metadata(args.hnsw_space, args.hnsw_m, args.hnsw_construction_ef, args.hnsw_search_ef)
+    if args.shard:
+        build_shard(parse_shard(args.shard), args.shard_dir)
+    elif args.merge:
+        merge_shards(args.shard_dir, hnsw_config)
+    else:
+        generate_data_store(hnsw_config)
+
+
+def generate_data_store(hnsw_config: dict = None):
+    catalog = DocumentCatalog()
+    extraction_times, tables = {}, {}
+    documents = load_documents(catalog, extraction_times, tables=tables)
+    chunks = deduplicate(split_text(documents))
+    start = time.perf_counter()
+    save_to_chroma(chunks, hnsw_config, documents=documents, tables=tables)
+    record_ingestion(catalog, documents, chunks, extraction_times, time.perf_counter() - start)
+
+
+def parse_shard(spec: str) -> tuple:
+    """'i/N' -> (i, N) with 0 <= i < N"""
+    index, count = (int(part) for part in spec.split("/"))
+    if not 0 <= index < count:
+        raise ValueError(f"Shard index must be in 0..{count - 1}, got {spec}")
+    return index, count
+
 
+def shard_of(file_path: str, count: int) -> int:
+    """Stable shard for a file: hash of its name, so every host assigns files the same way"""
+    return int(hashlib.sha1(os.path.basename(file_path).encode("utf-8")).hexdigest(), 16) % count
 
-def generate_data_store():
-    documents = load_documents()
-    chunks = split_text(documents)
-    save_to_chroma(chunks)
 
+def shard_path(shard_dir: str, index: int, count: int) -> str:
+    return os.path.join(shard_dir, f"shard-{index:03d}-of-{count:03d}")
 
-def load_documents():
+
+def load_documents(catalog: DocumentCatalog = None, extraction_times: dict = None, shard: tuple = None,
+                   tables: dict = None):
+    """Load every document in DATA_PATH; typed tables are collected per source into `tables` when given"""
     print("Loading documents with enhanced table extraction...")
     documents = []
     
     # Initialize enhanced document loader
     loader = EnhancedDocumentLoader()
+    if catalog is not None:
+        catalog.sync_directory(Path(DATA_PATH))
     
     # Load all documents from the data directory
     for file_path in glob.glob(os.path.join(DATA_PATH, "*.*")):
         file_ext = os.path.splitext(file_path)[1].lower()
         if file_ext in ['.pdf', '.docx']:
+            if shard is not None and shard_of(file_path, shard[1]) != shard[0]:
+                continue
+            file_name = os.path.basename(file_path)
             try:
+                if catalog is not None:
+                    catalog.mark_processing(file_name)
+                start = time.perf_counter()
                 docs = loader.load_document_with_tables(file_path)
+                if extraction_times is not None:
+                    extraction_times[file_path] = time.perf_counter() - start
+                if tables is not None:
+                    tables[file_path] = loader.tables
                 documents.extend(docs)
-                print(f"Loaded {len(docs)} documents from {os.path.basename(file_path)}")
+                print(f"Loaded {len(docs)} documents from {file_name}")
             except Exception as e:
                 print(f"Error loading {file_path}: {e}")
+                if catalog is not None:
+                    catalog.mark_failed(file_name, str(e))
     
     print(f"Total documents loaded: {len(documents)}")
     return documents
 
+
+def record_ingestion(catalog: DocumentCatalog, documents: list[Document], chunks: list[Document],
+                     extraction_times: dict, embedding_seconds: float):
+    """Mark every loaded file as processed; batch embedding time is split by each file's share of chunks"""
+    documents_by_source = {}
+    for doc in documents:
+        documents_by_source.setdefault(doc.metadata.get("source"), []).append(doc)
+    chunk_counts = Counter(chunk.metadata.get("source") for chunk in chunks)
+    total_chunks = max(len(chunks), 1)
+    
+    for source, extraction_seconds in extraction_times.items():
+        file_name = os.path.basename(source)
+        source_documents = documents_by_source.get(source, [])
+        if not source_documents:
+            catalog.mark_failed(file_name, "No documents loaded")
+            continue
+        catalog.mark_processed(file_name, page_count=page_count(source_documents),
+                               document_count=len(source_documents), chunk_count=chunk_counts[source],
+                               extraction_seconds=extraction_seconds,
+                               embedding_seconds=embedding_seconds * chunk_counts[source] / total_chunks)
+
 def load_documents_basic():
-    """Original document loading without table extraction"""
+    """Original document loading without table extraction (DOCX tables are dropped; load_documents keeps them)"""
     documents = []
     # Load all docx and pdf files from the data directory
     for file_path in glob.glob(os.path.join(DATA_PATH, "*.*")):
@@ -73,12 +160,8 @@ def load_documents_basic():
 
 
 def split_text(documents: list[Document]):
-    text_splitter = RecursiveCharacterTextSplitter(
-        chunk_size=300,
-        chunk_overlap=100,
-        length_function=len,
-        add_start_index=True,
-    )
+    # Cut on headings/paragraphs and keep tables whole; sizes are in embedding-model tokens
+    text_splitter = StructuredChunker()
     chunks = text_splitter.split_documents(documents)
     print(f"Split {len(documents)} documents into {len(chunks)} chunks.")
 
@@ -90,48 +173,127 @@ def split_text(documents: list[Document]):
     return chunks
 
 
-def save_to_chroma(chunks: list[Document]):
+def deduplicate(chunks: list[Document]) -> list[Document]:
+    """Drop near-duplicate chunks before embedding; kept chunks list every source they stand for (DEDUP=0 disables)"""
+    if not DEDUP_ENABLED:
+        return chunks
+    kept, stats = dedup_chunks(chunks)
+    print(f"Deduplicated {stats['input']} chunks to {stats['kept']}: {stats['saved']} embeddings saved "
+          f"({stats['exact']} exact, {stats['near']} near duplicates).")
+    return kept
+
+
+def save_parents(documents: list[Document], rebuild: bool = False, path: str = None):
+    """Store loaded pages/tables as parents for small-to-big retrieval"""
+    docstore = ParentDocstore(path)
+    if rebuild:
+        docstore.clear()
+    docstore.add_documents(documents)
+
+
+def save_to_chroma(chunks: list[Document], hnsw_config: dict = None, documents: list[Document] = None,
+                   tables: dict = None):
+    """Build a new index version (Chroma by default, VECTOR_STORE=flat for the memory-mapped index),
+    validate it and atomically make it live; the serving index is never modified in place"""
     # Use all chunks now since sentence-transformers is much faster
-    print(f"Creating embeddings for {len(chunks)} chunks using sentence-transformers...")
+    total_tokens = sum(chunk.metadata.get("chunk_tokens", 0) for chunk in chunks)
+    print(f"Creating embeddings for {len(chunks)} chunks ({total_tokens} tokens) using sentence-transformers...")
 
-    # Create embeddings
-    # Use local model path to avoid network requests
-    model_path = os.path.expanduser("~/.cache/huggingface/hub/models--sentence-transformers--all-MiniLM-L6-v2/snapshots/c9745ed1d9f207416be6d2e6f8de32d1f16199bf")
-    embedding_function = HuggingFaceEmbeddings(model_name=model_path)
-    
+    # One writer at a time across the API, watcher and CLI processes; readers keep serving the live version
+    with writer_lock():
+        _build_version(chunks, hnsw_config, documents, tables=tables)
+
+
+def build_shard(shard: tuple, shard_dir: str = SHARD_DIR):
+    """Load, chunk, deduplicate and embed one shard's files into a partial index bundle"""
+    index, count = shard
+    catalog = DocumentCatalog()
+    extraction_times, tables = {}, {}
+    documents = load_documents(catalog, extraction_times, shard=shard, tables=tables)
+    chunks = deduplicate(split_text(documents))
+    print(f"Embedding {len(chunks)} chunks for shard {index}/{count}...")
+    start = time.perf_counter()
+    vectors = embed_texts(get_embedding_function(), [chunk.page_content for chunk in chunks])
+    embedding_seconds = time.perf_counter() - start
+    path = shard_path(shard_dir, index, count)
+    write_bundle(path, [f"{index}-{i}" for i in range(len(chunks))], [chunk.page_content for chunk in chunks],
+                 [chunk.metadata for chunk in chunks], vectors, parents=documents, tables=tables,
+                 info={"shard": index, "shard_count": count, "files": sorted(os.path.basename(source) for source in extraction_times)})
+    record_ingestion(catalog, documents, chunks, extraction_times, embedding_seconds)
+    print(f"✅ Shard {index}/{count}: {len(chunks)} chunks embedded in {embedding_seconds:.1f}s, written to {path}")
+
+
+def merge_shards(shard_dir: str = SHARD_DIR, hnsw_config: dict = None):
+    """Combine every partial index in shard_dir into a new live version; vectors are copied, never re-embedded.
+    Duplicates across shards are dropped here, since each shard could only deduplicate its own files."""
+    paths = sorted(str(path) for path in Path(shard_dir).glob("shard-*-of-*") if path.is_dir())
+    if not paths:
+        raise RuntimeError(f"No partial indexes found in {shard_dir}")
+    manifests = [read_manifest(path) for path in paths]
+    counts = {manifest["shard_count"] for manifest in manifests}
+    if len(counts) != 1:
+        raise RuntimeError(f"Partial indexes from different shard counts in {shard_dir}: {sorted(counts)}")
+    count = counts.pop()
+    missing = sorted(set(range(count)) - {manifest["shard"] for manifest in manifests})
+    if missing:
+        raise RuntimeError(f"Missing shards {missing} of {count}")
+    check_compatible(manifests)
+
+    chunks, vectors, documents, tables = [], [], [], {}
+    for path in paths:
+        bundle = read_bundle(path)
+        chunks.extend(bundle.chunks())
+        vectors.append(bundle.vectors)
+        documents.extend(bundle.parents)
+        tables.update(bundle.tables or {})
+        print(f"Read {bundle.manifest['count']} chunks from {path}")
+    vectors = np.concatenate(vectors) if chunks else np.zeros((0, 0), dtype=np.float32)
+
+    if DEDUP_ENABLED and chunks:
+        indices, chunks, stats = dedup_chunk_indices(chunks)
+        vectors = vectors[indices]
+        print(f"Cross-shard deduplication removed {stats['saved']} chunks.")
+
+    with writer_lock():
+        _build_version(chunks, hnsw_config, documents, vectors=vectors, tables=tables)
+
+
+def _build_version(chunks: list[Document], hnsw_config: dict = None, documents: list[Document] = None,
+                   vectors: np.ndarray = None, tables: dict = None):
+    version = create_version()
+    store = open_vector_store(path=vector_path(version, VECTOR_STORE_BACKEND), hnsw_config=hnsw_config)
     try:
-        # Check if database exists and is accessible
-        if os.path.exists(CHROMA_PATH):
-            try:
-                # Test if existing database is accessible
-                test_db = Chroma(persist_directory=CHROMA_PATH, embedding_function=embedding_function)
-                test_db._collection.count()  # Test connection
-                print(f"Existing database is accessible, clearing it...")
-                shutil.rmtree(CHROMA_PATH)
-            except Exception as e:
-                print(f"Existing database is corrupted ({e}), removing it...")
-                shutil.rmtree(CHROMA_PATH)
+        start = time.perf_counter()
+        if vectors is None:
+            store.rebuild(chunks)
+        else:
+            store.rebuild_from_vectors([str(i) for i in range(len(chunks))], [chunk.page_content for chunk in chunks],
+                                       [chunk.metadata for chunk in chunks], vectors)
+        print(f"Created new database with {len(chunks)} chunks at {store.path} in {time.perf_counter() - start:.1f}s.")
         
-                # Create new database
-        db = Chroma.from_documents(
-            chunks, embedding_function, persist_directory=CHROMA_PATH
-        )
-        print(f"Created new database with {len(chunks)} chunks at {CHROMA_PATH}.")
+        # Parents are rebuilt with the vectors, or carried over from the live version
+        live_docstore = ParentDocstore().path
+        if documents is not None:
+            save_parents(documents, rebuild=True, path=docstore_path(version))
+        elif os.path.exists(live_docstore):
+            shutil.copyfile(live_docstore, docstore_path(version))
+        # Tables the same way, so table answers always come from the documents behind the live vectors
+        live_tables = default_table_store_path()
+        if tables is not None:
+            write_tables(table_store_path(version), tables)
+        elif os.path.isdir(live_tables):
+            shutil.copytree(live_tables, table_store_path(version))
         
-        # Verify database was created successfully
-        db._collection.count()
-        print("✅ Database verification successful")
+        # Verify the new version before it goes live
+        smoke_queries = [chunk.page_content for chunk in random.Random(0).sample(chunks, min(3, len(chunks)))]
+        validate_store(store, len(chunks), smoke_queries)
+        promote(version)
+        print(f"✅ Database verification successful, version {version} is live")
         
     except Exception as e:
-        print(f"ChromaDB error: {e}")
-        # Fallback: try creating without persist_directory
-        try:
-            print("Attempting fallback to in-memory database...")
-            db = Chroma.from_documents(chunks, embedding_function)
-            print(f"Created in-memory database with {len(chunks)} chunks.")
-        except Exception as e2:
-            print(f"Fallback also failed: {e2}")
-            raise
+        print(f"Vector store error: {e}")
+        discard(version)
+        raise
 
 
 if __name__ == "__main__":
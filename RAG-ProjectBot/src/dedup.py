@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Near-duplicate chunk elimination before embedding
+Chunks are compared by MinHash signatures of word shingles; LSH banding finds candidate pairs and the
+signature agreement (estimated Jaccard similarity) decides. The first occurrence is kept and records
+every source/page it stands for in `all_sources`, so citations still list each copy.
+Kept chunks carry their signature in `minhash`, so incremental upserts can check new chunks against the
+stored index without re-hashing it.
+"""
+
+import os
+import re
+import json
+import zlib
+import base64
+import hashlib
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+from langchain.schema import Document
+
+DEDUP_ENABLED = os.environ.get("DEDUP", "1") != "0"
+DEDUP_THRESHOLD = float(os.environ.get("DEDUP_THRESHOLD", "0.95"))  # Estimated Jaccard similarity of shingle sets
+SHINGLE_WORDS = 5
+NUM_BANDS = 16
+ROWS_PER_BAND = 8  # 16 x 8 = 128 permutations; pairs at ~0.7 similarity and above usually share a band
+MERSENNE_PRIME = (1 << 31) - 1
+SIGNATURE_KEY = "minhash"  # Chunk metadata field holding the base64 signature
+
+_WORD = re.compile(r"\w+")
+
+
+def _shingle_hashes(text: str) -> np.ndarray:
+    words = _WORD.findall(text.lower())
+    size = min(SHINGLE_WORDS, max(len(words), 1))
+    shingles = {" ".join(words[i:i + size]) for i in range(max(len(words) - size + 1, 1))}
+    return np.fromiter((zlib.crc32(shingle.encode("utf-8")) for shingle in shingles), dtype=np.uint64, count=len(shingles))
+
+
+def minhash_signatures(texts: List[str], num_perm: int = NUM_BANDS * ROWS_PER_BAND, seed: int = 1) -> np.ndarray:
+    """(len(texts), num_perm) signatures from universal hashes (a*x + b) mod p"""
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, MERSENNE_PRIME, size=num_perm, dtype=np.uint64)[:, None]
+    b = rng.integers(0, MERSENNE_PRIME, size=num_perm, dtype=np.uint64)[:, None]
+    signatures = np.empty((len(texts), num_perm), dtype=np.uint32)
+    for row, text in enumerate(texts):
+        hashes = _shingle_hashes(text) % np.uint64(MERSENNE_PRIME)
+        signatures[row] = ((a * hashes[None, :] + b) % np.uint64(MERSENNE_PRIME)).min(axis=1)
+    return signatures
+
+
+def encode_signature(signature: np.ndarray) -> str:
+    return base64.b64encode(np.asarray(signature, dtype="<u4").tobytes()).decode("ascii")
+
+
+def decode_signature(value: str) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(value), dtype="<u4").astype(np.uint32)
+
+
+def chunk_signatures(texts: List[str], metadatas: List[Dict]) -> np.ndarray:
+    """Stored signatures where chunk metadata has one, computed from the text otherwise"""
+    signatures = np.empty((len(texts), NUM_BANDS * ROWS_PER_BAND), dtype=np.uint32)
+    missing = []
+    for row, metadata in enumerate(metadatas):
+        stored = (metadata or {}).get(SIGNATURE_KEY)
+        if stored:
+            signatures[row] = decode_signature(stored)
+        else:
+            missing.append(row)
+    if missing:
+        signatures[missing] = minhash_signatures([texts[row] for row in missing])
+    return signatures
+
+
+def _band_keys(signature: np.ndarray) -> List[bytes]:
+    return [signature[band * ROWS_PER_BAND:(band + 1) * ROWS_PER_BAND].tobytes() for band in range(NUM_BANDS)]
+
+
+def match_signatures(signatures: np.ndarray, stored: np.ndarray, threshold: float = DEDUP_THRESHOLD) -> List[Optional[int]]:
+    """For each signature, the most similar stored row at or above threshold, or None"""
+    buckets: List[Dict[bytes, List[int]]] = [{} for _ in range(NUM_BANDS)]
+    for row, signature in enumerate(stored):
+        for band, key in enumerate(_band_keys(signature)):
+            buckets[band].setdefault(key, []).append(row)
+    matches = []
+    for signature in signatures:
+        candidates = {candidate for band, key in enumerate(_band_keys(signature)) for candidate in buckets[band].get(key, ())}
+        match = max(candidates, key=lambda candidate: np.mean(stored[candidate] == signature), default=None)
+        matches.append(match if match is not None and np.mean(stored[match] == signature) >= threshold else None)
+    return matches
+
+
+def find_duplicates(texts: List[str], threshold: float = DEDUP_THRESHOLD) -> Tuple[List[int], Dict[str, int]]:
+    """Representative index for every text (itself when kept), plus exact/near duplicate counts.
+    Only representatives enter the LSH buckets, so similarity never drifts along a chain of edits."""
+    representative, counts, _ = _find_duplicates(texts, threshold)
+    return representative, counts
+
+
+def _find_duplicates(texts: List[str], threshold: float) -> Tuple[List[int], Dict[str, int], Dict[int, np.ndarray]]:
+    """find_duplicates plus the signature of every representative"""
+    representative = list(range(len(texts)))
+    exact_seen: Dict[str, int] = {}
+    pending = []
+    counts = {"exact": 0, "near": 0}
+    for i, text in enumerate(texts):
+        key = hashlib.sha1(" ".join(_WORD.findall(text.lower())).encode("utf-8")).hexdigest()
+        if key in exact_seen:
+            representative[i] = exact_seen[key]
+            counts["exact"] += 1
+        else:
+            exact_seen[key] = i
+            pending.append(i)
+
+    signatures = minhash_signatures([texts[i] for i in pending])
+    buckets: List[Dict[bytes, List[int]]] = [{} for _ in range(NUM_BANDS)]
+    for position, i in enumerate(pending):
+        signature = signatures[position]
+        bands = _band_keys(signature)
+        candidates = {candidate for band, key in enumerate(bands) for candidate in buckets[band].get(key, ())}
+        match = max(candidates, key=lambda candidate: np.mean(signatures[candidate] == signature), default=None)
+        if match is not None and np.mean(signatures[match] == signature) >= threshold:
+            representative[i] = pending[match]
+            counts["near"] += 1
+            continue
+        for band, key in enumerate(bands):
+            buckets[band].setdefault(key, []).append(position)
+
+    # Exact duplicates of a near duplicate point at its representative
+    representative = [representative[r] for r in representative]
+    return representative, counts, {i: signatures[position] for position, i in enumerate(pending)}
+
+
+def _citation(metadata: Dict) -> Dict:
+    return {"source": metadata.get("source"), "page": metadata.get("page")}
+
+
+def chunk_sources(metadata: Dict) -> List[Dict]:
+    """Every source/page a (possibly deduplicated) chunk stands for"""
+    if metadata.get("all_sources"):
+        return json.loads(metadata["all_sources"])
+    return [_citation(metadata)]
+
+
+def link_metadata(metadata: Dict, duplicate: Dict) -> Dict:
+    """Metadata for a kept chunk that now also stands for a dropped duplicate with the given metadata"""
+    citations = chunk_sources(metadata)
+    added = [citation for citation in chunk_sources(duplicate) if citation not in citations]
+    return {**metadata, "all_sources": json.dumps(citations + added),
+            "duplicate_count": metadata.get("duplicate_count", 0) + 1 + duplicate.get("duplicate_count", 0)}
+
+
+def rehome_metadata(metadata: Dict, removed_sources: Set[str]) -> Optional[Dict]:
+    """Metadata for a kept chunk once removed_sources are deleted: None when no source it stands for survives,
+    otherwise its citations without the removed sources, re-pointed at the first surviving copy if needed"""
+    citations = chunk_sources(metadata)
+    survivors = [citation for citation in citations if citation["source"] not in removed_sources]
+    if not survivors:
+        return None
+    if len(survivors) == len(citations):
+        return metadata
+    updated = {**metadata, "all_sources": json.dumps(survivors), "duplicate_count": len(survivors) - 1}
+    if metadata.get("source") in removed_sources:
+        updated.pop("page", None)
+        updated.update({key: value for key, value in survivors[0].items() if value is not None})
+    return updated
+
+
+def dedup_chunk_indices(chunks: List[Document], threshold: float = DEDUP_THRESHOLD) -> Tuple[List[int], List[Document], Dict[str, int]]:
+    """Like dedup_chunks, plus the input index of every kept chunk (to select matching pre-computed vectors).
+    Chunks that were already deduplicated carry their linked sources and counts over."""
+    if not chunks:
+        return [], chunks, {"input": 0, "kept": 0, "exact": 0, "near": 0, "saved": 0}
+    representative, counts, signatures = _find_duplicates([chunk.page_content for chunk in chunks], threshold)
+
+    linked: Dict[int, List[Dict]] = {}
+    dropped: Dict[int, int] = {}
+    for i, rep in enumerate(representative):
+        if i != rep:
+            dropped[rep] = dropped.get(rep, chunks[rep].metadata.get("duplicate_count", 0)) + 1 + chunks[i].metadata.get("duplicate_count", 0)
+            citations = linked.setdefault(rep, chunk_sources(chunks[rep].metadata))
+            for citation in chunk_sources(chunks[i].metadata):
+                if citation not in citations:
+                    citations.append(citation)
+
+    indices, kept = [], []
+    for i, chunk in enumerate(chunks):
+        if representative[i] != i:
+            continue
+        metadata = {**chunk.metadata, SIGNATURE_KEY: encode_signature(signatures[i])}
+        if i in linked:
+            # Stored as a JSON string: Chroma metadata values must be scalars
+            metadata.update({"all_sources": json.dumps(linked[i]), "duplicate_count": dropped[i]})
+        chunk = Document(page_content=chunk.page_content, metadata=metadata)
+        indices.append(i)
+        kept.append(chunk)
+    stats = {"input": len(chunks), "kept": len(kept), **counts, "saved": len(chunks) - len(kept)}
+    return indices, kept, stats
+
+
+def dedup_chunks(chunks: List[Document], threshold: float = DEDUP_THRESHOLD) -> Tuple[List[Document], Dict[str, int]]:
+    """Drop near-duplicate chunks, linking their sources onto the kept chunk; returns (kept, stats)"""
+    _, kept, stats = dedup_chunk_indices(chunks, threshold)
+    return kept, stats
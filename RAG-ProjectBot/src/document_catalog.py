@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+SQLite document catalog: the single record of which documents exist and how far their ingestion got
+Used by api.py, file_watcher.py, chatbot.py and create_database.py instead of scanning data/books
+"""
+
+import os
+import time
+import pickle
+import sqlite3
+import hashlib
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+CATALOG_PATH = "document_catalog.db"
+SUPPORTED_EXTENSIONS = ['.docx', '.pdf']
+HASH_CHUNK_SIZE = 1024 * 1024
+
+STATUS_PENDING = "pending"
+STATUS_PROCESSING = "processing"
+STATUS_PROCESSED = "processed"
+STATUS_FAILED = "failed"
+
+SORTABLE_COLUMNS = ["filename", "size", "uploaded_at", "status", "page_count", "chunk_count", "updated_at"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    filename TEXT PRIMARY KEY,
+    sha256 TEXT,
+    size INTEGER,
+    uploaded_at REAL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    page_count INTEGER,
+    document_count INTEGER,
+    chunk_count INTEGER,
+    extraction_seconds REAL,
+    embedding_seconds REAL,
+    error TEXT,
+    updated_at REAL
+);
+CREATE INDEX IF NOT EXISTS idx_documents_sha256 ON documents (sha256);
+CREATE INDEX IF NOT EXISTS idx_documents_uploaded_at ON documents (uploaded_at);
+"""
+
+
+def hash_file(file_path: Path) -> str:
+    """SHA-256 of a file, read in chunks"""
+    sha256 = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def page_count(documents: List[Any]) -> int:
+    """Highest page number recorded in loaded document metadata"""
+    return max((doc.metadata.get("page", 0) or 0 for doc in documents), default=0)
+
+
+class DocumentCatalog:
+    def __init__(self, path: str = CATALOG_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _update(self, filename: str, **fields):
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{column} = ?" for column in fields)
+        with self._lock, self._connect() as conn:
+            conn.execute(f"UPDATE documents SET {assignments} WHERE filename = ?", [*fields.values(), filename])
+
+    def register(self, file_path: Path, sha256: Optional[str] = None, size: Optional[int] = None,
+                 uploaded_at: Optional[float] = None) -> Dict[str, Any]:
+        """Add or refresh a document; a changed hash resets it to pending"""
+        file_path = Path(file_path)
+        if sha256 is None:
+            sha256 = hash_file(file_path)
+        if size is None or uploaded_at is None:
+            stat = file_path.stat()
+            size = stat.st_size if size is None else size
+            uploaded_at = stat.st_mtime if uploaded_at is None else uploaded_at
+
+        existing = self.get(file_path.name)
+        with self._lock, self._connect() as conn:
+            if existing and existing["sha256"] == sha256:
+                conn.execute("UPDATE documents SET size = ?, uploaded_at = ? WHERE filename = ?",
+                             (size, uploaded_at, file_path.name))
+            else:
+                conn.execute(
+                    "INSERT OR REPLACE INTO documents (filename, sha256, size, uploaded_at, status, updated_at) "
+                    "VALUES (?, ?, ?, ?, ?, ?)",
+                    (file_path.name, sha256, size, uploaded_at, STATUS_PENDING, time.time()))
+        return self.get(file_path.name)
+
+    def get(self, filename: str) -> Optional[Dict[str, Any]]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM documents WHERE filename = ?", (filename,)).fetchone()
+        return dict(row) if row else None
+
+    def find_by_hash(self, sha256: str, statuses: Optional[Sequence[str]] = None,
+                     directory: Optional[Path] = None) -> Optional[Dict[str, Any]]:
+        """Oldest document with this content, optionally only among the given statuses and files still in directory"""
+        query, params = "SELECT * FROM documents WHERE sha256 = ?", [sha256]
+        if statuses:
+            query += f" AND status IN ({','.join('?' * len(statuses))})"
+            params.extend(statuses)
+        with self._connect() as conn:
+            rows = conn.execute(query + " ORDER BY uploaded_at", params).fetchall()
+        for row in rows:
+            if directory is None or (Path(directory) / row["filename"]).exists():
+                return dict(row)
+        return None
+
+    def is_processed(self, sha256: str) -> bool:
+        """True when any document with this content has already been ingested"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT 1 FROM documents WHERE sha256 = ? AND status = ? LIMIT 1",
+                               (sha256, STATUS_PROCESSED)).fetchone()
+        return row is not None
+
+    def mark_pending(self, filename: str):
+        self._update(filename, status=STATUS_PENDING, error=None)
+
+    def mark_processing(self, filename: str):
+        self._update(filename, status=STATUS_PROCESSING, error=None)
+
+    def mark_processed(self, filename: str, page_count: int = 0, document_count: int = 0, chunk_count: int = 0,
+                       extraction_seconds: Optional[float] = None, embedding_seconds: Optional[float] = None):
+        self._update(filename, status=STATUS_PROCESSED, page_count=page_count, document_count=document_count,
+                     chunk_count=chunk_count, extraction_seconds=extraction_seconds,
+                     embedding_seconds=embedding_seconds, error=None)
+
+    def mark_failed(self, filename: str, error: str):
+        self._update(filename, status=STATUS_FAILED, error=error)
+
+    def remove(self, filename: str):
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM documents WHERE filename = ?", (filename,))
+
+    def list_documents(self, limit: int = 100, offset: int = 0, sort_by: str = "uploaded_at",
+                       descending: bool = True, status: Optional[str] = None) -> Tuple[List[Dict[str, Any]], int]:
+        """One page of documents plus the total count"""
+        if sort_by not in SORTABLE_COLUMNS:
+            raise ValueError(f"Cannot sort by {sort_by}; choose one of {SORTABLE_COLUMNS}")
+        where, params = ("WHERE status = ?", [status]) if status else ("", [])
+        order = "DESC" if descending else "ASC"
+        with self._connect() as conn:
+            total = conn.execute(f"SELECT COUNT(*) FROM documents {where}", params).fetchone()[0]
+            rows = conn.execute(
+                f"SELECT * FROM documents {where} ORDER BY {sort_by} {order}, filename LIMIT ? OFFSET ?",
+                [*params, limit, offset]).fetchall()
+        return [dict(row) for row in rows], total
+
+    def sync_directory(self, directory: Path) -> int:
+        """Reconcile the catalog with files on disk; only new or changed files are hashed"""
+        directory = Path(directory)
+        with self._connect() as conn:
+            known = {row["filename"]: (row["size"], row["uploaded_at"])
+                     for row in conn.execute("SELECT filename, size, uploaded_at FROM documents")}
+
+        on_disk = set()
+        changed = 0
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if not entry.is_file() or Path(entry.name).suffix.lower() not in SUPPORTED_EXTENSIONS:
+                    continue
+                on_disk.add(entry.name)
+                stat = entry.stat()
+                if known.get(entry.name) != (stat.st_size, stat.st_mtime):
+                    self.register(Path(entry.path), size=stat.st_size, uploaded_at=stat.st_mtime)
+                    changed += 1
+
+        for filename in set(known) - on_disk:
+            self.remove(filename)
+            changed += 1
+        return changed
+
+    def import_processed_pickle(self, pickle_path: Path, directory: Path) -> int:
+        """One-time migration of the file watcher's processed_files.pkl into the catalog"""
+        pickle_path = Path(pickle_path)
+        if not pickle_path.exists():
+            return 0
+        try:
+            with open(pickle_path, 'rb') as f:
+                names = set(pickle.load(f))
+        except Exception:
+            return 0
+
+        migrated = 0
+        for name in names:
+            file_path = Path(directory) / name
+            if not file_path.exists():
+                continue
+            record = self.get(name) or self.register(file_path)
+            if record["status"] != STATUS_PROCESSED:
+                self.mark_processed(name)
+                migrated += 1
+        pickle_path.rename(pickle_path.with_suffix(".pkl.migrated"))
+        return migrated
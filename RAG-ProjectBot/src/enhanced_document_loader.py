@@ -4,13 +4,17 @@ import os
 import sys
 import logging
 from pathlib import Path
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 import fitz  # PyMuPDF
 from PIL import Image
 import io
 import tempfile
 import shutil
+import zipfile
 import re
+import hashlib
+from collections import Counter
+import numpy as np
 import pandas as pd
 
 # Setup paths
@@ -33,12 +37,46 @@ try:
 except ImportError:
     CAMELOT_AVAILABLE = False
 
+from ocr_engine import get_ocr_pool
+from docx_reader import read_docx
+from table_store import rows_to_frame, normalize_frame
+
+try:
+    from table_extractor import TableExtractor
+    TABLE_EXTRACTOR_AVAILABLE = True
+except ImportError:
+    TABLE_EXTRACTOR_AVAILABLE = False
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Embedded image triage, decided from get_images() metadata before anything is decoded
+IMAGE_MIN_SIDE = int(os.environ.get("IMAGE_MIN_SIDE", "48"))  # Pixels; icons and bullets are smaller
+IMAGE_MIN_PIXELS = int(os.environ.get("IMAGE_MIN_PIXELS", "20000"))  # Roughly 140x140
+IMAGE_MAX_ASPECT = float(os.environ.get("IMAGE_MAX_ASPECT", "12"))  # Rules, borders and banner strips
+
+# Full-page OCR rendering: zoom from the page's body text size, grayscale, bounded pixel count
+OCR_TARGET_DPI = float(os.environ.get("OCR_TARGET_DPI", "200"))  # Effective DPI for OCR_REFERENCE_TEXT_PT text
+OCR_REFERENCE_TEXT_PT = 10.0
+OCR_MIN_DPI = float(os.environ.get("OCR_MIN_DPI", "100"))
+OCR_MAX_DPI = float(os.environ.get("OCR_MAX_DPI", "300"))
+OCR_MAX_PIXELS = int(os.environ.get("OCR_MAX_PIXELS", "8000000"))  # About A4 at 300 DPI
+OCR_CLIP_REGIONS = os.environ.get("OCR_CLIP_REGIONS", "0") == "1"  # Render only image/table regions of text pages
+
 class EnhancedDocumentLoader:
     def __init__(self):
         """Initialize document loader with OCR-based table extraction"""
+        self.table_extractor = None
+        self.image_cache: Dict[str, Dict[str, Any]] = {}  # Raw OCR results per image xref/hash, reset per document
+        self.image_stats = Counter()
+        self.page_body_size: Optional[float] = None  # Body font size of the last page read by _extract_page_text
+        # Typed tables of the last loaded document; the index build or upsert stores them with its version
+        self.tables: List[Tuple[pd.DataFrame, Dict]] = []
+        if TABLE_EXTRACTOR_AVAILABLE:
+            try:
+                self.table_extractor = TableExtractor()
+            except Exception as e:
+                logger.warning(f"Grid table detection unavailable: {e}")
         
         logger.info("✅ Document loader initialized with OCR-based table extraction")
     
@@ -46,12 +84,18 @@ class EnhancedDocumentLoader:
         """Get current usage statistics"""
         return {
             "ocr_enabled": True,
-            "table_extraction": "Tesseract + Tabula/Camelot",
+            "table_extraction": "Tesseract + Tabula/Camelot" + (" + grid detection" if self.table_extractor else ""),
+            "image_triage": dict(self.image_stats),
             "api_status": "running"
         }
     
     def load_document_with_tables(self, file_path: str) -> List[Document]:
         """Load document with enhanced extraction: text, tables, and images"""
+        self.image_cache = {}
+        self.tables = []
+        if file_path.lower().endswith('.docx'):
+            return self._load_docx(file_path)
+        
         documents = []
         
         try:
@@ -60,18 +104,19 @@ class EnhancedDocumentLoader:
             
             # Extract native tables first
             native_tables = self._extract_native_tables(file_path)
-            for i, table_text in enumerate(native_tables):
-                documents.append(Document(
-                    page_content=table_text,
-                    metadata={"source": file_path, "content_type": "native_table", "table_index": i + 1}
-                ))
+            for i, (table_text, frame, page) in enumerate(native_tables):
+                metadata = {"source": file_path, "content_type": "native_table", "table_index": i + 1}
+                if page:
+                    metadata["page"] = page
+                documents.append(Document(page_content=table_text, metadata=metadata))
+                self.tables.append((frame, metadata))
             
             # Process each page with enhanced image extraction
             for page_num in range(len(pdf_document)):
                 page = pdf_document[page_num]
                 
-                # Extract text
-                text = page.get_text()
+                # Extract text with headings marked for the structure-aware chunker
+                text = self._extract_page_text(page)
                 if text.strip():
                     documents.append(Document(
                         page_content=text,
@@ -79,7 +124,8 @@ class EnhancedDocumentLoader:
                     ))
                 
                 # Enhanced image extraction - try multiple methods
-                images_found = self._extract_images_enhanced(page, pdf_document, page_num, file_path)
+                images_found = self._extract_images_enhanced(page, pdf_document, page_num, file_path,
+                                                             text_size=self.page_body_size)
                 for img_info in images_found:
                     try:
                         # Extract all types of data from image
@@ -100,6 +146,52 @@ class EnhancedDocumentLoader:
                         logger.warning(f"Failed to process image {img_info['index']}: {e}")
             
             pdf_document.close()
+            logger.info(f"✅ Loaded {len(documents)} documents from {file_path} (image triage so far: {dict(self.image_stats)})")
+            return documents
+            
+        except Exception as e:
+            logger.error(f"Error loading document {file_path}: {e}")
+            return []
+    
+    def _load_docx(self, file_path: str) -> List[Document]:
+        """Load Word document natively from its XML: paragraphs and tables directly, embedded media via OCR"""
+        try:
+            documents, media, tables = read_docx(file_path)
+            for rows, metadata in tables:
+                self.tables.append((rows_to_frame(rows), metadata))
+            
+            if media:
+                with zipfile.ZipFile(file_path) as archive:
+                    for media_info in media:
+                        try:
+                            img_data = archive.read(media_info['name'])
+                            if len(img_data) < 2048:  # Icons and bullets carry no text
+                                continue
+                            key = hashlib.sha1(img_data).hexdigest()
+                            img_info = {
+                                'path': None if key in self.image_cache else self._save_temp_image(img_data, media_info['page'] - 1, media_info['index']),
+                                'key': key,
+                                'index': media_info['index'],
+                                'page': media_info['page'],
+                                'method': 'docx_media',
+                                'size': len(img_data)
+                            }
+                            image_contents = self._extract_all_image_data(img_info)
+                            for content_type, content in image_contents.items():
+                                if content:
+                                    documents.append(Document(
+                                        page_content=content,
+                                        metadata={
+                                            "source": file_path,
+                                            "page": img_info['page'],
+                                            "content_type": content_type,
+                                            "image_index": img_info['index'],
+                                            "extraction_method": img_info['method']
+                                        }
+                                    ))
+                        except Exception as e:
+                            logger.warning(f"Failed to process embedded image {media_info['name']}: {e}")
+            
             logger.info(f"✅ Loaded {len(documents)} documents from {file_path}")
             return documents
             
@@ -107,8 +199,55 @@ class EnhancedDocumentLoader:
             logger.error(f"Error loading document {file_path}: {e}")
             return []
     
-    def _extract_native_tables(self, file_path: str) -> List[str]:
-        """Extract native tables from PDF using tabula and camelot"""
+    def _extract_page_text(self, page) -> str:
+        """Page text as blank-line separated blocks, with font-size or bold headings prefixed by '## '"""
+        blocks = []
+        span_sizes = []
+        self.page_body_size = None
+        for block in page.get_text("dict")["blocks"]:
+            if block.get("type") != 0:
+                continue
+            lines = []
+            sizes = []
+            bold = True
+            for line in block["lines"]:
+                line_text = "".join(span["text"] for span in line["spans"]).strip()
+                if line_text:
+                    lines.append(line_text)
+                for span in line["spans"]:
+                    if span["text"].strip():
+                        sizes.append(span["size"])
+                        span_sizes.append((span["size"], len(span["text"])))
+                        bold = bold and bool(span["flags"] & 16)
+            if lines:
+                blocks.append(("\n".join(lines), max(sizes), bold))
+        
+        if not blocks:
+            return ""
+        
+        # Body size is the character-weighted median span size on the page
+        span_sizes.sort()
+        half = sum(length for _, length in span_sizes) / 2
+        seen = 0
+        body_size = span_sizes[-1][0]
+        for size, length in span_sizes:
+            seen += length
+            if seen >= half:
+                body_size = size
+                break
+        self.page_body_size = body_size
+        
+        parts = []
+        for text, size, bold in blocks:
+            short = len(text) <= 150 and text.count("\n") <= 1
+            if short and (size >= body_size * 1.15 or (bold and len(text) <= 80)):
+                parts.append("## " + text.replace("\n", " "))
+            else:
+                parts.append(text)
+        return "\n\n".join(parts)
+    
+    def _extract_native_tables(self, file_path: str) -> List[Tuple[str, pd.DataFrame, Optional[int]]]:
+        """Extract native tables from PDF using tabula and camelot: (text, typed DataFrame, page if known)"""
         table_texts = []
         
         try:
@@ -122,7 +261,7 @@ class EnhancedDocumentLoader:
                             table_text += "=" * 50 + "\n"
                             table_text += table.to_string(index=False)
                             table_text += "\n" + "=" * 50 + "\n"
-                            table_texts.append(table_text)
+                            table_texts.append((table_text, normalize_frame(table), None))
                             logger.info(f"Extracted native table {i+1} from PDF using tabula")
                 except Exception as e:
                     logger.warning(f"Tabula extraction failed: {e}")
@@ -137,7 +276,8 @@ class EnhancedDocumentLoader:
                             table_text += "=" * 50 + "\n"
                             table_text += table.df.to_string(index=False, header=False)
                             table_text += "\n" + "=" * 50 + "\n"
-                            table_texts.append(table_text)
+                            page = int(table.page) if str(table.page).isdigit() else None
+                            table_texts.append((table_text, rows_to_frame(table.df.values.tolist()), page))
                             logger.info(f"Extracted native table {i+1} from PDF using camelot (accuracy: {table.accuracy:.1f}%)")
                 except Exception as e:
                     logger.warning(f"Camelot extraction failed: {e}")
@@ -147,32 +287,45 @@ class EnhancedDocumentLoader:
         
         return table_texts
     
-    def _extract_images_enhanced(self, page, pdf_document, page_num: int, file_path: str) -> List[Dict]:
+    def _extract_images_enhanced(self, page, pdf_document, page_num: int, file_path: str,
+                                 text_size: Optional[float] = None) -> List[Dict]:
         """Extract images from PDF page using multiple methods"""
         images_found = []
         
         try:
-            # Method 1: Extract embedded images
+            # Method 1: Extract embedded images, triaged on get_images() metadata before decoding
             image_list = page.get_images()
             for img_index, img in enumerate(image_list):
                 try:
-                    xref = img[0]
-                    pix = fitz.Pixmap(pdf_document, xref)
+                    xref, _, width, height, bpc, colorspace = img[:6]
+                    self.image_stats['seen'] += 1
+                    skip_reason = self._triage_image(width, height, bpc, colorspace)
+                    if skip_reason:
+                        self.image_stats[skip_reason] += 1
+                        continue
                     
-                    if pix.n - pix.alpha < 4:  # GRAY or RGB
-                        img_data = pix.tobytes("png")
-                        img_path = self._save_temp_image(img_data, page_num, img_index)
-                        
-                        images_found.append({
-                            'path': img_path,
-                            'index': img_index + 1,
-                            'page': page_num + 1,
-                            'method': 'embedded_object',
-                            'size': len(img_data)
-                        })
-                        logger.info(f"Extracted embedded image {img_index + 1} from page {page_num + 1}")
+                    # The same logo/stamp appears under one xref (or identical bytes under several): OCR it once
+                    key = self._image_key(pdf_document, xref)
+                    image_info = {
+                        'path': None,
+                        'key': key,
+                        'index': img_index + 1,
+                        'page': page_num + 1,
+                        'method': 'embedded_object',
+                    }
+                    if key in self.image_cache or any(found.get('key') == key for found in images_found):
+                        images_found.append(image_info)
+                        continue
                     
+                    pix = fitz.Pixmap(pdf_document, xref)
+                    if pix.n - pix.alpha >= 4:  # CMYK and similar: convert instead of dropping
+                        pix = fitz.Pixmap(fitz.csRGB, pix)
+                    img_data = pix.tobytes("png")
                     pix = None
+                    self.image_stats['decoded'] += 1
+                    image_info.update(path=self._save_temp_image(img_data, page_num, img_index), size=len(img_data))
+                    images_found.append(image_info)
+                    logger.info(f"Extracted embedded image {img_index + 1} ({width}x{height}) from page {page_num + 1}")
                 except Exception as e:
                     logger.warning(f"Failed to extract embedded image {img_index}: {e}")
             
@@ -180,9 +333,16 @@ class EnhancedDocumentLoader:
             page_rect = page.rect
             if page_rect.width > 0 and page_rect.height > 0:
                 try:
-                    # Convert page to image
-                    mat = fitz.Matrix(2, 2)  # 2x zoom for better quality
-                    pix = page.get_pixmap(matrix=mat)
+                    # Grayscale at a zoom chosen for OCR, optionally clipped to the regions that need it
+                    zoom, clip = self._ocr_render_plan(page, text_size)
+                    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), colorspace=fitz.csGRAY, alpha=False, clip=clip)
+                    pixel_bytes = pix.width * pix.height * pix.n
+                    fixed_bytes = int(page_rect.width * 2) * int(page_rect.height * 2) * 3  # Previous fixed 2x RGB render
+                    self.image_stats['rendered_pages'] += 1
+                    self.image_stats['render_bytes'] += pixel_bytes
+                    self.image_stats['render_bytes_max'] = max(self.image_stats['render_bytes_max'], pixel_bytes)
+                    logger.info(f"Rendered page {page_num + 1} for OCR at {zoom * 72:.0f} dpi, {pix.width}x{pix.height} gray"
+                                f"{' (clipped)' if clip is not None else ''}: {pixel_bytes / 1e6:.1f}MB vs {fixed_bytes / 1e6:.1f}MB at fixed 2x RGB")
                     img_data = pix.tobytes("png")
                     
                     # Only save if it's a substantial image (not just text)
@@ -194,7 +354,8 @@ class EnhancedDocumentLoader:
                             'index': len(images_found) + 1,
                             'page': page_num + 1,
                             'method': 'full_page',
-                            'size': len(img_data)
+                            'size': len(img_data),
+                            'grayscale': True
                         })
                         logger.info(f"Extracted full page image from page {page_num + 1}")
                     
@@ -207,6 +368,58 @@ class EnhancedDocumentLoader:
         
         return images_found
     
+    def _ocr_render_plan(self, page, text_size: Optional[float]) -> Tuple[float, Optional["fitz.Rect"]]:
+        """Zoom and optional clip for the full-page OCR render.
+        Text pages scale the zoom so body text reaches OCR_TARGET_DPI-equivalent height; scanned pages use the
+        target DPI but never exceed the resolution of the scan itself. The pixel count is capped either way."""
+        clip = None
+        if OCR_CLIP_REGIONS and text_size:
+            regions = [fitz.Rect(info["bbox"]) for info in page.get_image_info()]
+            try:
+                regions.extend(fitz.Rect(table.bbox) for table in page.find_tables().tables)
+            except Exception:
+                pass
+            regions = [region & page.rect for region in regions if not (region & page.rect).is_empty]
+            if regions:
+                clip = regions[0]
+                for region in regions[1:]:
+                    clip |= region
+        
+        if text_size:
+            dpi = OCR_TARGET_DPI * OCR_REFERENCE_TEXT_PT / text_size
+        else:
+            dpi = OCR_TARGET_DPI
+            native = [info["width"] * 72 / fitz.Rect(info["bbox"]).width
+                      for info in page.get_image_info() if fitz.Rect(info["bbox"]).width > 0]
+            if native:
+                dpi = min(dpi, max(native))
+        dpi = min(max(dpi, OCR_MIN_DPI), OCR_MAX_DPI)
+        zoom = dpi / 72
+        
+        area = clip if clip is not None else page.rect
+        if area.width * area.height * zoom * zoom > OCR_MAX_PIXELS:
+            zoom = (OCR_MAX_PIXELS / (area.width * area.height)) ** 0.5
+        return zoom, clip
+    
+    def _triage_image(self, width: int, height: int, bpc: int, colorspace: str) -> Optional[str]:
+        """Reason to skip an embedded image without decoding it, or None to OCR it"""
+        if width < IMAGE_MIN_SIDE or height < IMAGE_MIN_SIDE:
+            return 'skipped_small'
+        if width * height < IMAGE_MIN_PIXELS:
+            return 'skipped_small'
+        if max(width, height) / max(min(width, height), 1) > IMAGE_MAX_ASPECT:
+            return 'skipped_aspect'
+        if not colorspace and bpc == 1:
+            return 'skipped_mask'  # Stencil masks are shapes, not pictures of text
+        return None
+    
+    def _image_key(self, pdf_document, xref: int) -> str:
+        """Hash of the undecoded image stream, so identical images under different xrefs share one OCR"""
+        try:
+            return hashlib.sha1(pdf_document.xref_stream_raw(xref)).hexdigest()
+        except Exception:
+            return f"xref:{xref}"
+    
     def _save_temp_image(self, img_data: bytes, page_num: int, img_index: int) -> str:
         """Save image data to temporary file"""
         temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".png")
@@ -215,90 +428,119 @@ class EnhancedDocumentLoader:
         return temp_file.name
     
     def _extract_all_image_data(self, image_info: Dict[str, Any]) -> Dict[str, str]:
-        """Extract all types of data from image: text and tables"""
+        """Extract all types of data from image: text and tables (OCR'd once per image key and document)"""
         results = {
             "image_text": "",
             "image_table": ""
         }
         
+        key = image_info.get('key')
+        raw = self.image_cache.get(key) if key else None
+        if raw is not None:
+            self.image_stats['reused'] += 1
+        else:
+            raw = self._ocr_image_file(image_info['path'], grayscale=image_info.get('grayscale', False))
+            if key:
+                self.image_cache[key] = raw
+            # A repeated image (logo, shared diagram) is one table, stored where it first appears
+            if len(raw["table_rows"]) >= 2:
+                self.tables.append((rows_to_frame(raw["table_rows"]), {"page": image_info['page'], "content_type": "image_table",
+                                                                      "image_index": image_info['index']}))
+        
+        if raw["text"].strip():
+            results["image_text"] = self._format_text_results(raw["text"], image_info)
+        if len(raw["table_rows"]) >= 2:
+            results["image_table"] = self._format_table_results(raw["table_rows"], image_info)
+        return results
+    
+    def _ocr_image_file(self, path: Optional[str], grayscale: bool = False) -> Dict[str, Any]:
+        """Page-independent OCR output for one image file: full text and table rows; the file is removed"""
+        raw = {"text": "", "table_rows": []}
+        if not path:
+            return raw
         try:
             # Pre-analyze with Tesseract
-            import pytesseract
             import cv2
             
-            image = cv2.imread(image_info['path'])
+            image = cv2.imread(path, cv2.IMREAD_GRAYSCALE if grayscale else cv2.IMREAD_COLOR)
             if image is None:
-                return results
+                return raw
             
             # Get text from image
-            text = pytesseract.image_to_string(image)
-            
-            # 1. Extract text content
-            if text.strip():
-                results["image_text"] = self._format_text_results(text, image_info)
+            raw["text"] = get_ocr_pool().image_to_string(image)
             
-            # 2. Detect and extract tables
-            table_text = self._extract_table_from_image(image_info)
-            if table_text:
-                results["image_table"] = table_text
+            # Detect and extract tables
+            raw["table_rows"] = self._extract_table_from_image(image)
                 
         except Exception as e:
             logger.error(f"Image extraction failed: {e}")
         finally:
             try:
-                if os.path.exists(image_info['path']):
-                    os.unlink(image_info['path'])
+                if os.path.exists(path):
+                    os.unlink(path)
             except:
                 pass
         
-        return results
+        return raw
     
-    def _extract_table_from_image(self, image_info: Dict[str, Any]) -> str:
-        """Extract table data from image using Tesseract"""
+    def _extract_table_from_image(self, image: np.ndarray) -> List[List[str]]:
+        """Extract table rows from image using grid detection, OCR'ing only images with table structure"""
+        if self.table_extractor is None:
+            return []
+        
         try:
-            import pytesseract
-            import cv2
-            
-            image = cv2.imread(image_info['path'])
-            if image is None:
-                return ""
+            analysis = self.table_extractor.analyze_table(image, run_ocr=False)
             
-            # Get table structure using Tesseract
-            table_data = pytesseract.image_to_data(image, output_type=pytesseract.Output.DATAFRAME)
-            
-            # Filter out empty text and organize by position
-            valid_data = table_data[table_data['conf'] > 0]
-            if valid_data.empty:
-                return ""
-            
-            # Group text by lines (y-coordinate)
-            lines = {}
-            for _, row in valid_data.iterrows():
-                y = row['top']
-                text = row['text'].strip()
-                if text:
-                    if y not in lines:
-                        lines[y] = []
-                    lines[y].append(text)
-            
-            # Check if this looks like a table (multiple lines with similar structure)
-            if len(lines) >= 2:
-                # Format as table
-                table_text = f"\n[IMAGE TABLE from Image {image_info['index']} on page {image_info['page']}]\n"
-                table_text += "=" * 50 + "\n"
-                
-                for y in sorted(lines.keys()):
-                    line_text = " | ".join(lines[y])
-                    table_text += line_text + "\n"
-                
-                table_text += "=" * 50 + "\n"
-                return table_text
-            
-            return ""
+            if analysis.has_table:
+                # Ruled grid: OCR cell by cell
+                rows = self.table_extractor.ocr_cells(analysis, grid_only=True)
+                rows = [row for row in rows if any(cell for cell in row)]
+            elif analysis.has_row_rules:
+                # Rows ruled but no column lines: OCR the ruled band once and group words into rows
+                top, bottom = analysis.row_lines[0], analysis.row_lines[-1]
+                words = get_ocr_pool().image_to_data(image[top:bottom])
+                rows = self._group_words_into_rows(words)
+            else:
+                # No table structure: skip table OCR entirely
+                return []
+            return rows
             
         except Exception as e:
             logger.warning(f"Table extraction failed: {e}")
-            return ""
+            return []
+    
+    def _group_words_into_rows(self, words: pd.DataFrame) -> List[List[str]]:
+        """Group Tesseract words into table rows and cells using y and x gap tolerances"""
+        words = words[words['conf'] > 0].copy()
+        words['text'] = words['text'].astype(str).str.strip()
+        words = words[words['text'] != ""]
+        if words.empty:
+            return []
+        
+        # Words whose vertical centres lie within half a line height belong to the same row
+        line_height = float(words['height'].median())
+        centers = (words['top'] + words['height'] / 2).to_numpy()
+        order = np.argsort(centers, kind='stable')
+        row_ids = np.empty(len(order), dtype=int)
+        row_ids[order] = np.concatenate(([0], np.cumsum(np.diff(centers[order]) > line_height * 0.5)))
+        words['row'] = row_ids
+        words = words.sort_values(['row', 'left'])
+        
+        # Within a row, a horizontal gap wider than ~1.5 line heights starts a new cell
+        previous_right = (words['left'] + words['width']).groupby(words['row']).shift()
+        new_cell = previous_right.isna() | ((words['left'] - previous_right) > line_height * 1.5)
+        words['cell'] = new_cell.astype(int).groupby(words['row']).cumsum()
+        
+        cells = words.groupby(['row', 'cell'], sort=True)['text'].agg(" ".join)
+        return cells.groupby(level='row').agg(list).tolist()
+    
+    def _format_table_results(self, rows: List[List[str]], image_info: Dict) -> str:
+        """Format table rows; needs multiple lines with similar structure to count as a table"""
+        table_text = f"\n[IMAGE TABLE from Image {image_info['index']} on page {image_info['page']}]\n"
+        table_text += "=" * 50 + "\n"
+        table_text += "\n".join(" | ".join(row) for row in rows) + "\n"
+        table_text += "=" * 50 + "\n"
+        return table_text
     
     def _format_text_results(self, text: str, image_info: Dict) -> str:
         """Format Tesseract text results"""
@@ -5,7 +5,6 @@ import os
 import time
 import threading
 import json
-import pickle
 from pathlib import Path
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
@@ -18,42 +17,31 @@ if venv_path.exists():
     sys.path.insert(0, str(venv_path))
 os.chdir(script_dir)
 
-from create_database import split_text, save_to_chroma
+from create_database import split_text, deduplicate
+from index_writer import upsert_documents
 from enhanced_document_loader import EnhancedDocumentLoader
-from query_data import CHROMA_PATH
-
-# Global model initialization
-model_path = os.path.expanduser("~/.cache/huggingface/hub/models--sentence-transformers--all-MiniLM-L6-v2/snapshots/c9745ed1d9f207416be6d2e6f8de32d1f16199bf")
-from langchain_huggingface import HuggingFaceEmbeddings
-embedding_function = HuggingFaceEmbeddings(model_name=model_path)
+from vector_store import VECTOR_STORE_BACKEND
+from document_catalog import DocumentCatalog, hash_file, page_count
 
 class FileHandler(FileSystemEventHandler):
     def __init__(self):
         self.processing_files = set()
-        self.processed_files = self._load_processed_files()
-        print(f"📋 Already processed files: {list(self.processed_files)}")
-    
-    def _load_processed_files(self):
-        """Load list of already processed files"""
-        processed_file = Path("processed_files.pkl")
-        if processed_file.exists():
-            try:
-                with open(processed_file, 'rb') as f:
-                    return set(pickle.load(f))
-            except:
-                return set()
-        return set()
+        self.catalog = DocumentCatalog()
+        self.catalog.sync_directory(Path("data/books"))
+        migrated = self.catalog.import_processed_pickle(Path("processed_files.pkl"), Path("data/books"))
+        if migrated:
+            print(f"📋 Migrated {migrated} files from processed_files.pkl into the document catalog")
+        processed, _ = self.catalog.list_documents(limit=1000, status="processed")
+        print(f"📋 Already processed files: {[doc['filename'] for doc in processed]}")
     
-    def _save_processed_files(self):
-        """Save list of processed files"""
-        processed_file = Path("processed_files.pkl")
-        with open(processed_file, 'wb') as f:
-            pickle.dump(list(self.processed_files), f)
+    def _is_processed(self, file_name):
+        record = self.catalog.get(file_name)
+        return record is not None and record["status"] == "processed"
     
     def on_created(self, event):
         if not event.is_directory and Path(event.src_path).suffix.lower() in ['.docx', '.pdf']:
             file_path = Path(event.src_path)
-            if file_path.name not in self.processing_files and file_path.name not in self.processed_files:
+            if file_path.name not in self.processing_files and not self._is_processed(file_path.name):
                 print(f"🔄 New file detected: {file_path.name}")
                 self._process_files_background(str(file_path))
     
@@ -61,7 +49,7 @@ class FileHandler(FileSystemEventHandler):
         # Handle file moves (like when files are moved to the directory)
         if not event.is_directory and Path(event.dest_path).suffix.lower() in ['.docx', '.pdf']:
             file_path = Path(event.dest_path)
-            if file_path.name not in self.processing_files and file_path.name not in self.processed_files:
+            if file_path.name not in self.processing_files and not self._is_processed(file_path.name):
                 print(f"🔄 File moved to directory: {file_path.name}")
                 self._process_files_background(str(file_path))
     
@@ -72,7 +60,7 @@ class FileHandler(FileSystemEventHandler):
             print(f"⏳ Already processing {file_name}, skipping...")
             return
         
-        if file_name in self.processed_files:
+        if self._is_processed(file_name):
             print(f"✅ {file_name} already processed, skipping...")
             return
         
@@ -87,33 +75,51 @@ class FileHandler(FileSystemEventHandler):
                 print(f"❌ File {file_name} no longer exists, skipping...")
                 return
             
+            # Skip content that was already ingested under another name
+            content_hash = hash_file(Path(file_path))
+            if self.catalog.is_processed(content_hash):
+                print(f"✅ Identical content already processed, skipping {file_name}...")
+                self.catalog.register(Path(file_path), sha256=content_hash)
+                self.catalog.mark_processed(file_name)
+                return
+            self.catalog.register(Path(file_path), sha256=content_hash)
+            self.catalog.mark_processing(file_name)
+            
             print(f"📄 Loading file: {file_name}")
             loader = EnhancedDocumentLoader()
+            start = time.perf_counter()
             new_documents = loader.load_document_with_tables(str(file_path))
+            extraction_seconds = time.perf_counter() - start
             
             print(f"📄 Loaded {len(new_documents)} documents from {file_name}")
             
             if not new_documents:
                 print(f"⚠️ No documents loaded from {file_name}")
+                self.catalog.mark_failed(file_name, "No documents loaded")
                 return
             
             # Split the new documents
-            new_chunks = split_text(new_documents)
+            new_chunks = deduplicate(split_text(new_documents))
             print(f"📄 Split into {len(new_chunks)} chunks")
             
             # Add to existing database
             print("💾 Adding to existing database...")
             try:
-                save_to_chroma(new_chunks)
+                start = time.perf_counter()
+                upsert_documents(new_chunks, new_documents, {str(file_path): loader.tables})
+                embedding_seconds = time.perf_counter() - start
                 print(f"✅ Successfully added {len(new_chunks)} chunks to database")
                 
                 # Mark as processed
-                self.processed_files.add(file_name)
-                self._save_processed_files()
+                self.catalog.mark_processed(file_name, page_count=page_count(new_documents),
+                                            document_count=len(new_documents), chunk_count=len(new_chunks),
+                                            extraction_seconds=extraction_seconds,
+                                            embedding_seconds=embedding_seconds)
                 print(f"✅ {file_name} marked as processed")
                 
             except Exception as db_error:
                 print(f"❌ Error adding to database: {db_error}")
+                self.catalog.mark_failed(file_name, str(db_error))
                 import traceback
                 traceback.print_exc()
                 return
@@ -122,6 +128,8 @@ class FileHandler(FileSystemEventHandler):
             
         except Exception as e:
             print(f"❌ Processing error for {file_name}: {e}")
+            if self.catalog.get(file_name):
+                self.catalog.mark_failed(file_name, str(e))
             import traceback
             traceback.print_exc()
         finally:
@@ -130,7 +138,7 @@ class FileHandler(FileSystemEventHandler):
 def main():
     print("👀 Standalone File Watcher Started!")
     print(f"📁 Watching data/books for new .docx and .pdf files...")
-    print(f"🗄️ Database path: {CHROMA_PATH}")
+    print(f"🗄️ Vector store backend: {VECTOR_STORE_BACKEND}")
     print("⏹️  Press Ctrl+C to stop")
     print("📋 Only new files will be processed (already processed files will be skipped)")
     print()
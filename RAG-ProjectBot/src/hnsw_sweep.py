@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+HNSW recall/latency sweep for the Chroma collection
+Rebuilds temporary in-memory collections from the stored embeddings for every (M, construction_ef, search_ef)
+combination and reports recall@k against exact brute-force search plus p50/p99 query latency
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import argparse
+import itertools
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+script_dir = Path(__file__).parent.absolute()
+sys.path.insert(0, str(script_dir))
+os.chdir(script_dir)
+
+from vector_store import HNSW_SPACE, default_store_path, get_embedding_function
+
+ADD_BATCH_SIZE = 5000
+
+
+def load_collection(path: Optional[str] = None) -> Tuple[List[str], np.ndarray, Optional[str]]:
+    """All ids and embeddings from the persisted Chroma collection (the live index version by default),
+    plus the hnsw:space it was built with"""
+    import chromadb
+    path = path or default_store_path("chroma")
+    client = chromadb.PersistentClient(path=path)
+    collections = client.list_collections()
+    if not collections:
+        raise RuntimeError(f"No Chroma collection found at {path}")
+    names = [collection.name for collection in collections]
+    collection = client.get_collection("langchain" if "langchain" in names else names[0])
+    data = collection.get(include=["embeddings"])
+    return data["ids"], np.asarray(data["embeddings"], dtype=np.float32), (collection.metadata or {}).get("hnsw:space")
+
+
+def exact_top_k(vectors: np.ndarray, queries: np.ndarray, k: int, space: str) -> np.ndarray:
+    """Brute-force ground truth row indices for each query, best first"""
+    if space == "l2":
+        scores = -(np.sum(queries ** 2, axis=1, keepdims=True) - 2 * queries @ vectors.T + np.sum(vectors ** 2, axis=1))
+    elif space == "cosine":
+        normed = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+        scores = queries / np.maximum(np.linalg.norm(queries, axis=1, keepdims=True), 1e-12) @ normed.T
+    else:
+        scores = queries @ vectors.T
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    return np.take_along_axis(top, np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1), axis=1)
+
+
+def measure_config(ids: List[str], vectors: np.ndarray, queries: np.ndarray, truth: np.ndarray, k: int,
+                   space: str, m: int, construction_ef: int, search_ef: int) -> Dict:
+    import chromadb
+    client = chromadb.EphemeralClient()
+    name = f"sweep_{uuid.uuid4().hex[:12]}"
+    collection = client.create_collection(name, metadata={
+        "hnsw:space": space, "hnsw:M": m, "hnsw:construction_ef": construction_ef, "hnsw:search_ef": search_ef,
+    })
+    try:
+        start = time.perf_counter()
+        for i in range(0, len(ids), ADD_BATCH_SIZE):
+            collection.add(ids=ids[i:i + ADD_BATCH_SIZE], embeddings=vectors[i:i + ADD_BATCH_SIZE].tolist())
+        build_seconds = time.perf_counter() - start
+
+        row_of = {doc_id: row for row, doc_id in enumerate(ids)}
+        latencies = []
+        hits = 0
+        for query, expected in zip(queries, truth):
+            start = time.perf_counter()
+            result = collection.query(query_embeddings=[query.tolist()], n_results=k, include=[])
+            latencies.append(time.perf_counter() - start)
+            found = {row_of[doc_id] for doc_id in result["ids"][0]}
+            hits += len(found & set(expected.tolist()))
+    finally:
+        client.delete_collection(name)
+
+    latencies_ms = np.asarray(latencies) * 1000
+    return {
+        "space": space, "M": m, "construction_ef": construction_ef, "search_ef": search_ef,
+        f"recall@{k}": hits / (len(queries) * k),
+        "p50_ms": float(np.percentile(latencies_ms, 50)),
+        "p99_ms": float(np.percentile(latencies_ms, 99)),
+        "build_seconds": build_seconds,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep Chroma HNSW parameters on our own collection")
+    parser.add_argument("--chroma-path", default=default_store_path("chroma"), help="Default: the live index version")
+    parser.add_argument("--queries", help="Text file with one question per line (default: sample stored vectors)")
+    parser.add_argument("--sample", type=int, default=200,
+                        help="Stored vectors held out of the swept index and used as queries when --queries is not given")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--space", choices=["l2", "cosine", "ip"], help="Default: the collection's stored hnsw:space")
+    parser.add_argument("--m", type=int, nargs="+", default=[8, 16, 32])
+    parser.add_argument("--construction-ef", type=int, nargs="+", default=[100, 200])
+    parser.add_argument("--search-ef", type=int, nargs="+", default=[10, 50, 100])
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    ids, vectors, stored_space = load_collection(args.chroma_path)
+    args.space = args.space or stored_space or HNSW_SPACE
+    print(f"Loaded {len(ids)} vectors of dimension {vectors.shape[1]} (space {args.space})")
+
+    if args.queries:
+        with open(args.queries) as f:
+            questions = [line.strip() for line in f if line.strip()]
+        queries = np.asarray(get_embedding_function().embed_documents(questions), dtype=np.float32)
+    else:
+        # Held-out rows: a query left in the index would find itself at distance 0 and inflate recall
+        rng = np.random.default_rng(0)
+        held_out = rng.choice(len(ids), size=min(args.sample, len(ids) - 1), replace=False)
+        queries = vectors[held_out]
+        keep = np.setdiff1d(np.arange(len(ids)), held_out)
+        ids, vectors = [ids[row] for row in keep], vectors[keep]
+    k = min(args.k, len(ids))
+    truth = exact_top_k(vectors, queries, k, args.space)
+
+    results = []
+    print(f"{'M':>4}{'c_ef':>6}{'s_ef':>6}{'recall@' + str(k):>11}{'p50 ms':>9}{'p99 ms':>9}{'build s':>9}")
+    for m, construction_ef, search_ef in itertools.product(args.m, args.construction_ef, args.search_ef):
+        row = measure_config(ids, vectors, queries, truth, k, args.space, m, construction_ef, search_ef)
+        results.append(row)
+        print(f"{m:>4}{construction_ef:>6}{search_ef:>6}{row[f'recall@{k}']:>11.3f}{row['p50_ms']:>9.2f}{row['p99_ms']:>9.2f}{row['build_seconds']:>9.1f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Self-contained bundles of embedded chunks: chunks.jsonl (id, text, metadata), vectors.npy, parents.jsonl,
+the typed tables (tables/) and a manifest with the embedding model and a SHA-256 checksum per file
+Shard builds write one bundle each and the merge step loads them into a store without re-embedding;
+index_snapshot.py uses the same format to copy a live index to replicas
+"""
+
+import os
+import json
+import time
+import shutil
+import hashlib
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+from langchain.schema import Document
+from vector_store import embedding_model_name
+from table_store import TableStore, TablesBySource, write_tables
+
+BUNDLE_FORMAT = 1
+MANIFEST_FILENAME = "manifest.json"
+CHUNKS_FILENAME = "chunks.jsonl"
+VECTORS_FILENAME = "vectors.npy"
+PARENTS_FILENAME = "parents.jsonl"
+TABLES_DIRNAME = "tables"
+
+
+@dataclass
+class Bundle:
+    manifest: Dict
+    ids: List[str]
+    texts: List[str]
+    metadatas: List[Dict]
+    vectors: np.ndarray
+    parents: List[Document] = field(default_factory=list)
+    tables: Optional[TablesBySource] = None  # None for bundles written without tables
+
+    def chunks(self) -> List[Document]:
+        return [Document(page_content=text, metadata=metadata) for text, metadata in zip(self.texts, self.metadatas)]
+
+
+def file_sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _write_jsonl(path: Path, rows):
+    with open(path, "w", encoding="utf-8") as f:
+        for row in rows:
+            f.write(json.dumps(row, ensure_ascii=False) + "\n")
+
+
+def _read_jsonl(path: Path) -> List[Dict]:
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def write_bundle(path: str, ids: List[str], texts: List[str], metadatas: List[Dict], vectors: np.ndarray,
+                 parents: Optional[List[Document]] = None, info: Optional[Dict] = None,
+                 tables: Optional[TablesBySource] = None) -> Dict:
+    """Write a bundle into a temporary directory and move it into place, replacing any previous bundle at path"""
+    if not (len(ids) == len(texts) == len(metadatas) == len(vectors)):
+        raise ValueError("ids, texts, metadatas and vectors must have the same length")
+    target = Path(path)
+    temp_dir = target.with_name(f".{target.name}.{os.getpid()}.tmp")
+    shutil.rmtree(temp_dir, ignore_errors=True)
+    temp_dir.mkdir(parents=True)
+    try:
+        _write_jsonl(temp_dir / CHUNKS_FILENAME, ({"id": doc_id, "text": text, "metadata": metadata}
+                                                 for doc_id, text, metadata in zip(ids, texts, metadatas)))
+        np.save(temp_dir / VECTORS_FILENAME, np.ascontiguousarray(vectors))
+        files = [CHUNKS_FILENAME, VECTORS_FILENAME]
+        if parents is not None:
+            _write_jsonl(temp_dir / PARENTS_FILENAME, ({"text": doc.page_content, "metadata": doc.metadata} for doc in parents))
+            files.append(PARENTS_FILENAME)
+        if tables is not None:
+            write_tables(str(temp_dir / TABLES_DIRNAME), tables)
+            if (temp_dir / TABLES_DIRNAME).is_dir():
+                files.extend(f"{TABLES_DIRNAME}/{entry.name}" for entry in sorted((temp_dir / TABLES_DIRNAME).iterdir()))
+
+        manifest = {
+            "format": BUNDLE_FORMAT,
+            "created_at": time.time(),
+            "embedding_model": embedding_model_name(),
+            "count": len(ids),
+            "dim": int(vectors.shape[1]) if len(vectors) else 0,
+            "dtype": str(vectors.dtype),
+            "parents": len(parents) if parents is not None else None,
+            "tables": sum(len(source_tables) for source_tables in tables.values()) if tables is not None else None,
+            "checksums": {name: file_sha256(temp_dir / name) for name in files},
+            **(info or {}),
+        }
+        with open(temp_dir / MANIFEST_FILENAME, "w") as f:
+            json.dump(manifest, f, indent=2)
+
+        if target.exists():
+            shutil.rmtree(target)
+        os.replace(temp_dir, target)
+        return manifest
+    except Exception:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        raise
+
+
+def read_manifest(path: str) -> Dict:
+    with open(Path(path) / MANIFEST_FILENAME) as f:
+        return json.load(f)
+
+
+def verify_bundle(path: str, manifest: Optional[Dict] = None):
+    """Raise if a file is missing or does not match its manifest checksum"""
+    manifest = manifest or read_manifest(path)
+    for name, checksum in manifest["checksums"].items():
+        file_path = Path(path) / name
+        if not file_path.exists():
+            raise ValueError(f"Bundle {path} is missing {name}")
+        if file_sha256(file_path) != checksum:
+            raise ValueError(f"Bundle {path}: checksum mismatch for {name}")
+
+
+def read_bundle(path: str, verify: bool = True) -> Bundle:
+    """Load a bundle; vectors are memory-mapped"""
+    manifest = read_manifest(path)
+    if manifest.get("format") != BUNDLE_FORMAT:
+        raise ValueError(f"Bundle {path} has unsupported format {manifest.get('format')}")
+    if verify:
+        verify_bundle(path, manifest)
+    rows = _read_jsonl(Path(path) / CHUNKS_FILENAME)
+    vectors = np.load(Path(path) / VECTORS_FILENAME, mmap_mode="r")
+    if len(rows) != manifest["count"] or len(vectors) != manifest["count"]:
+        raise ValueError(f"Bundle {path} holds {len(rows)} chunks and {len(vectors)} vectors, manifest says {manifest['count']}")
+    parents = []
+    if (Path(path) / PARENTS_FILENAME).exists():
+        parents = [Document(page_content=row["text"], metadata=row["metadata"]) for row in _read_jsonl(Path(path) / PARENTS_FILENAME)]
+    tables = None
+    if (Path(path) / TABLES_DIRNAME).is_dir():
+        tables = TableStore(str(Path(path) / TABLES_DIRNAME)).all_tables()
+    return Bundle(manifest, [row["id"] for row in rows], [row["text"] for row in rows],
+                  [row["metadata"] for row in rows], vectors, parents, tables)
+
+
+def check_compatible(manifests: List[Dict]):
+    """Raise unless every bundle was embedded with the same model and dimension as this process uses"""
+    model = embedding_model_name()
+    for manifest in manifests:
+        if manifest["embedding_model"] != model:
+            raise ValueError(f"Bundle embedded with {manifest['embedding_model']}, this index uses {model}")
+    dims = {manifest["dim"] for manifest in manifests if manifest["count"]}
+    if len(dims) > 1:
+        raise ValueError(f"Bundles have different vector dimensions: {sorted(dims)}")
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Portable snapshots of the live index for bootstrapping replicas and dev boxes
+`export` writes the live version's chunk ids, texts, metadata, vectors (float32, or float16 at half the size),
+parent pages and tables as an index bundle; `import` loads a bundle into a new version of any supported store with
+batched writes and promotes it, so a replica comes up without OCR or embedding
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+script_dir = Path(__file__).parent.absolute()
+sys.path.insert(0, str(script_dir))
+os.chdir(script_dir)
+
+from index_bundle import write_bundle, read_bundle, check_compatible
+from index_versions import current_version, create_version, vector_path, docstore_path, table_store_path, promote, discard
+from index_writer import writer_lock
+from parent_retrieval import ParentDocstore, DOCSTORE_PATH
+from table_store import TableStore, default_table_store_path, write_tables
+from vector_store import open_vector_store, validate_store, hnsw_metadata, VECTOR_STORE_BACKEND
+
+SNAPSHOT_DTYPES = {"float32": np.float32, "float16": np.float16}
+
+
+def export_snapshot(path: str, dtype: str = "float32", backend: str = VECTOR_STORE_BACKEND) -> dict:
+    """Write the live index (vectors, parents and tables) to a bundle at path"""
+    # Read vectors and parents from one pinned version; the writer lock keeps it from being promoted away or pruned
+    with writer_lock():
+        version = current_version()
+        store = open_vector_store(backend=backend, path=vector_path(version, backend) if version else None)
+        if not store.exists():
+            raise RuntimeError(f"No {backend} index at {store.path}")
+        ids, texts, metadatas, vectors = store.export_vectors()
+        parents = ParentDocstore(docstore_path(version) if version else DOCSTORE_PATH).all_documents()
+        tables = TableStore(default_table_store_path(version)).all_tables()
+        hnsw_config = store.stored_hnsw_config() if backend == "chroma" else None
+    return write_bundle(path, ids, texts, metadatas, vectors.astype(SNAPSHOT_DTYPES[dtype]), parents=parents, tables=tables,
+                        info={"kind": "snapshot", "source_backend": backend, "source_version": version,
+                              "hnsw_config": hnsw_config})
+
+
+def import_snapshot(path: str, backend: str = VECTOR_STORE_BACKEND, verify: bool = True) -> str:
+    """Load a bundle into a new index version, validate it and make it live; returns the version"""
+    bundle = read_bundle(path, verify=verify)
+    check_compatible([bundle.manifest])
+    with writer_lock():
+        version = create_version()
+        try:
+            # A Chroma collection is rebuilt with the source's space, M and ef rather than this host's defaults
+            hnsw_config = {**hnsw_metadata(), **(bundle.manifest.get("hnsw_config") or {})}
+            store = open_vector_store(backend=backend, path=vector_path(version, backend), hnsw_config=hnsw_config)
+            store.rebuild_from_vectors(bundle.ids, bundle.texts, bundle.metadatas, bundle.vectors)
+            docstore = ParentDocstore(docstore_path(version))
+            if bundle.parents:
+                docstore.add_documents(bundle.parents)
+            if bundle.tables is not None:
+                write_tables(table_store_path(version), bundle.tables)
+            smoke_queries = random.Random(0).sample(bundle.texts, min(3, len(bundle.texts)))
+            validate_store(store, len(bundle.ids), smoke_queries)
+            promote(version)
+            return version
+        except Exception:
+            discard(version)
+            raise
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the live index to a portable snapshot or import one")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    export_parser = subparsers.add_parser("export", help="Write the live index to a snapshot directory")
+    export_parser.add_argument("path")
+    export_parser.add_argument("--dtype", choices=sorted(SNAPSHOT_DTYPES), default="float32",
+                               help="float16 halves the vector file at a small precision cost")
+    export_parser.add_argument("--backend", default=VECTOR_STORE_BACKEND, choices=["chroma", "flat"])
+    import_parser = subparsers.add_parser("import", help="Load a snapshot into a new live index version")
+    import_parser.add_argument("path")
+    import_parser.add_argument("--backend", default=VECTOR_STORE_BACKEND, choices=["chroma", "flat"])
+    import_parser.add_argument("--no-verify", action="store_true", help="Skip checksum verification")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    if args.command == "export":
+        manifest = export_snapshot(args.path, args.dtype, args.backend)
+        print(f"✅ Exported {manifest['count']} chunks ({manifest['dtype']}, {manifest['parents']} parents, "
+              f"{manifest['tables']} tables) "
+              f"to {args.path} in {time.perf_counter() - start:.1f}s")
+    else:
+        version = import_snapshot(args.path, args.backend, verify=not args.no_verify)
+        print(f"✅ Imported {args.path} as version {version} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
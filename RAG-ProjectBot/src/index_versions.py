@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Blue/green index versions: every rebuild goes into a new directory under indexes/, is validated,
+and is then made live by atomically replacing the indexes/CURRENT pointer file
+Serving processes compare the pointer with the version they loaded and hot-reload when it moves
+"""
+
+import os
+import sys
+import time
+import uuid
+import shutil
+import argparse
+from pathlib import Path
+from typing import List, Optional
+
+INDEX_ROOT = "indexes"
+POINTER_FILE = os.path.join(INDEX_ROOT, "CURRENT")
+KEEP_VERSIONS = int(os.environ.get("INDEX_KEEP_VERSIONS", "3"))  # Previous versions kept for rollback
+DOCSTORE_FILENAME = "parent_docstore.db"
+TABLES_DIRNAME = "tables"
+
+
+def current_version() -> Optional[str]:
+    """Name of the live version, or None before the first versioned build"""
+    try:
+        with open(POINTER_FILE) as f:
+            version = f.read().strip()
+    except FileNotFoundError:
+        return None
+    return version or None
+
+
+def version_dir(version: str) -> str:
+    return os.path.join(INDEX_ROOT, version)
+
+
+def vector_path(version: str, backend: str) -> str:
+    return os.path.join(version_dir(version), backend)
+
+
+def docstore_path(version: str) -> str:
+    return os.path.join(version_dir(version), DOCSTORE_FILENAME)
+
+
+def table_store_path(version: str) -> str:
+    return os.path.join(version_dir(version), TABLES_DIRNAME)
+
+
+def create_version() -> str:
+    """Reserve a new, empty version directory; names sort by creation time"""
+    version = time.strftime("%Y%m%d-%H%M%S") + "-" + uuid.uuid4().hex[:6]
+    os.makedirs(version_dir(version))
+    return version
+
+
+def list_versions() -> List[str]:
+    if not os.path.isdir(INDEX_ROOT):
+        return []
+    return sorted(entry.name for entry in os.scandir(INDEX_ROOT) if entry.is_dir())
+
+
+def promote(version: str, keep: int = KEEP_VERSIONS):
+    """Atomically point CURRENT at version, then prune versions beyond the newest `keep` older ones"""
+    if not os.path.isdir(version_dir(version)):
+        raise ValueError(f"Unknown index version: {version}")
+    temp_path = f"{POINTER_FILE}.{uuid.uuid4().hex}.tmp"
+    with open(temp_path, "w") as f:
+        f.write(version)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, POINTER_FILE)
+    prune(keep)
+
+
+def discard(version: str):
+    """Remove a version that failed validation"""
+    if version != current_version():
+        shutil.rmtree(version_dir(version), ignore_errors=True)
+
+
+def prune(keep: int = KEEP_VERSIONS):
+    live = current_version()
+    older = [version for version in list_versions() if version != live and (live is None or version < live)]
+    for version in older[:max(len(older) - keep, 0)]:
+        shutil.rmtree(version_dir(version), ignore_errors=True)
+
+
+def rollback(to_version: Optional[str] = None) -> str:
+    """Point CURRENT back at to_version, or at the newest version older than the live one"""
+    if to_version is None:
+        live = current_version()
+        older = [version for version in list_versions() if live is None or version < live]
+        if not older:
+            raise RuntimeError("No previous index version to roll back to")
+        to_version = older[-1]
+    promote(to_version)
+    return to_version
+
+
+def main():
+    script_dir = Path(__file__).parent.absolute()
+    sys.path.insert(0, str(script_dir))
+    os.chdir(script_dir)
+
+    parser = argparse.ArgumentParser(description="Inspect, roll back or promote index versions")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("list", help="List index versions")
+    rollback_parser = subparsers.add_parser("rollback", help="Make a previous version live")
+    rollback_parser.add_argument("--to", help="Version to roll back to (default: the previous one)")
+    promote_parser = subparsers.add_parser("promote", help="Make a version live")
+    promote_parser.add_argument("version")
+    args = parser.parse_args()
+
+    if args.command == "list":
+        live = current_version()
+        for version in list_versions():
+            print(f"{'*' if version == live else ' '} {version}")
+    elif args.command == "rollback":
+        print(f"✅ Rolled back to {rollback(args.to)}")
+    elif args.command == "promote":
+        promote(args.version)
+        print(f"✅ Promoted {args.version}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Single-writer coordination for the index across api.py, file_watcher.py, chatbot.py and create_database.py
+Every write holds an exclusive lock file under indexes/, so only one process builds or updates an index at a time.
+Incremental upserts are queued per process, batched, applied to a copy of the live version and promoted atomically,
+so readers keep serving the previous version and never wait on a writer.
+Each batch copies the whole live index and parent docstore (O(corpus) disk I/O, and about KEEP_VERSIONS + 1 times the
+index size on disk), so the batch window grows with the time the last batch took and one copy covers more uploads
+"""
+
+import os
+import time
+import queue
+import random
+import shutil
+import threading
+from concurrent.futures import Future
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+from langchain.schema import Document
+from index_versions import INDEX_ROOT, create_version, vector_path, docstore_path, table_store_path, promote, discard
+from vector_store import open_vector_store, validate_store, default_store_path, VECTOR_STORE_BACKEND
+from parent_retrieval import ParentDocstore
+from table_store import default_table_store_path, write_tables
+from dedup import chunk_signatures, match_signatures, link_metadata, DEDUP_ENABLED
+
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
+
+WRITER_LOCK_PATH = os.path.join(INDEX_ROOT, ".writer.lock")
+LOCK_TIMEOUT = float(os.environ.get("INDEX_WRITER_LOCK_TIMEOUT", "0"))  # Seconds; 0 waits indefinitely
+LOCK_POLL_SECONDS = 0.5
+WRITE_BATCH_SECONDS = float(os.environ.get("INDEX_WRITE_BATCH_SECONDS", "2"))  # How long queued upserts are collected
+WRITE_BATCH_MAX_SECONDS = float(os.environ.get("INDEX_WRITE_BATCH_MAX_SECONDS", "30"))  # Cap for the adaptive window
+WRITE_BATCH_MAX_CHUNKS = 20000
+
+
+@contextmanager
+def writer_lock(timeout: float = LOCK_TIMEOUT):
+    """Hold the cross-process index writer lock; waits while another process is writing"""
+    os.makedirs(INDEX_ROOT, exist_ok=True)
+    with open(WRITER_LOCK_PATH, "a+") as lock_file:
+        if not FCNTL_AVAILABLE:
+            print("⚠️ fcntl not available, index writes are not coordinated across processes")
+            yield
+            return
+
+        deadline = time.monotonic() + timeout if timeout else None
+        waiting = False
+        while True:
+            try:
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                break
+            except BlockingIOError:
+                if not waiting:
+                    lock_file.seek(0)
+                    print(f"⏳ Waiting for index writer lock (held by pid {lock_file.read().strip() or 'unknown'})...")
+                    waiting = True
+                if deadline is not None and time.monotonic() > deadline:
+                    raise TimeoutError(f"Index writer lock not acquired within {timeout}s")
+                time.sleep(LOCK_POLL_SECONDS)
+
+        try:
+            lock_file.seek(0)
+            lock_file.truncate()
+            lock_file.write(str(os.getpid()))
+            lock_file.flush()
+            yield
+        finally:
+            lock_file.seek(0)
+            lock_file.truncate()
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+def apply_upserts(chunks: List[Document], documents: List[Document], backend: str = VECTOR_STORE_BACKEND,
+                  tables: Optional[Dict] = None) -> str:
+    """Replace every chunk and parent of the given sources in a new version copied from the live one,
+    validate it and promote it. Tables are replaced for the sources in `tables`. Returns the new version."""
+    sources = {doc.metadata.get("source") for doc in list(chunks) + list(documents)}
+    with writer_lock():
+        live_path = default_store_path(backend)
+        live_docstore = ParentDocstore().path
+        live_tables = default_table_store_path()
+        version = create_version()
+        try:
+            path = vector_path(version, backend)
+            if os.path.exists(live_path):
+                shutil.copytree(live_path, path)
+            store = open_vector_store(backend=backend, path=path)
+            before = store.count() if store.exists() else 0
+            removed = store.delete_sources(sources) if before else 0
+            linked = 0
+            if DEDUP_ENABLED and before:
+                chunks, linked = link_stored_duplicates(store, chunks)
+            if chunks:
+                store.add_documents(chunks)
+
+            if os.path.exists(live_docstore):
+                shutil.copyfile(live_docstore, docstore_path(version))
+            ParentDocstore(docstore_path(version)).add_documents(documents)
+            if os.path.isdir(live_tables):
+                shutil.copytree(live_tables, table_store_path(version))
+            write_tables(table_store_path(version), tables or {})
+
+            smoke_queries = [chunk.page_content for chunk in random.Random(0).sample(chunks, min(3, len(chunks)))]
+            validate_store(store, before - removed + len(chunks), smoke_queries)
+            promote(version)
+            print(f"✅ Upserted {len(chunks)} chunks from {len(sources)} sources (replaced {removed}, "
+                  f"{linked} linked to stored duplicates), version {version} is live")
+            return version
+        except Exception:
+            discard(version)
+            raise
+
+
+def link_stored_duplicates(store, chunks: List[Document]) -> Tuple[List[Document], int]:
+    """Drop new chunks that near-duplicate a chunk already in the store, adding their citations to it instead,
+    so a new version of a document does not re-embed the text it shares with other documents"""
+    ids, texts, metadatas = store.metadata_records()
+    if not ids or not chunks:
+        return chunks, 0
+    matches = match_signatures(chunk_signatures([chunk.page_content for chunk in chunks], [chunk.metadata for chunk in chunks]),
+                               chunk_signatures(texts, metadatas))
+    updates = {}
+    new_chunks = []
+    for chunk, match in zip(chunks, matches):
+        if match is None:
+            new_chunks.append(chunk)
+        else:
+            updates[match] = link_metadata(updates.get(match, metadatas[match]), chunk.metadata)
+    store.update_metadatas([ids[row] for row in updates], list(updates.values()))
+    return new_chunks, len(chunks) - len(new_chunks)
+
+
+class IndexWriter:
+    """Per-process queue of upserts; a background thread applies them in batches under the writer lock"""
+
+    def __init__(self, batch_seconds: float = WRITE_BATCH_SECONDS, max_chunks: int = WRITE_BATCH_MAX_CHUNKS,
+                 max_batch_seconds: float = WRITE_BATCH_MAX_SECONDS):
+        self.batch_seconds = batch_seconds
+        self.max_chunks = max_chunks
+        self.max_batch_seconds = max_batch_seconds
+        self.last_apply_seconds = 0.0
+        self._queue: "queue.Queue[Tuple[List[Document], List[Document], Optional[Dict], Future]]" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="index-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, chunks: List[Document], documents: List[Document], tables: Optional[Dict] = None) -> Future:
+        """Queue chunks, parents and (optionally) tables by source for one or more sources;
+        the future resolves to the promoted version"""
+        future = Future()
+        self._queue.put((list(chunks), list(documents), tables, future))
+        return future
+
+    def _collect(self) -> List[Tuple[List[Document], List[Document], Optional[Dict], Future]]:
+        batch = [self._queue.get()]
+        total_chunks = len(batch[0][0])
+        # On a large index the copy dominates each batch; wait about as long as the last one took so uploads coalesce
+        window = min(max(self.batch_seconds, self.last_apply_seconds), max(self.max_batch_seconds, self.batch_seconds))
+        deadline = time.monotonic() + window
+        while total_chunks < self.max_chunks:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(item)
+            total_chunks += len(item[0])
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            futures = [future for _, _, _, future in batch if future.set_running_or_notify_cancel()]
+            # A later submission for the same source supersedes an earlier one in the batch
+            chunks_by_source, documents_by_source, tables_by_source = {}, {}, {}
+            for chunks, documents, tables, _ in batch:
+                sources = {doc.metadata.get("source") for doc in chunks + documents}
+                for source in sources:
+                    chunks_by_source[source] = [chunk for chunk in chunks if chunk.metadata.get("source") == source]
+                    documents_by_source[source] = [doc for doc in documents if doc.metadata.get("source") == source]
+                    tables_by_source.pop(source, None)
+                tables_by_source.update(tables or {})
+            chunks = [chunk for group in chunks_by_source.values() for chunk in group]
+            documents = [doc for group in documents_by_source.values() for doc in group]
+            start = time.monotonic()
+            try:
+                version = apply_upserts(chunks, documents, tables=tables_by_source) if chunks else None
+                self.last_apply_seconds = time.monotonic() - start
+                for future in futures:
+                    future.set_result(version)
+            except Exception as e:
+                print(f"❌ Index upsert failed: {e}")
+                for future in futures:
+                    future.set_exception(e)
+
+
+_writer: Optional[IndexWriter] = None
+_writer_lock = threading.Lock()
+
+
+def get_index_writer() -> IndexWriter:
+    """Process-wide writer, started on first use"""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = IndexWriter()
+        return _writer
+
+
+def upsert_documents(chunks: List[Document], documents: List[Document], tables: Optional[Dict] = None,
+                     timeout: Optional[float] = None) -> Optional[str]:
+    """Queue an upsert and wait until it is live; returns the promoted version"""
+    return get_index_writer().submit(chunks, documents, tables).result(timeout)
@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+Generation backends behind one interface
+OllamaBackend talks to a single daemon, LoadBalancedBackend spreads requests over several with
+least-outstanding-requests routing, health checks and failover, and FakeBackend returns deterministic
+answers after a configurable delay so routing and concurrency can be load-tested without models
+"""
+
+import os
+import json
+import time
+import random
+import socket
+import hashlib
+import threading
+import urllib.request
+import urllib.error
+from functools import lru_cache
+from typing import Dict, List, Optional
+
+LLM_BACKEND = os.environ.get("LLM_BACKEND", "ollama")  # ollama | fake
+OLLAMA_BASE_URL = os.environ.get("OLLAMA_BASE_URL", "http://localhost:11434")
+OLLAMA_URLS = [url.strip().rstrip("/") for url in os.environ.get("OLLAMA_URLS", OLLAMA_BASE_URL).split(",") if url.strip()]
+CHAT_MODEL = os.environ.get("OLLAMA_MODEL", "llama3.2:3b")
+OLLAMA_KEEP_ALIVE = os.environ.get("OLLAMA_KEEP_ALIVE", "30m")  # Keep the model and its KV cache loaded between calls
+OLLAMA_NUM_CTX = int(os.environ.get("OLLAMA_NUM_CTX", "8192"))
+OLLAMA_TIMEOUT = float(os.environ.get("OLLAMA_TIMEOUT", "300"))
+MAX_CONCURRENCY_PER_BACKEND = int(os.environ.get("LLM_MAX_CONCURRENCY", "4"))  # In-flight generations per endpoint
+HEALTH_CHECK_SECONDS = float(os.environ.get("LLM_HEALTH_CHECK_SECONDS", "10"))
+FAILURES_BEFORE_DOWN = int(os.environ.get("LLM_FAILURES_BEFORE_DOWN", "3"))  # Consecutive failures that take an endpoint out
+FAKE_LATENCY_SECONDS = float(os.environ.get("FAKE_LLM_LATENCY", "0.5"))
+FAKE_LATENCY_JITTER = float(os.environ.get("FAKE_LLM_JITTER", "0.0"))
+
+
+class BackendUnavailable(Exception):
+    """The endpoint could not serve the request (connection error, 5xx); another one may"""
+
+
+class ModelNotFound(RuntimeError):
+    """The endpoint does not have the requested model pulled"""
+
+
+class LLMBackend:
+    """Interface shared by the generation backends; generate returns Ollama /api/generate fields"""
+    name: str = "backend"
+
+    def generate(self, prompt: str, model: str = CHAT_MODEL, system: Optional[str] = None,
+                 context: Optional[List[int]] = None, prefer: Optional[str] = None) -> Dict:
+        raise NotImplementedError
+
+    def healthy(self) -> bool:
+        return True
+
+
+class OllamaBackend(LLMBackend):
+    def __init__(self, base_url: str = OLLAMA_BASE_URL, timeout: float = OLLAMA_TIMEOUT):
+        self.base_url = base_url.rstrip("/")
+        self.name = self.base_url
+        self.timeout = timeout
+
+    def generate(self, prompt: str, model: str = CHAT_MODEL, system: Optional[str] = None,
+                 context: Optional[List[int]] = None, prefer: Optional[str] = None) -> Dict:
+        """Non-streaming /api/generate call; the reply carries the new `context` and prompt_eval_count"""
+        payload = {
+            "model": model,
+            "prompt": prompt,
+            "stream": False,
+            "keep_alive": OLLAMA_KEEP_ALIVE,
+            "options": {"num_ctx": OLLAMA_NUM_CTX},
+        }
+        if system:
+            payload["system"] = system
+        if context:
+            payload["context"] = context
+        request = urllib.request.Request(f"{self.base_url}/api/generate", data=json.dumps(payload).encode("utf-8"),
+                                         headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                result = json.load(response)
+        except urllib.error.HTTPError as e:
+            message = f"Ollama at {self.base_url} returned {e.code}: {e.read().decode('utf-8', 'replace')}"
+            if e.code >= 500:
+                raise BackendUnavailable(message) from e
+            if e.code == 404:
+                raise ModelNotFound(message) from e
+            raise RuntimeError(message) from e
+        except (TimeoutError, socket.timeout) as e:
+            # socket.timeout only became an alias of TimeoutError in Python 3.10
+            # A slow generation says nothing about the endpoint's health, and re-running it elsewhere doubles the cost
+            raise RuntimeError(f"Ollama at {self.base_url} timed out after {self.timeout}s") from e
+        except urllib.error.URLError as e:
+            if isinstance(e.reason, (TimeoutError, socket.timeout)):
+                raise RuntimeError(f"Ollama at {self.base_url} timed out after {self.timeout}s") from e
+            raise BackendUnavailable(f"Ollama at {self.base_url} unreachable: {e}") from e
+        except OSError as e:
+            raise BackendUnavailable(f"Ollama at {self.base_url} unreachable: {e}") from e
+        result["backend"] = self.name
+        return result
+
+    def healthy(self) -> bool:
+        try:
+            with urllib.request.urlopen(f"{self.base_url}/api/tags", timeout=2) as response:
+                return response.status == 200
+        except (urllib.error.URLError, OSError):
+            return False
+
+
+class FakeBackend(LLMBackend):
+    """Deterministic stand-in: the answer and token counts depend only on the prompt, after a fixed delay"""
+
+    def __init__(self, latency: float = FAKE_LATENCY_SECONDS, jitter: float = FAKE_LATENCY_JITTER,
+                 name: str = "fake", seed: int = 0):
+        self.latency = latency
+        self.jitter = jitter
+        self.name = name
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def generate(self, prompt: str, model: str = CHAT_MODEL, system: Optional[str] = None,
+                 context: Optional[List[int]] = None, prefer: Optional[str] = None) -> Dict:
+        with self._lock:
+            delay = self.latency + (self._random.uniform(-self.jitter, self.jitter) if self.jitter else 0.0)
+        time.sleep(max(delay, 0.0))
+        tokens = [len(word) for word in ((system or "") + " " + prompt).split()]
+        digest = hashlib.sha1(prompt.encode("utf-8")).hexdigest()[:12]
+        answer = f"[{model} via {self.name}] answer {digest}"
+        return {
+            "response": answer,
+            "context": list(context or []) + tokens + [len(word) for word in answer.split()],
+            "prompt_eval_count": len(tokens),
+            "eval_count": len(answer.split()),
+            "backend": self.name,
+        }
+
+
+class LoadBalancedBackend(LLMBackend):
+    """Least-outstanding-requests routing over several endpoints with a per-endpoint concurrency cap.
+    Endpoints that fail FAILURES_BEFORE_DOWN times in a row are skipped until a background health check sees
+    them answer again; the last available endpoint is never taken out."""
+    name = "balanced"
+
+    def __init__(self, backends: List[LLMBackend], max_concurrency: int = MAX_CONCURRENCY_PER_BACKEND,
+                 health_check_seconds: float = HEALTH_CHECK_SECONDS, failures_before_down: int = FAILURES_BEFORE_DOWN):
+        if not backends:
+            raise ValueError("At least one backend is required")
+        self.backends = backends
+        self.max_concurrency = max_concurrency
+        self.outstanding = {backend.name: 0 for backend in backends}
+        self.available = {backend.name: True for backend in backends}
+        self.served = {backend.name: 0 for backend in backends}
+        self.failures = {backend.name: 0 for backend in backends}
+        self.consecutive_failures = {backend.name: 0 for backend in backends}
+        self.failures_before_down = failures_before_down
+        self._condition = threading.Condition()
+        if health_check_seconds > 0:
+            threading.Thread(target=self._health_loop, args=(health_check_seconds,), name="llm-health", daemon=True).start()
+
+    @property
+    def capacity(self) -> int:
+        """Generations that can run at once across all endpoints"""
+        return self.max_concurrency * len(self.backends)
+
+    def _acquire(self, exclude: set, prefer: Optional[str]) -> LLMBackend:
+        with self._condition:
+            while True:
+                candidates = [backend for backend in self.backends
+                              if backend.name not in exclude and self.available[backend.name]]
+                if not candidates:
+                    raise BackendUnavailable("No healthy LLM backend available")
+                free = [backend for backend in candidates if self.outstanding[backend.name] < self.max_concurrency]
+                if free:
+                    # Stay on the endpoint that holds the caller's KV cache unless it is full
+                    chosen = next((backend for backend in free if backend.name == prefer), None) \
+                        or min(free, key=lambda backend: self.outstanding[backend.name])
+                    self.outstanding[chosen.name] += 1
+                    return chosen
+                self._condition.wait()
+
+    def _release(self, backend: LLMBackend, failed: bool):
+        with self._condition:
+            self.outstanding[backend.name] -= 1
+            if failed:
+                self.failures[backend.name] += 1
+                self.consecutive_failures[backend.name] += 1
+                if self.consecutive_failures[backend.name] >= self.failures_before_down:
+                    self._mark_down(backend.name)
+            else:
+                self.served[backend.name] += 1
+                self.consecutive_failures[backend.name] = 0
+            self._condition.notify_all()
+
+    def _mark_down(self, name: str):
+        """Take an endpoint out of rotation unless it is the only one left; caller holds the condition"""
+        if self.available[name] and sum(self.available.values()) > 1:
+            print(f"⚠️ LLM backend {name} marked unavailable")
+            self.available[name] = False
+
+    def generate(self, prompt: str, model: str = CHAT_MODEL, system: Optional[str] = None,
+                 context: Optional[List[int]] = None, prefer: Optional[str] = None) -> Dict:
+        tried = set()
+        last_error = None
+        while True:
+            try:
+                backend = self._acquire(tried, prefer)
+            except BackendUnavailable:
+                # Every endpoint was tried: report what actually went wrong
+                if last_error is not None:
+                    raise last_error
+                raise
+            try:
+                result = backend.generate(prompt, model=model, system=system, context=context)
+            except BackendUnavailable as e:
+                print(f"⚠️ {e}; failing over")
+                self._release(backend, failed=True)
+                tried.add(backend.name)
+                last_error = e
+                continue
+            except Exception:
+                self._release(backend, failed=False)
+                raise
+            self._release(backend, failed=False)
+            return result
+
+    def healthy(self) -> bool:
+        return any(self.available.values())
+
+    def check_health(self):
+        for backend in self.backends:
+            ok = backend.healthy()
+            with self._condition:
+                if ok:
+                    if not self.available[backend.name]:
+                        print(f"✅ LLM backend {backend.name} is back")
+                    self.available[backend.name] = True
+                    self.consecutive_failures[backend.name] = 0
+                else:
+                    self._mark_down(backend.name)
+                self._condition.notify_all()
+
+    def _health_loop(self, interval: float):
+        while True:
+            time.sleep(interval)
+            self.check_health()
+
+    def stats(self) -> Dict:
+        with self._condition:
+            return {backend.name: {"outstanding": self.outstanding[backend.name], "available": self.available[backend.name],
+                                   "served": self.served[backend.name], "failures": self.failures[backend.name]}
+                    for backend in self.backends}
+
+
+@lru_cache(maxsize=1)
+def get_llm_backend() -> LoadBalancedBackend:
+    """Process-wide backend from LLM_BACKEND/OLLAMA_URLS (FAKE_LLM_LATENCY for the fake backend)"""
+    if LLM_BACKEND == "fake":
+        backends = [FakeBackend(name=f"fake-{i}", seed=i) for i in range(len(OLLAMA_URLS))]
+    elif LLM_BACKEND == "ollama":
+        backends = [OllamaBackend(url) for url in OLLAMA_URLS]
+    else:
+        raise ValueError(f"Unknown LLM backend: {LLM_BACKEND}")
+    return LoadBalancedBackend(backends)
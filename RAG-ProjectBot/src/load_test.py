@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+HTTP load generator for the FastAPI service
+Replays a question corpus against /query and upload files against /upload and /process-document, either with a
+fixed number of concurrent clients or at a Poisson arrival rate, and reports throughput, latency percentiles,
+error and 429 rates and the server's event-loop lag. --launch starts the API itself with the fake LLM backend.
+Uploads land in data/books, so point this at a scratch deployment.
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import argparse
+import threading
+import subprocess
+import urllib.parse
+import urllib.request
+import urllib.error
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+script_dir = Path(__file__).parent.absolute()
+
+DEFAULT_URL = "http://localhost:8000"
+REQUEST_TIMEOUT = 600
+DEFAULT_MIX = "query=1"
+ENDPOINTS = {"query": "/query", "upload": "/upload", "process": "/process-document"}
+
+
+def percentile(values: List[float], q: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(int(q * len(ordered)), len(ordered) - 1)]
+
+
+def load_questions(path: str) -> List[str]:
+    """One question per line, or JSONL with a "question" field"""
+    questions = []
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            questions.append(json.loads(line)["question"] if line.startswith("{") else line)
+    if not questions:
+        raise ValueError(f"No questions in {path}")
+    return questions
+
+
+def parse_mix(mix: str) -> Dict[str, float]:
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        if name.strip() not in ENDPOINTS:
+            raise ValueError(f"Unknown endpoint {name!r} in --mix (use {', '.join(ENDPOINTS)})")
+        weights[name.strip()] = float(weight or 1)
+    return weights
+
+
+def multipart_body(filename: str, content: bytes) -> Tuple[bytes, str]:
+    boundary = uuid.uuid4().hex
+    body = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"{filename}\"\r\n"
+            f"Content-Type: application/octet-stream\r\n\r\n").encode("utf-8") + content + f"\r\n--{boundary}--\r\n".encode("utf-8")
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+def unique_upload(path: Path) -> Tuple[str, bytes]:
+    """A fresh name and a unique trailer so the API does not reject the replay as a duplicate (409).
+    Trailing bytes after %%EOF or the zip directory are ignored by PDF and DOCX readers."""
+    content = path.read_bytes() + f"\n%loadtest {uuid.uuid4().hex}\n".encode("ascii")
+    return f"loadtest_{uuid.uuid4().hex[:8]}_{path.name.replace(' ', '_')}", content
+
+
+class LoadTest:
+    def __init__(self, base_url: str, questions: List[str], upload_files: List[Path], mix: Dict[str, float], seed: int = 0):
+        self.base_url = base_url.rstrip("/")
+        self.questions = questions
+        self.upload_files = upload_files
+        self.mix = mix
+        self.random = random.Random(seed)
+        self.results: List[Dict] = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self._lock = threading.Lock()
+
+    def _next_request(self) -> Tuple[str, str, bytes, Dict[str, str]]:
+        with self._lock:
+            kind = self.random.choices(list(self.mix), weights=list(self.mix.values()))[0]
+            if kind == "query":
+                body = json.dumps({"question": self.random.choice(self.questions)}).encode("utf-8")
+                return kind, ENDPOINTS[kind], body, {"Content-Type": "application/json"}
+            path = self.random.choice(self.upload_files)
+        body, content_type = multipart_body(*unique_upload(path))
+        return kind, ENDPOINTS[kind], body, {"Content-Type": content_type}
+
+    def send_one(self, scheduled: Optional[float] = None):
+        """Latency runs from `scheduled` (a perf_counter time) when given, so time spent waiting for a free
+        client slot counts against the request instead of being hidden"""
+        kind, path, body, headers = self._next_request()
+        with self._lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        sent_at = time.perf_counter()
+        start = scheduled if scheduled is not None else sent_at
+        status, error = 0, None
+        try:
+            request = urllib.request.Request(self.base_url + path, data=body, headers=headers, method="POST")
+            with urllib.request.urlopen(request, timeout=REQUEST_TIMEOUT) as response:
+                response.read()
+                status = response.status
+        except urllib.error.HTTPError as e:
+            status, error = e.code, e.read()[:200].decode("utf-8", "replace")
+        except Exception as e:
+            error = str(e)
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            self.in_flight -= 1
+            self.results.append({"endpoint": kind, "status": status, "seconds": elapsed, "queued": sent_at - start,
+                                 "error": error, "finished": time.time()})
+
+    def run_closed(self, concurrency: int, duration: float, total: Optional[int]):
+        """`concurrency` clients each send their next request as soon as the previous one returns"""
+        deadline = time.monotonic() + duration
+        counter = iter(range(total)) if total else None
+
+        def client():
+            while time.monotonic() < deadline:
+                if counter is not None and next(counter, None) is None:
+                    return
+                self.send_one()
+
+        threads = [threading.Thread(target=client, daemon=True) for _ in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def run_open(self, rate: float, duration: float, total: Optional[int], max_in_flight: int):
+        """Poisson arrivals at `rate` per second regardless of how fast the server answers; each request is timed
+        from its scheduled arrival, so queueing behind `max_in_flight` shows up in the latencies"""
+        deadline = time.perf_counter() + duration
+        next_arrival = time.perf_counter()
+        sent = 0
+        with ThreadPoolExecutor(max_workers=max_in_flight) as pool:
+            while time.perf_counter() < deadline and (not total or sent < total):
+                next_arrival += self.random.expovariate(rate)
+                delay = next_arrival - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                pool.submit(self.send_one, next_arrival)
+                sent += 1
+
+
+def get_json(url: str) -> Optional[Dict]:
+    try:
+        with urllib.request.urlopen(url, timeout=10) as response:
+            return json.load(response)
+    except Exception:
+        return None
+
+
+def summarize(results: List[Dict], wall_seconds: float, loop_lag: Optional[Dict], config: Dict) -> Dict:
+    summary = {"config": config, "wall_seconds": wall_seconds, "endpoints": {}, "loop_lag": loop_lag}
+    for endpoint in ["all"] + sorted({result["endpoint"] for result in results}):
+        rows = [result for result in results if endpoint == "all" or result["endpoint"] == endpoint]
+        if not rows:
+            continue
+        ok = [row["seconds"] for row in rows if 200 <= row["status"] < 300]
+        summary["endpoints"][endpoint] = {
+            "requests": len(rows),
+            "throughput_rps": len(ok) / wall_seconds if wall_seconds else 0.0,
+            "p50_ms": (percentile(ok, 0.50) or 0) * 1000,
+            "p95_ms": (percentile(ok, 0.95) or 0) * 1000,
+            "p99_ms": (percentile(ok, 0.99) or 0) * 1000,
+            "error_rate": sum(1 for row in rows if not 200 <= row["status"] < 300) / len(rows),
+            "rate_429": sum(1 for row in rows if row["status"] == 429) / len(rows),
+            "queue_p99_ms": (percentile([row.get("queued", 0.0) for row in rows], 0.99) or 0) * 1000,
+        }
+    return summary
+
+
+def print_summary(summary: Dict, baseline: Optional[Dict] = None):
+    print(f"\n{'endpoint':<10}{'reqs':>7}{'rps':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'err %':>7}{'429 %':>7}")
+    for endpoint, row in summary["endpoints"].items():
+        print(f"{endpoint:<10}{row['requests']:>7}{row['throughput_rps']:>8.2f}{row['p50_ms']:>9.0f}{row['p95_ms']:>9.0f}"
+              f"{row['p99_ms']:>9.0f}{row['error_rate'] * 100:>7.1f}{row['rate_429'] * 100:>7.1f}")
+        base = (baseline or {}).get("endpoints", {}).get(endpoint)
+        if base:
+            print(f"{'  vs base':<10}{'':>7}{row['throughput_rps'] - base['throughput_rps']:>+8.2f}"
+                  f"{row['p50_ms'] - base['p50_ms']:>+9.0f}{row['p95_ms'] - base['p95_ms']:>+9.0f}{row['p99_ms'] - base['p99_ms']:>+9.0f}")
+    queued = summary["endpoints"].get("all", {}).get("queue_p99_ms", 0)
+    if queued >= 1:
+        print(f"\nClient-side queueing (included above): p99 {queued:.0f}ms; raise --max-in-flight to send on schedule")
+    lag = summary.get("loop_lag")
+    if lag and lag.get("samples"):
+        print(f"\nEvent-loop lag: p50 {lag['p50_ms']:.1f}ms, p99 {lag['p99_ms']:.1f}ms, max {lag['max_ms']:.1f}ms")
+    else:
+        print("\nEvent-loop lag: not available (server without /metrics/loop-lag)")
+
+
+def launch_server(port: int, stub_latency: float, backend: str) -> subprocess.Popen:
+    env = dict(os.environ, LLM_BACKEND=backend, FAKE_LLM_LATENCY=str(stub_latency))
+    process = subprocess.Popen([sys.executable, "-m", "uvicorn", "api:app", "--port", str(port)], cwd=script_dir, env=env)
+    for _ in range(300):
+        if get_json(f"http://localhost:{port}/health"):
+            return process
+        time.sleep(1)
+    process.terminate()
+    raise RuntimeError("API did not come up within 300s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load-test /query, /upload and /process-document")
+    parser.add_argument("--url", default=DEFAULT_URL)
+    parser.add_argument("--questions", required=True, help="Question corpus: one per line or JSONL with 'question'")
+    parser.add_argument("--uploads", help="Directory of .pdf/.docx files replayed against upload endpoints")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help="Endpoint weights, e.g. query=0.9,upload=0.05,process=0.05")
+    parser.add_argument("--concurrency", type=int, default=8, help="Closed-loop clients (ignored with --rate)")
+    parser.add_argument("--rate", type=float, help="Open-loop arrival rate in requests/second")
+    parser.add_argument("--max-in-flight", type=int, default=256, help="Client-side cap for open-loop requests")
+    parser.add_argument("--duration", type=float, default=60, help="Seconds to run")
+    parser.add_argument("--requests", type=int, help="Stop after this many requests")
+    parser.add_argument("--launch", action="store_true", help="Start the API locally for the run")
+    parser.add_argument("--llm-backend", default="fake", choices=["fake", "ollama"], help="LLM backend for --launch")
+    parser.add_argument("--stub-latency", type=float, default=1.0, help="Fake LLM latency in seconds for --launch")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--save-baseline", help="Write the summary as JSON to this file")
+    parser.add_argument("--baseline", help="Compare against a saved summary")
+    args = parser.parse_args()
+
+    questions = load_questions(args.questions)
+    mix = parse_mix(args.mix)
+    upload_files = sorted(path for path in Path(args.uploads).glob("*") if path.suffix.lower() in (".pdf", ".docx")) if args.uploads else []
+    if any(kind != "query" for kind in mix) and not upload_files:
+        parser.error("--uploads with .pdf/.docx files is required when the mix includes upload or process")
+
+    server = None
+    if args.launch:
+        port = urllib.parse.urlparse(args.url).port or 8000
+        print(f"🚀 Launching API on port {port} with the {args.llm_backend} LLM backend...")
+        server = launch_server(port, args.stub_latency, args.llm_backend)
+
+    try:
+        test = LoadTest(args.url, questions, upload_files, mix, args.seed)
+        get_json(f"{test.base_url}/metrics/loop-lag?reset=true")
+        mode = f"{args.rate}/s open-loop" if args.rate else f"{args.concurrency} clients closed-loop"
+        print(f"⏳ Running {mode} for up to {args.duration:.0f}s against {test.base_url} (mix {mix})...")
+        start = time.perf_counter()
+        if args.rate:
+            test.run_open(args.rate, args.duration, args.requests, args.max_in_flight)
+        else:
+            test.run_closed(args.concurrency, args.duration, args.requests)
+        wall_seconds = time.perf_counter() - start
+        loop_lag = get_json(f"{test.base_url}/metrics/loop-lag")
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+
+    config = {"url": args.url, "mode": mode, "mix": mix, "duration": args.duration, "requests": args.requests,
+              "llm_backend": args.llm_backend if args.launch else None, "stub_latency": args.stub_latency if args.launch else None,
+              "max_in_flight_seen": test.max_in_flight}
+    summary = summarize(test.results, wall_seconds, loop_lag, config)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    print_summary(summary, baseline)
+
+    errors = [result["error"] for result in test.results if result["error"]]
+    if errors:
+        print(f"\nFirst error: {errors[0]}")
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(summary, f, indent=2)
+        print(f"Results written to {args.save_baseline}")
+
+
+if __name__ == "__main__":
+    main()
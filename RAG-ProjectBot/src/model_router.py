@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Adaptive routing of questions by retrieval confidence and question complexity
+Low-confidence retrievals are answered immediately without the LLM, counting/aggregation questions over a stored
+table are computed with pandas and phrased by the small model, simple lookups go to a small model with only the
+top child chunks, and synthesis questions get the large model with parent-expanded context.
+Every decision is appended to a JSONL log together with its latency and the estimated latency saved.
+"""
+
+import os
+import re
+import json
+import time
+import logging
+import threading
+from dataclasses import dataclass, asdict, replace
+from typing import List, Optional, Tuple
+
+from langchain.schema import Document
+from llm_backend import CHAT_MODEL, ModelNotFound
+from parent_retrieval import expand_to_parents
+from table_qa import answer_table_question
+
+logger = logging.getLogger(__name__)
+
+MIN_RELEVANCE = float(os.environ.get("ROUTER_MIN_SCORE", "0.2"))  # Below this the LLM is not called
+SMALL_MODEL = os.environ.get("ROUTER_SMALL_MODEL", CHAT_MODEL)  # Same as the large model: small-model routing is opt-in
+LARGE_MODEL = os.environ.get("ROUTER_LARGE_MODEL", CHAT_MODEL)
+SMALL_K = int(os.environ.get("ROUTER_SMALL_K", "3"))  # Child chunks sent with lookup questions
+LOOKUP_MAX_WORDS = 14
+ROUTING_LOG_PATH = os.environ.get("ROUTING_LOG", "routing_log.jsonl")  # Empty disables the log
+LATENCY_SMOOTHING = 0.2  # Weight of the newest sample in the per-model latency average
+
+NO_ANSWER = "I'm sorry, I don't have information on that topic."
+
+SYNTHESIS_PATTERN = re.compile(
+    r"\b(compar\w*|differ\w*|versus|vs|summar\w*|overview|explain\w*|why|how (does|do|would|should|can)|"
+    r"relationship\w*|impact\w*|implication\w*|pros|cons|trade-?offs?|analy[sz]\w*|evaluat\w*|recommend\w*|all|end-to-end)\b",
+    re.IGNORECASE,
+)
+LOOKUP_PATTERN = re.compile(r"^\s*(what|who|when|where|which|is|are|does|do|can|how (many|much|long))\b", re.IGNORECASE)
+
+
+@dataclass
+class RouteDecision:
+    route: str  # abstain | table | small | large
+    model: Optional[str]
+    reason: str
+    top_score: Optional[float]
+
+
+def classify_question(question: str) -> Tuple[str, str]:
+    """('lookup' | 'synthesis', reason) from the question wording alone"""
+    words = len(question.split())
+    if SYNTHESIS_PATTERN.search(question):
+        return "synthesis", "synthesis wording"
+    if question.count("?") > 1 or words > LOOKUP_MAX_WORDS:
+        return "synthesis", f"{words} words"
+    if LOOKUP_PATTERN.match(question):
+        return "lookup", "lookup wording"
+    return "synthesis", "default"
+
+
+class ModelRouter:
+    """Chooses a route per question and keeps per-model latency averages to estimate the time saved"""
+
+    def __init__(self, min_relevance: float = MIN_RELEVANCE, small_model: str = SMALL_MODEL,
+                 large_model: str = LARGE_MODEL, small_k: int = SMALL_K, log_path: str = ROUTING_LOG_PATH):
+        self.min_relevance = min_relevance
+        self.small_model = small_model
+        self.large_model = large_model
+        self.small_k = small_k
+        self.log_path = log_path
+        self.latency = {}
+        self._lock = threading.Lock()
+
+    def decide(self, question: str, results: List[Tuple[Document, float]]) -> RouteDecision:
+        top_score = max((score for _, score in results), default=None)
+        if top_score is None or top_score < self.min_relevance:
+            return RouteDecision("abstain", None, f"top score {top_score if top_score is not None else 'n/a'} < {self.min_relevance}", top_score)
+        kind, reason = classify_question(question)
+        if kind == "lookup" and self.small_model != self.large_model:
+            return RouteDecision("small", self.small_model, reason, top_score)
+        return RouteDecision("large", self.large_model, reason, top_score)
+
+    def context_for(self, decision: RouteDecision, results: List[Tuple[Document, float]], docstore) -> List[Tuple[Document, float]]:
+        """Top child chunks for the small model, parent sections within the token budget for the large one"""
+        if decision.route == "small":
+            return results[:self.small_k]
+        return expand_to_parents(results, docstore)
+
+    def record(self, question: str, decision: RouteDecision, seconds: float) -> Optional[float]:
+        """Update latency averages and log the decision; returns the estimated seconds saved versus the large model"""
+        with self._lock:
+            if decision.model:
+                previous = self.latency.get(decision.model)
+                self.latency[decision.model] = seconds if previous is None else \
+                    (1 - LATENCY_SMOOTHING) * previous + LATENCY_SMOOTHING * seconds
+            baseline = self.latency.get(self.large_model)
+        saved = None if baseline is None or decision.route == "large" else max(baseline - seconds, 0.0)
+
+        entry = {"time": time.time(), "question": question, **asdict(decision), "seconds": round(seconds, 4),
+                 "saved_seconds": None if saved is None else round(saved, 4)}
+        logger.info("Routed %s to %s (%s), %.2fs, saved %s", question[:60], decision.route, decision.reason,
+                    seconds, "n/a" if saved is None else f"{saved:.2f}s")
+        if self.log_path:
+            with self._lock, open(self.log_path, "a") as f:
+                f.write(json.dumps(entry) + "\n")
+        return saved
+
+
+def _ask(question: str, passages: List[str], decision: RouteDecision, session, router: ModelRouter) -> Tuple[str, RouteDecision]:
+    """Ask the decided model, retrying on the large model when the small one is not pulled on the endpoint"""
+    try:
+        return session.ask(question, passages, model=decision.model), decision
+    except ModelNotFound as e:
+        if decision.model == router.large_model:
+            raise
+        logger.warning("Small model %s unavailable (%s), using %s", decision.model, e, router.large_model)
+        decision = replace(decision, model=router.large_model, reason=f"{decision.reason}; small model not found")
+        return session.ask(question, passages, model=decision.model), decision
+
+
+def routed_answer(question: str, results: List[Tuple[Document, float]], docstore, session,
+                  router: ModelRouter) -> Tuple[str, RouteDecision]:
+    """Answer through the chosen route; session is a ChatSession"""
+    start = time.perf_counter()
+    decision = router.decide(question, results)
+    table_answer = None
+    if decision.route != "abstain":
+        try:
+            table_answer = answer_table_question(question, results)
+        except Exception as e:
+            logger.warning("Table QA failed, answering from text: %s", e)
+    if table_answer is not None:
+        # Only the computed result and its rows reach the LLM, never the whole table
+        decision = RouteDecision("table", router.small_model, table_answer.describe(), decision.top_score)
+        answer, decision = _ask(question, [table_answer.context()], decision, session, router)
+    elif decision.route == "abstain":
+        answer = NO_ANSWER
+    else:
+        context = router.context_for(decision, results, docstore)
+        answer, decision = _ask(question, [doc.page_content for doc, _ in context], decision, session, router)
+    router.record(question, decision, time.perf_counter() - start)
+    return answer, decision
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+OCR engine pool backed by long-lived Tesseract API instances
+Uses tesserocr (in-process Tesseract C API) when installed, otherwise falls back to pytesseract
+"""
+
+import io
+import os
+import csv
+import queue
+import threading
+import logging
+from contextlib import contextmanager
+from typing import Optional
+
+import numpy as np
+import pandas as pd
+from PIL import Image
+import pytesseract
+
+try:
+    import tesserocr
+    TESSEROCR_AVAILABLE = True
+except ImportError:
+    TESSEROCR_AVAILABLE = False
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+OCR_ENGINE = os.environ.get("OCR_ENGINE", "auto")  # auto | tesserocr | pytesseract
+OCR_LANG = os.environ.get("OCR_LANG", "eng")
+OCR_POOL_SIZE = int(os.environ.get("OCR_POOL_SIZE", os.cpu_count() or 1))
+
+# Column layout of Tesseract's TSV output, shared by both engines' image_to_data
+TSV_COLUMNS = ["level", "page_num", "block_num", "par_num", "line_num", "word_num",
+               "left", "top", "width", "height", "conf", "text"]
+
+
+def _to_pil(image: np.ndarray) -> Image.Image:
+    if len(image.shape) == 2:
+        return Image.fromarray(image)
+    # OpenCV images are BGR
+    return Image.fromarray(np.ascontiguousarray(image[:, :, 2::-1]))
+
+
+def _parse_tsv(tsv: str) -> pd.DataFrame:
+    data = pd.read_csv(io.StringIO(tsv), sep="\t", names=TSV_COLUMNS, header=None,
+                       quoting=csv.QUOTE_NONE, keep_default_na=False)
+    data["conf"] = pd.to_numeric(data["conf"], errors="coerce").fillna(-1)
+    return data
+
+
+class OCREngine:
+    """Common interface for OCR engines; one instance is only ever used by one thread at a time"""
+    name = "base"
+
+    def image_to_string(self, image: np.ndarray, psm: int = 3) -> str:
+        raise NotImplementedError
+
+    def image_to_data(self, image: np.ndarray, psm: int = 3) -> pd.DataFrame:
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class TesserocrEngine(OCREngine):
+    """Persistent in-process Tesseract API: language data is loaded once per engine"""
+    name = "tesserocr"
+
+    def __init__(self, lang: str = OCR_LANG):
+        self.api = tesserocr.PyTessBaseAPI(lang=lang)
+
+    def _set_image(self, image: np.ndarray, psm: int):
+        self.api.SetPageSegMode(psm)
+        self.api.SetImage(_to_pil(image))
+
+    def image_to_string(self, image: np.ndarray, psm: int = 3) -> str:
+        self._set_image(image, psm)
+        return self.api.GetUTF8Text()
+
+    def image_to_data(self, image: np.ndarray, psm: int = 3) -> pd.DataFrame:
+        self._set_image(image, psm)
+        self.api.Recognize()
+        return _parse_tsv(self.api.GetTSVText(0))
+
+    def close(self):
+        self.api.End()
+
+
+class PytesseractEngine(OCREngine):
+    """Fallback engine: forks the tesseract binary for every call"""
+    name = "pytesseract"
+
+    def __init__(self, lang: str = OCR_LANG):
+        self.lang = lang
+        pytesseract.get_tesseract_version()
+
+    def image_to_string(self, image: np.ndarray, psm: int = 3) -> str:
+        return pytesseract.image_to_string(image, lang=self.lang, config=f'--psm {psm} --oem 3')
+
+    def image_to_data(self, image: np.ndarray, psm: int = 3) -> pd.DataFrame:
+        return pytesseract.image_to_data(image, lang=self.lang, config=f'--psm {psm} --oem 3',
+                                         output_type=pytesseract.Output.DATAFRAME)
+
+
+class OCREnginePool:
+    """Fixed-size pool of OCR engines created lazily and checked out per call"""
+
+    def __init__(self, engine: str = OCR_ENGINE, size: int = OCR_POOL_SIZE, lang: str = OCR_LANG):
+        if engine == "auto":
+            engine = "tesserocr" if TESSEROCR_AVAILABLE else "pytesseract"
+        if engine == "tesserocr" and not TESSEROCR_AVAILABLE:
+            logger.warning("tesserocr not installed, falling back to pytesseract")
+            engine = "pytesseract"
+        self.engine_name = engine
+        self.size = max(1, size)
+        self.lang = lang
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _create_engine(self) -> OCREngine:
+        if self.engine_name == "tesserocr":
+            try:
+                return TesserocrEngine(self.lang)
+            except Exception as e:
+                logger.warning(f"tesserocr engine failed to start ({e}), falling back to pytesseract")
+                self.engine_name = "pytesseract"
+        return PytesseractEngine(self.lang)
+
+    @contextmanager
+    def engine(self):
+        try:
+            engine = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                create = self._created < self.size
+                if create:
+                    self._created += 1
+            if create:
+                try:
+                    engine = self._create_engine()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                engine = self._idle.get()
+        try:
+            yield engine
+        finally:
+            self._idle.put(engine)
+
+    def check(self) -> str:
+        """Start (or reuse) one engine so missing Tesseract installs fail early"""
+        with self.engine() as engine:
+            return engine.name
+
+    def image_to_string(self, image: np.ndarray, psm: int = 3) -> str:
+        with self.engine() as engine:
+            return engine.image_to_string(image, psm=psm)
+
+    def image_to_data(self, image: np.ndarray, psm: int = 3) -> pd.DataFrame:
+        with self.engine() as engine:
+            return engine.image_to_data(image, psm=psm)
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                break
+        self._created = 0
+
+
+_pool: Optional[OCREnginePool] = None
+_pool_pid: Optional[int] = None
+_pool_lock = threading.Lock()
+
+
+def get_ocr_pool() -> OCREnginePool:
+    """Process-wide OCR pool; rebuilt after fork so engines are never shared between processes"""
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = OCREnginePool()
+            _pool_pid = os.getpid()
+        return _pool
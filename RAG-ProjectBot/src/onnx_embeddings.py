@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+ONNX Runtime embedding backend for CPU-only hosts
+The MiniLM snapshot is exported to ONNX once (`python onnx_embeddings.py export`); afterwards embedding needs
+only onnxruntime and the Rust `tokenizers` package, so neither torch nor transformers is imported at start-up.
+Pooling and normalisation match the sentence-transformers pipeline, and the export is checked for parity
+against the torch embeddings before it is used.
+"""
+
+import os
+import sys
+import time
+import json
+import shutil
+import argparse
+from pathlib import Path
+from typing import List
+
+import numpy as np
+
+try:
+    from langchain_core.embeddings import Embeddings
+except ImportError:
+    Embeddings = object
+
+try:
+    import onnxruntime as ort
+    ONNXRUNTIME_AVAILABLE = True
+except ImportError:
+    ONNXRUNTIME_AVAILABLE = False
+
+try:
+    from tokenizers import Tokenizer
+    TOKENIZERS_AVAILABLE = True
+except ImportError:
+    TOKENIZERS_AVAILABLE = False
+
+ONNX_MODEL_DIR = os.environ.get("ONNX_MODEL_DIR", "onnx_model")
+ONNX_THREADS = int(os.environ.get("ONNX_THREADS", "0"))  # 0 lets ONNX Runtime use every physical core
+ONNX_BATCH_SIZE = 64  # Texts per forward pass; batches are length-sorted so padding stays short
+MAX_SEQ_LENGTH = 256  # sentence-transformers' max_seq_length for all-MiniLM-L6-v2
+PARITY_TOLERANCE = 1e-4  # Largest allowed absolute difference per vector component
+
+PARITY_TEXTS = [
+    "How does the approval workflow handle rejected purchase requests?",
+    "Table 3: Quarterly revenue by region, in thousands of dollars",
+    "The system shall log every failed login attempt with a timestamp and source address.",
+    "short",
+    "Ünïcödé text, numbers 12,345.67 and punctuation (a/b; c-d) should embed identically. " * 20,
+]
+
+
+def onnx_model_ready(model_dir: str = ONNX_MODEL_DIR) -> bool:
+    return (Path(model_dir) / "model.onnx").exists() and (Path(model_dir) / "tokenizer.json").exists()
+
+
+class OnnxEmbeddings(Embeddings):
+    """Mean-pooled, L2-normalised MiniLM embeddings from an exported ONNX graph"""
+
+    def __init__(self, model_dir: str = ONNX_MODEL_DIR, threads: int = ONNX_THREADS, batch_size: int = ONNX_BATCH_SIZE):
+        if not ONNXRUNTIME_AVAILABLE or not TOKENIZERS_AVAILABLE:
+            raise RuntimeError("ONNX embeddings need the onnxruntime and tokenizers packages")
+        if not onnx_model_ready(model_dir):
+            raise RuntimeError(f"No exported model in {model_dir}; run `python onnx_embeddings.py export` first")
+        self.batch_size = batch_size
+
+        # Fast path: the Rust tokenizer straight from tokenizer.json, truncating and padding like the torch pipeline
+        self.tokenizer = Tokenizer.from_file(str(Path(model_dir) / "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=MAX_SEQ_LENGTH)
+        self.tokenizer.enable_padding(pad_id=self.tokenizer.token_to_id("[PAD]") or 0, pad_token="[PAD]")
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(str(Path(model_dir) / "model.onnx"), options, providers=["CPUExecutionProvider"])
+        self.input_names = {model_input.name for model_input in self.session.get_inputs()}
+
+    def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        input_ids = np.asarray([encoding.ids for encoding in encodings], dtype=np.int64)
+        attention_mask = np.asarray([encoding.attention_mask for encoding in encodings], dtype=np.int64)
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self.input_names:
+            feeds["token_type_ids"] = np.asarray([encoding.type_ids for encoding in encodings], dtype=np.int64)
+        token_embeddings = self.session.run(None, feeds)[0]
+
+        mask = attention_mask[:, :, None].astype(np.float32)
+        pooled = (token_embeddings * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+        return pooled / np.maximum(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12)
+
+    def embed_array(self, texts: List[str]) -> np.ndarray:
+        """(len(texts), dim) float32 embeddings in input order"""
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        vectors = None
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            embedded = self._embed_batch([texts[i] for i in batch])
+            if vectors is None:
+                vectors = np.empty((len(texts), embedded.shape[1]), dtype=np.float32)
+            vectors[batch] = embedded
+        return vectors
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_array(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_array([text])[0].tolist()
+
+
+def export_onnx(model_path: str, model_dir: str = ONNX_MODEL_DIR, opset: int = 14, texts: List[str] = PARITY_TEXTS,
+                tolerance: float = PARITY_TOLERANCE) -> dict:
+    """Export the transformer (token embeddings output) with dynamic batch and sequence axes; needs torch once.
+    The export is written to a temporary directory and only replaces model_dir when it passes the parity check,
+    so a failed export never becomes the model EMBEDDING_BACKEND=onnx serves. Returns the parity result."""
+    import torch
+    from transformers import AutoModel, AutoTokenizer
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+    target = Path(model_dir)
+    temp_dir = target.with_name(f".{target.name}.{os.getpid()}.tmp")
+    shutil.rmtree(temp_dir, ignore_errors=True)
+    temp_dir.mkdir(parents=True)
+    try:
+        tokenizer = AutoTokenizer.from_pretrained(model_path)
+        model = AutoModel.from_pretrained(model_path).eval()
+        sample = tokenizer(["export sample", "a somewhat longer export sample sentence"], padding=True, return_tensors="pt")
+        input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+        dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+        dynamic_axes["token_embeddings"] = {0: "batch", 1: "sequence"}
+
+        with torch.no_grad():
+            torch.onnx.export(model, tuple(sample[name] for name in input_names), str(temp_dir / "model.onnx"),
+                              input_names=input_names, output_names=["token_embeddings"],
+                              dynamic_axes=dynamic_axes, opset_version=opset, do_constant_folding=True)
+
+        tokenizer_json = Path(model_path) / "tokenizer.json"
+        if tokenizer_json.exists():
+            shutil.copyfile(tokenizer_json, temp_dir / "tokenizer.json")
+        else:
+            tokenizer.save_pretrained(temp_dir)
+
+        result = check_parity(OnnxEmbeddings(str(temp_dir)), HuggingFaceEmbeddings(model_name=model_path), texts, tolerance)
+        if not result["ok"]:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+            return result
+        with open(temp_dir / "export.json", "w") as f:
+            json.dump({"source": str(model_path), "opset": opset, "exported_at": time.time(), "parity": result}, f, indent=2)
+
+        if target.exists():
+            shutil.rmtree(target)
+        os.replace(temp_dir, target)
+        return result
+    except Exception:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        raise
+
+
+def check_parity(onnx_embeddings: OnnxEmbeddings, torch_embeddings, texts: List[str] = PARITY_TEXTS,
+                 tolerance: float = PARITY_TOLERANCE) -> dict:
+    """Compare ONNX and torch vectors for the same texts; 'ok' is False if any component differs by more than tolerance"""
+    onnx_vectors = onnx_embeddings.embed_array(texts)
+    torch_vectors = np.asarray(torch_embeddings.embed_documents(texts), dtype=np.float32)
+    torch_vectors /= np.maximum(np.linalg.norm(torch_vectors, axis=1, keepdims=True), 1e-12)
+    max_abs_diff = float(np.abs(onnx_vectors - torch_vectors).max())
+    min_cosine = float((onnx_vectors * torch_vectors).sum(axis=1).min())
+    return {"texts": len(texts), "max_abs_diff": max_abs_diff, "min_cosine": min_cosine, "ok": max_abs_diff <= tolerance}
+
+
+def benchmark(embeddings, texts: List[str], repeats: int = 3) -> float:
+    """Best texts-per-second over several full passes"""
+    best = 0.0
+    for _ in range(repeats):
+        start = time.perf_counter()
+        embeddings.embed_documents(texts)
+        best = max(best, len(texts) / (time.perf_counter() - start))
+    return best
+
+
+def main():
+    from vector_store import EMBEDDING_MODEL_PATH
+
+    parser = argparse.ArgumentParser(description="Export MiniLM to ONNX and verify it against the torch embeddings")
+    parser.add_argument("command", choices=["export", "parity", "bench"])
+    parser.add_argument("--model-path", default=EMBEDDING_MODEL_PATH)
+    parser.add_argument("--model-dir", default=ONNX_MODEL_DIR)
+    parser.add_argument("--tolerance", type=float, default=PARITY_TOLERANCE)
+    parser.add_argument("--texts", help="File with one text per line for parity and bench (default: built-in samples)")
+    args = parser.parse_args()
+
+    texts = PARITY_TEXTS
+    if args.texts:
+        with open(args.texts) as f:
+            texts = [line.strip() for line in f if line.strip()]
+
+    if args.command == "export":
+        print(f"Exporting {args.model_path} to {args.model_dir}...")
+        result = export_onnx(args.model_path, args.model_dir, texts=texts, tolerance=args.tolerance)
+        print(f"Parity over {result['texts']} texts: max |diff| {result['max_abs_diff']:.2e}, min cosine {result['min_cosine']:.6f}")
+        if not result["ok"]:
+            print(f"❌ ONNX vectors differ from torch by more than {args.tolerance}; export discarded, {args.model_dir} unchanged")
+            sys.exit(1)
+        print("✅ Export complete")
+        return
+
+    start = time.perf_counter()
+    onnx_embeddings = OnnxEmbeddings(args.model_dir)
+    print(f"ONNX model loaded in {time.perf_counter() - start:.2f}s")
+    start = time.perf_counter()
+    from langchain_huggingface import HuggingFaceEmbeddings
+    torch_embeddings = HuggingFaceEmbeddings(model_name=args.model_path)
+    print(f"Torch model loaded in {time.perf_counter() - start:.2f}s")
+
+    if args.command == "parity":
+        result = check_parity(onnx_embeddings, torch_embeddings, texts, args.tolerance)
+        print(f"Parity over {result['texts']} texts: max |diff| {result['max_abs_diff']:.2e}, min cosine {result['min_cosine']:.6f}")
+        if not result["ok"]:
+            print(f"❌ ONNX vectors differ from torch by more than {args.tolerance}")
+            sys.exit(1)
+        print("✅ ONNX vectors match torch")
+    else:
+        texts = texts * max(1, 512 // len(texts))
+        onnx_rate = benchmark(onnx_embeddings, texts)
+        torch_rate = benchmark(torch_embeddings, texts)
+        print(f"onnx: {onnx_rate:.0f} texts/s, torch: {torch_rate:.0f} texts/s ({onnx_rate / torch_rate:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+"""
+Small-to-big retrieval: small chunks are embedded and searched, their parent sections are sent to the LLM
+Parents live in a compressed SQLite key-value store keyed by the source/page/start_index metadata on each chunk
+"""
+
+import re
+import json
+import zlib
+import bisect
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from langchain.schema import Document
+from chunking import HEADING_PREFIX, get_token_counter
+from index_versions import current_version, docstore_path
+
+DOCSTORE_PATH = "parent_docstore.db"
+CHILD_K = 10  # Child chunks to retrieve before expansion
+PARENT_TOKEN_BUDGET = 1200  # Context tokens available for expanded parents
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS parents (
+    parent_id TEXT PRIMARY KEY,
+    source TEXT,
+    metadata TEXT,
+    section_starts TEXT,
+    content BLOB
+);
+CREATE INDEX IF NOT EXISTS idx_parents_source ON parents (source);
+"""
+
+
+def parent_key(metadata: Dict) -> str:
+    """Identify the loaded document (page text, table or image extraction) a chunk was cut from"""
+    sub_index = metadata.get("table_index") or metadata.get("image_index") or ""
+    return f"{metadata.get('source')}::{metadata.get('page', '')}::{metadata.get('content_type', '')}::{sub_index}"
+
+
+def section_starts(text: str) -> List[int]:
+    """Character offsets where each section of a page begins (0 plus every '## ' heading)"""
+    starts = [0]
+    for match in re.finditer(r"(?:^|\n\s*\n)" + re.escape(HEADING_PREFIX), text):
+        start = match.end() - len(HEADING_PREFIX)
+        if start > 0:
+            starts.append(start)
+    return starts
+
+
+class ParentDocstore:
+    def __init__(self, path: Optional[str] = None):
+        # Parents live beside the vectors of the live index version
+        version = current_version()
+        self.path = path or (docstore_path(version) if version else DOCSTORE_PATH)
+        self._lock = threading.Lock()
+        self._cache: Dict[str, Optional[Tuple[str, Dict, List[int]]]] = {}
+        self._cache_lock = threading.Lock()  # Lookups run on the batch endpoint's thread pool
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=30)
+
+    def clear(self):
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM parents")
+        with self._cache_lock:
+            self._cache.clear()
+
+    def add_documents(self, documents: List[Document]):
+        """Store loaded documents as parents, replacing anything previously stored for the same sources"""
+        rows = []
+        for doc in documents:
+            metadata = {key: value for key, value in doc.metadata.items() if key != "start_index"}
+            rows.append((parent_key(doc.metadata), metadata.get("source"), json.dumps(metadata),
+                         json.dumps(section_starts(doc.page_content)), zlib.compress(doc.page_content.encode("utf-8"))))
+        sources = {row[1] for row in rows}
+        with self._lock, self._connect() as conn:
+            conn.executemany("DELETE FROM parents WHERE source = ?", [(source,) for source in sources])
+            conn.executemany("INSERT OR REPLACE INTO parents VALUES (?, ?, ?, ?, ?)", rows)
+        with self._cache_lock:
+            self._cache.clear()
+
+    def all_documents(self) -> List[Document]:
+        """Every stored parent as loaded, for exporting the docstore"""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT metadata, content FROM parents ORDER BY parent_id").fetchall()
+        return [Document(page_content=zlib.decompress(content).decode("utf-8"), metadata=json.loads(metadata))
+                for metadata, content in rows]
+
+    def _load(self, key: str) -> Optional[Tuple[str, Dict, List[int]]]:
+        with self._cache_lock:
+            if key in self._cache:
+                return self._cache[key]
+        with self._connect() as conn:
+            row = conn.execute("SELECT metadata, section_starts, content FROM parents WHERE parent_id = ?",
+                               (key,)).fetchone()
+        loaded = (zlib.decompress(row[2]).decode("utf-8"), json.loads(row[0]), json.loads(row[1])) if row else None
+        with self._cache_lock:
+            if len(self._cache) >= 4096:
+                self._cache.clear()
+            self._cache[key] = loaded
+        return loaded
+
+    def get_parent(self, child_metadata: Dict) -> Optional[Document]:
+        """The section of the parent document that contains the child's start_index"""
+        loaded = self._load(parent_key(child_metadata))
+        if loaded is None:
+            return None
+        text, metadata, starts = loaded
+        index = max(bisect.bisect_right(starts, child_metadata.get("start_index", 0) or 0) - 1, 0)
+        end = starts[index + 1] if index + 1 < len(starts) else len(text)
+        parent_metadata = dict(metadata)
+        parent_metadata["parent_id"] = f"{parent_key(child_metadata)}::{index}"
+        return Document(page_content=text[starts[index]:end].strip(), metadata=parent_metadata)
+
+
+def expand_to_parents(results: List[Tuple[Document, float]], docstore: Optional[ParentDocstore],
+                      token_budget: int = PARENT_TOKEN_BUDGET) -> List[Tuple[Document, float]]:
+    """Replace child hits with their deduplicated parent sections, best hit first, inside a token budget.
+    A parent that does not fit falls back to the child chunk itself."""
+    count_tokens = get_token_counter()
+    expanded = []
+    seen = set()
+    used = 0
+    for child, score in results:
+        parent = docstore.get_parent(child.metadata) if docstore is not None else None
+        candidates = [parent, child] if parent is not None else [child]
+        for doc in candidates:
+            key = doc.metadata.get("parent_id") or (parent_key(doc.metadata), doc.metadata.get("start_index"))
+            if key in seen:
+                break
+            tokens = count_tokens(doc.page_content)
+            if used + tokens <= token_budget:
+                # Later children of an expanded parent hit its parent_id here and are skipped
+                seen.add(key)
+                expanded.append((doc, score))
+                used += tokens
+                break
+    return expanded
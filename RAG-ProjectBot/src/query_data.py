@@ -1,17 +1,15 @@
 import argparse
-import os
+import time
 # from dataclasses import dataclass
-from langchain_community.vectorstores import Chroma
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain_community.chat_models import ChatOllama
 from langchain.prompts import ChatPromptTemplate
-
-CHROMA_PATH = "chroma"
-
-PROMPT_TEMPLATE = """
-
-
-###ROLE: 
+from parent_retrieval import ParentDocstore
+from vector_store import open_vector_store
+from llm_backend import get_llm_backend
+from model_router import ModelRouter, NO_ANSWER
+from dedup import chunk_sources
+
+# Stable instructions first so Ollama can keep them in its KV cache across turns (see chat_session.py)
+SYSTEM_PROMPT = """###ROLE: 
 You are an AI assistant specialized in understanding the Project documents and analyzing business requirements documents, technical specifications, and user access management systems. You provide clear, accurate, and actionable insights based on the provided context.
 
 ###TASK:
@@ -27,7 +25,9 @@ Provide structured responses with bullet points or numbered lists for better rea
 3. If the question is not related to the context, say "I'm sorry, I don't have information on that topic."
 4. If the question is not clear, ask for more information.
 5. Expect the user to be new to the project and provide the complete answer to the question.
+"""
 
+TURN_TEMPLATE = """
 Context:
 {context}
 
@@ -36,6 +36,8 @@ Context:
 Answer the question based on the above context: {question}
 """
 
+PROMPT_TEMPLATE = "\n\n\n" + SYSTEM_PROMPT + TURN_TEMPLATE
+
 def filter_low_quality_content(results, min_relevance=0.1, min_length=20):
     """Filter out low-quality table/image extractions and low-relevance results"""
     filtered_results = []
@@ -77,10 +79,7 @@ def main():
     query_text = args.query_text
 
     # Prepare the DB.
-    # Use local model path to avoid network requests
-    model_path = os.path.expanduser("~/.cache/huggingface/hub/models--sentence-transformers--all-MiniLM-L6-v2/snapshots/c9745ed1d9f207416be6d2e6f8de32d1f16199bf")
-    embedding_function = HuggingFaceEmbeddings(model_name=model_path)
-    db = Chroma(persist_directory=CHROMA_PATH, embedding_function=embedding_function)
+    db = open_vector_store()
 
     # Search the DB with more results to filter from
     raw_results = db.similarity_search_with_relevance_scores(query_text, k=15)
@@ -98,20 +97,31 @@ def main():
         print(f"Unable to find matching results after filtering.")
         return
     
-    # Use higher threshold for filtered results
-    if results[0][1] < 0.2:
-        print(f"Best match has low relevance score: {results[0][1]:.3f}")
-        print("Proceeding anyway...")
+    # Low-confidence retrievals are answered without the LLM; lookups go to the small model
+    router = ModelRouter()
+    decision = router.decide(query_text, results)
+    print(f"Route: {decision.route} ({decision.reason})")
+    if decision.route == "abstain":
+        print(f"Response: {NO_ANSWER}")
+        router.record(query_text, decision, 0.0)
+        return
 
-    context_text = "\n\n---\n\n".join([doc.page_content for doc, _score in results[:5]])  # Use top 5 filtered results
+    # Small model: top filtered chunks; large model: their parent sections within the token budget
+    citations = [citation for doc, _score in results[:5] for citation in chunk_sources(doc.metadata)]
+    results = router.context_for(decision, results[:5], ParentDocstore())
+    context_text = "\n\n---\n\n".join([doc.page_content for doc, _score in results])
     prompt_template = ChatPromptTemplate.from_template(PROMPT_TEMPLATE)
     prompt = prompt_template.format(context=context_text, question=query_text)
     print(prompt)
 
-    model = ChatOllama(model="llama3.2:3b")
-    response_text = model.predict(prompt)
+    start = time.perf_counter()
+    response_text = get_llm_backend().generate(prompt, model=decision.model)["response"]
+    saved = router.record(query_text, decision, time.perf_counter() - start)
+    if saved is not None:
+        print(f"Latency saved versus {router.large_model}: {saved:.2f}s")
 
-    sources = [doc.metadata.get("source", None) for doc, _score in results[:5]]
+    # Deduplicated chunks cite every copy, not just the one that was embedded
+    sources = list(dict.fromkeys(citation["source"] for citation in citations))
     formatted_response = f"Response: {response_text}\nSources: {sources}"
     print(formatted_response)
 
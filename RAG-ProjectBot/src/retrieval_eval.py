@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+Retrieval evaluation grid: chunking strategy x k x result filtering
+Builds a temporary index per chunking strategy from the same loaded documents and scores a golden
+question -> source/page set, reporting recall@k, MRR, index size, embedding time and query latency
+"""
+
+import os
+import sys
+import json
+import time
+import pickle
+import shutil
+import argparse
+import tempfile
+import itertools
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import numpy as np
+
+script_dir = Path(__file__).parent.absolute()
+sys.path.insert(0, str(script_dir))
+os.chdir(script_dir)
+
+from langchain.schema import Document
+from chunking import StructuredChunker, CHUNK_MAX_TOKENS
+from query_data import filter_low_quality_content
+from vector_store import open_vector_store, VECTOR_STORE_BACKEND
+
+QUALITY_FETCH_FACTOR = 3  # query_data fetches 15 and keeps the best 5 after filtering
+DEFAULT_CHUNKINGS = ["recursive:300:100", "structured:128", "structured:192", "structured:256"]
+
+
+def load_golden(path: str) -> List[Dict]:
+    """JSONL rows: {"question": ..., "source": "file.pdf" or "sources": [...], "page": 3 or [3, 4] (optional)}"""
+    golden = []
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            row = json.loads(line)
+            sources = row.get("sources") or [row["source"]]
+            pages = row.get("page")
+            golden.append({
+                "question": row["question"],
+                "sources": {os.path.basename(source) for source in sources},
+                "pages": None if pages is None else set(pages if isinstance(pages, list) else [pages]),
+            })
+    return golden
+
+
+def chunker_for(spec: str) -> Callable[[List[Document]], List[Document]]:
+    """'structured:<target tokens>' or 'recursive:<chunk chars>:<overlap chars>'"""
+    kind, *params = spec.split(":")
+    if kind == "structured":
+        target = int(params[0]) if params else None
+        if target is None:
+            return StructuredChunker().split_documents
+        return StructuredChunker(target_tokens=target, max_tokens=max(target, min(CHUNK_MAX_TOKENS, target * 4 // 3))).split_documents
+    if kind == "recursive":
+        from langchain.text_splitter import RecursiveCharacterTextSplitter
+        size, overlap = (int(params[0]), int(params[1])) if len(params) == 2 else (300, 100)
+        return RecursiveCharacterTextSplitter(chunk_size=size, chunk_overlap=overlap, length_function=len,
+                                              add_start_index=True).split_documents
+    raise ValueError(f"Unknown chunking spec: {spec}")
+
+
+def is_relevant(doc: Document, expected: Dict) -> bool:
+    if os.path.basename(str(doc.metadata.get("source", ""))) not in expected["sources"]:
+        return False
+    return expected["pages"] is None or doc.metadata.get("page") in expected["pages"]
+
+
+def directory_bytes(path: str) -> int:
+    return sum(entry.stat().st_size for entry in Path(path).rglob("*") if entry.is_file())
+
+
+def load_corpus(data_path: str, cache_path: str = None) -> List[Document]:
+    """Load (and OCR) the corpus once; the optional pickle cache makes repeated grids cheap"""
+    if cache_path and os.path.exists(cache_path):
+        with open(cache_path, "rb") as f:
+            return pickle.load(f)
+    import create_database
+    create_database.DATA_PATH = data_path
+    documents = create_database.load_documents()
+    if cache_path:
+        with open(cache_path, "wb") as f:
+            pickle.dump(documents, f)
+    return documents
+
+
+def evaluate(documents: List[Document], golden: List[Dict], chunkings: List[str], ks: List[int],
+             filters: List[str], backend: str) -> List[Dict]:
+    rows = []
+    for spec in chunkings:
+        chunks = chunker_for(spec)(documents)
+        temp_dir = tempfile.mkdtemp(prefix="retrieval_eval_")
+        try:
+            store = open_vector_store(backend=backend, path=os.path.join(temp_dir, "index"))
+            start = time.perf_counter()
+            store.rebuild(chunks)
+            embed_seconds = time.perf_counter() - start
+            index_bytes = directory_bytes(temp_dir)
+            print(f"🔎 {spec}: {len(chunks)} chunks, embedded in {embed_seconds:.1f}s, index {index_bytes / 1e6:.1f}MB")
+
+            for k, filtering in itertools.product(ks, filters):
+                fetch_k = k * QUALITY_FETCH_FACTOR if filtering == "quality" else k
+                hits, reciprocal_ranks, latencies = 0, [], []
+                for expected in golden:
+                    start = time.perf_counter()
+                    results = store.similarity_search_with_relevance_scores(expected["question"], k=fetch_k)
+                    if filtering == "quality":
+                        results = filter_low_quality_content(results)
+                    results = results[:k]
+                    latencies.append(time.perf_counter() - start)
+                    rank = next((i + 1 for i, (doc, _) in enumerate(results) if is_relevant(doc, expected)), None)
+                    hits += rank is not None
+                    reciprocal_ranks.append(1 / rank if rank else 0.0)
+
+                latencies_ms = np.asarray(latencies) * 1000
+                rows.append({
+                    "chunking": spec, "k": k, "filter": filtering, "chunks": len(chunks),
+                    "recall": hits / len(golden), "mrr": float(np.mean(reciprocal_ranks)),
+                    "index_mb": index_bytes / 1e6, "embed_seconds": embed_seconds,
+                    "p50_ms": float(np.percentile(latencies_ms, 50)), "p95_ms": float(np.percentile(latencies_ms, 95)),
+                })
+        finally:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluate chunking x k x filtering against a golden question set")
+    parser.add_argument("golden", help="JSONL golden set with question and expected source/page")
+    parser.add_argument("--data-path", default="data/books")
+    parser.add_argument("--documents-cache", help="Pickle of loaded documents, created on first run")
+    parser.add_argument("--chunking", nargs="+", default=DEFAULT_CHUNKINGS,
+                        help="structured:<target tokens> or recursive:<chars>:<overlap>")
+    parser.add_argument("--k", type=int, nargs="+", default=[3, 5, 10])
+    parser.add_argument("--filter", nargs="+", default=["none", "quality"], choices=["none", "quality"])
+    parser.add_argument("--backend", default=VECTOR_STORE_BACKEND, choices=["chroma", "flat"])
+    parser.add_argument("--min-recall", type=float, default=0.9, help="Recall a configuration must reach to be recommended")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    args = parser.parse_args()
+
+    golden = load_golden(args.golden)
+    documents = load_corpus(args.data_path, args.documents_cache)
+    print(f"Loaded {len(documents)} documents and {len(golden)} golden questions")
+    rows = evaluate(documents, golden, args.chunking, args.k, args.filter, args.backend)
+
+    print(f"\n{'chunking':<20}{'k':>4}{'filter':>9}{'chunks':>8}{'recall':>8}{'MRR':>7}{'index MB':>10}{'embed s':>9}{'p50 ms':>8}{'p95 ms':>8}")
+    for row in rows:
+        print(f"{row['chunking']:<20}{row['k']:>4}{row['filter']:>9}{row['chunks']:>8}{row['recall']:>8.3f}{row['mrr']:>7.3f}"
+              f"{row['index_mb']:>10.1f}{row['embed_seconds']:>9.1f}{row['p50_ms']:>8.1f}{row['p95_ms']:>8.1f}")
+
+    # Cheapest = smallest index, then fastest build and query, among configurations that retrieve well enough
+    good = [row for row in rows if row["recall"] >= args.min_recall]
+    if good:
+        best = min(good, key=lambda row: (row["index_mb"], row["embed_seconds"], row["k"], row["p50_ms"]))
+        print(f"\n✅ Cheapest configuration with recall >= {args.min_recall}: {best['chunking']}, k={best['k']}, filter={best['filter']}")
+    else:
+        print(f"\n⚠️ No configuration reached recall {args.min_recall}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(rows, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,20 +9,83 @@ import cv2
 import numpy as np
 import pandas as pd
 import pytesseract
-from typing import List, Tuple, Optional, Union
+from ocr_engine import get_ocr_pool
+from dataclasses import dataclass, field
+from typing import Dict, List, Tuple, Optional, Union
 import os
+import time
 import logging
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+
+def _line_positions(profile: np.ndarray, min_length: float) -> List[int]:
+    # Centre of every run of consecutive rows/columns whose line coverage reaches min_length
+    on = np.concatenate(([0], (profile >= min_length).astype(np.int8), [0]))
+    edges = np.flatnonzero(np.diff(on))
+    starts, ends = edges[0::2], edges[1::2]
+    return ((starts + ends - 1) // 2).astype(int).tolist()
+
+
+def _pad_positions(positions: List[int], limit: int) -> List[int]:
+    positions = list(positions)
+    if not positions or positions[0] > 10: positions.insert(0, 0)
+    if not positions or positions[-1] < limit - 10: positions.append(limit)
+    return positions
+
+
+@dataclass
+class TableAnalysis:
+    """Grid, cell text and timings for one table image, computed once and reused by every output format"""
+    image: np.ndarray
+    horizontal_mask: np.ndarray
+    vertical_mask: np.ndarray
+    row_lines: List[int]
+    column_lines: List[int]
+    cells: List[List[Tuple[int, int, int, int]]]
+    table_data: List[List[str]] = field(default_factory=list)
+    timings: Dict[str, float] = field(default_factory=dict)
+    source: Optional[str] = None
+
+    @property
+    def has_table(self) -> bool:
+        # A ruled table needs at least two detected lines in each direction
+        return len(self.row_lines) >= 2 and len(self.column_lines) >= 2
+
+    @property
+    def has_row_rules(self) -> bool:
+        # Tables ruled only between rows (no vertical lines) still show three or more full-width lines
+        return len(self.row_lines) >= 3
+
+    def to_list(self) -> List[List[str]]:
+        return self.table_data
+
+    def to_dataframe(self) -> pd.DataFrame:
+        if self.table_data and len(self.table_data) > 1:
+            return pd.DataFrame(self.table_data[1:], columns=self.table_data[0])
+        return pd.DataFrame(self.table_data)
+
+    def debug_image(self) -> np.ndarray:
+        start = time.perf_counter()
+        debug_image = cv2.cvtColor(self.image, cv2.COLOR_GRAY2BGR) if len(self.image.shape) == 2 else self.image.copy()
+        debug_image[self.horizontal_mask > 0] = (0, 255, 0)
+        debug_image[self.vertical_mask > 0] = (255, 0, 0)
+        for row in self.cells:
+            for x, y, w, h in row:
+                cv2.rectangle(debug_image, (x, y), (x + w, y + h), (0, 0, 255), 1)
+        self.timings['overlay'] = time.perf_counter() - start
+        return debug_image
+
+
 class TableExtractor:
     def __init__(self, tesseract_path: Optional[str] = None):
         if tesseract_path:
             pytesseract.pytesseract.tesseract_cmd = tesseract_path
+        self.ocr_pool = get_ocr_pool()
         try:
-            pytesseract.get_tesseract_version()
-            logger.info("Tesseract OCR initialized successfully")
+            engine_name = self.ocr_pool.check()
+            logger.info(f"Tesseract OCR initialized successfully ({engine_name})")
         except Exception as e:
             logger.error(f"Tesseract OCR not found: {e}")
             raise
@@ -34,13 +97,18 @@ class TableExtractor:
         thresh = cv2.adaptiveThreshold(blurred, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2)
         return cv2.bitwise_not(thresh)
     
-    def detect_table_structure(self, image: np.ndarray) -> Tuple[np.ndarray, List, List]:
-        # Detect horizontal and vertical lines
+    def detect_line_masks(self, image: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        # Isolate horizontal and vertical lines with morphological opening
         horizontal_kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (40, 1))
         vertical_kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (1, 40))
         
         horizontal_lines = cv2.dilate(cv2.morphologyEx(image, cv2.MORPH_OPEN, horizontal_kernel, iterations=2), horizontal_kernel, iterations=3)
         vertical_lines = cv2.dilate(cv2.morphologyEx(image, cv2.MORPH_OPEN, vertical_kernel, iterations=2), vertical_kernel, iterations=3)
+        return horizontal_lines, vertical_lines
+    
+    def detect_table_structure(self, image: np.ndarray) -> Tuple[np.ndarray, List, List]:
+        # Detect horizontal and vertical lines
+        horizontal_lines, vertical_lines = self.detect_line_masks(image)
         
         table_structure = cv2.addWeighted(horizontal_lines, 0.5, vertical_lines, 0.5, 0.0)
         
@@ -52,20 +120,73 @@ class TableExtractor:
     def find_cell_boundaries(self, horizontal_contours: List, vertical_contours: List, image_shape: Tuple[int, int]) -> List[List[Tuple[int, int, int, int]]]:
         height, width = image_shape
         
-        # Extract line positions
-        horizontal_positions = sorted(list(set([y + h // 2 for contour in horizontal_contours for x, y, w, h in [cv2.boundingRect(contour)] if w > width * 0.5])))
-        vertical_positions = sorted(list(set([x + w // 2 for contour in vertical_contours for x, y, w, h in [cv2.boundingRect(contour)] if h > height * 0.5])))
-        
-        # Add boundaries if missing
-        if not horizontal_positions or horizontal_positions[0] > 10: horizontal_positions.insert(0, 0)
-        if not horizontal_positions or horizontal_positions[-1] < height - 10: horizontal_positions.append(height)
-        if not vertical_positions or vertical_positions[0] > 10: vertical_positions.insert(0, 0)
-        if not vertical_positions or vertical_positions[-1] < width - 10: vertical_positions.append(width)
+        # Extract line positions, one boundingRect per contour
+        horizontal_rects = np.array([cv2.boundingRect(contour) for contour in horizontal_contours], dtype=int).reshape(-1, 4)
+        vertical_rects = np.array([cv2.boundingRect(contour) for contour in vertical_contours], dtype=int).reshape(-1, 4)
+        horizontal_rects = horizontal_rects[horizontal_rects[:, 2] > width * 0.5]
+        vertical_rects = vertical_rects[vertical_rects[:, 3] > height * 0.5]
+        horizontal_positions = np.unique(horizontal_rects[:, 1] + horizontal_rects[:, 3] // 2).tolist()
+        vertical_positions = np.unique(vertical_rects[:, 0] + vertical_rects[:, 2] // 2).tolist()
         
+        return self._cells_from_positions(_pad_positions(horizontal_positions, height), _pad_positions(vertical_positions, width))
+    
+    def _cells_from_positions(self, horizontal_positions: List[int], vertical_positions: List[int]) -> List[List[Tuple[int, int, int, int]]]:
         # Create cell boundaries
         return [[(vertical_positions[j], horizontal_positions[i], vertical_positions[j + 1] - vertical_positions[j], horizontal_positions[i + 1] - horizontal_positions[i]) 
                 for j in range(len(vertical_positions) - 1)] for i in range(len(horizontal_positions) - 1)]
     
+    def find_grid(self, horizontal_mask: np.ndarray, vertical_mask: np.ndarray) -> Tuple[List[int], List[int]]:
+        # Projection profiles: a row is a table line when line pixels cover more than half the width
+        height, width = horizontal_mask.shape[:2]
+        row_lines = _line_positions(np.count_nonzero(horizontal_mask, axis=1), width * 0.5)
+        column_lines = _line_positions(np.count_nonzero(vertical_mask, axis=0), height * 0.5)
+        return row_lines, column_lines
+    
+    def _load_image(self, image_path: str) -> np.ndarray:
+        if not os.path.exists(image_path):
+            raise FileNotFoundError(f"Image file not found: {image_path}")
+        
+        image = cv2.imread(image_path)
+        if image is None:
+            raise ValueError(f"Could not load image: {image_path}")
+        return image
+    
+    def analyze_table(self, image: Union[str, np.ndarray], run_ocr: bool = True) -> TableAnalysis:
+        timings = {}
+        source = None
+        
+        start = time.perf_counter()
+        if isinstance(image, str):
+            source = image
+            logger.info(f"Processing image: {image}")
+            image = self._load_image(image)
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if len(image.shape) == 3 else image
+        timings['load'] = time.perf_counter() - start
+        
+        start = time.perf_counter()
+        processed_image = self.preprocess_image(gray)
+        timings['preprocess'] = time.perf_counter() - start
+        
+        start = time.perf_counter()
+        horizontal_mask, vertical_mask = self.detect_line_masks(processed_image)
+        timings['structure'] = time.perf_counter() - start
+        
+        start = time.perf_counter()
+        row_lines, column_lines = self.find_grid(horizontal_mask, vertical_mask)
+        height, width = gray.shape[:2]
+        cells = self._cells_from_positions(_pad_positions(row_lines, height), _pad_positions(column_lines, width))
+        timings['grid'] = time.perf_counter() - start
+        
+        analysis = TableAnalysis(image=image, horizontal_mask=horizontal_mask, vertical_mask=vertical_mask,
+                                 row_lines=row_lines, column_lines=column_lines, cells=cells,
+                                 timings=timings, source=source)
+        
+        if run_ocr:
+            self.ocr_cells(analysis)
+        
+        logger.debug("Table analysis timings: " + ", ".join(f"{step}={secs * 1000:.1f}ms" for step, secs in timings.items()))
+        return analysis
+    
     def extract_cell_text(self, image: np.ndarray, cell_coords: Tuple[int, int, int, int]) -> str:
         x, y, w, h = cell_coords
         if w < 10 or h < 10: return ""
@@ -77,55 +198,41 @@ class TableExtractor:
         
         try:
             # Use simpler configuration without restrictive whitelist
-            text = pytesseract.image_to_string(cell_gray, config='--psm 6 --oem 3')
+            text = self.ocr_pool.image_to_string(cell_gray, psm=6)
             return text.strip().replace('\n', ' ').replace('\r', ' ')
         except Exception as e:
             logger.warning(f"OCR failed for cell {cell_coords}: {e}")
             return ""
     
+    def ocr_cells(self, analysis: TableAnalysis, grid_only: bool = False) -> List[List[str]]:
+        if grid_only:
+            # Drop the margins between the image border and the outermost detected lines
+            analysis.cells = self._cells_from_positions(analysis.row_lines, analysis.column_lines)
+        if not analysis.cells:
+            return analysis.table_data
+        start = time.perf_counter()
+        image = analysis.image
+        # Cells are cut from the grayscale image so no cell pays for its own colour conversion
+        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY) if len(image.shape) == 3 else image
+        analysis.table_data = [[self.extract_cell_text(gray, cell_coords) for cell_coords in row] for row in analysis.cells]
+        analysis.timings['ocr'] = time.perf_counter() - start
+        return analysis.table_data
+    
     def extract_table(self, image_path: str, output_format: str = 'dataframe') -> Union[pd.DataFrame, List[List[str]]]:
-        if not os.path.exists(image_path):
-            raise FileNotFoundError(f"Image file not found: {image_path}")
+        analysis = self.analyze_table(image_path)
         
-        image = cv2.imread(image_path)
-        if image is None:
-            raise ValueError(f"Could not load image: {image_path}")
-        
-        logger.info(f"Processing image: {image_path}")
-        
-        processed_image = self.preprocess_image(image)
-        table_structure, horizontal_contours, vertical_contours = self.detect_table_structure(processed_image)
-        cells = self.find_cell_boundaries(horizontal_contours, vertical_contours, image.shape[:2])
-        
-        if not cells:
+        if not analysis.cells:
             logger.warning("No table structure detected")
             return pd.DataFrame() if output_format == 'dataframe' else []
         
-        # Extract text from cells
-        table_data = [[self.extract_cell_text(image, cell_coords) for cell_coords in row] for row in cells]
-        
         # Convert to desired format
-        if output_format == 'dataframe':
-            return pd.DataFrame(table_data[1:], columns=table_data[0]) if table_data and len(table_data) > 1 else pd.DataFrame(table_data)
-        else:
-            return table_data
+        return analysis.to_dataframe() if output_format == 'dataframe' else analysis.to_list()
     
     def extract_table_with_visualization(self, image_path: str, save_debug_image: bool = False) -> Tuple[Union[pd.DataFrame, List[List[str]]], np.ndarray]:
-        image = cv2.imread(image_path)
-        processed_image = self.preprocess_image(image)
-        table_structure, horizontal_contours, vertical_contours = self.detect_table_structure(processed_image)
-        
-        # Create debug visualization
-        debug_image = image.copy()
-        cv2.drawContours(debug_image, horizontal_contours, -1, (0, 255, 0), 2)
-        cv2.drawContours(debug_image, vertical_contours, -1, (255, 0, 0), 2)
-        
-        cells = self.find_cell_boundaries(horizontal_contours, vertical_contours, image.shape[:2])
-        for row in cells:
-            for x, y, w, h in row:
-                cv2.rectangle(debug_image, (x, y), (x + w, y + h), (0, 0, 255), 1)
-        
-        table_data = self.extract_table(image_path, 'list')
+        # One analysis feeds both the table data and the debug overlay
+        analysis = self.analyze_table(image_path)
+        table_data = analysis.to_list()
+        debug_image = analysis.debug_image()
         
         if save_debug_image:
             debug_path = image_path.replace('.', '_debug.')
@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+"""
+Direct answers to counting and aggregation questions over stored tables
+A question worded like "how many roles have admin access" or "what is the total budget" is matched against
+the tables of the retrieved sources. The operation, target column and row filters are read from the wording,
+run with pandas, and only the computed result and the matching rows are passed to the LLM.
+"""
+
+import os
+import re
+from dataclasses import dataclass, field
+from typing import List, Optional, Tuple
+
+import pandas as pd
+from langchain.schema import Document
+from table_store import TableRecord, TableStore, get_table_store, TABLE_STORE_ENABLED
+
+TABLE_QA_ENABLED = TABLE_STORE_ENABLED and os.environ.get("TABLE_QA", "1") != "0"
+MIN_TABLE_SCORE = 2  # Question words found in a table's header and cells before it is used
+RETRIEVED_TABLE_BONUS = 2  # A table whose text was among the retrieved chunks
+MAX_RESULT_ROWS = 20  # Matching rows shown to the LLM
+
+TABULAR_PATTERN = re.compile(
+    r"\b(how many|number of|count|total|sum|average|avg|mean|maximum|minimum|max|min|highest|lowest|largest|"
+    r"smallest|most|least|list (all|every|the)|which \w+ (have|has|are|is|use|uses))\b",
+    re.IGNORECASE,
+)
+OPERATIONS = [
+    ("mean", re.compile(r"\b(average|avg|mean)\b", re.IGNORECASE)),
+    ("sum", re.compile(r"\b(total|sum)\b(?! number)", re.IGNORECASE)),
+    ("count", re.compile(r"\b(how many|number of|count)\b", re.IGNORECASE)),
+    ("max", re.compile(r"\b(maximum|max|highest|largest|most)\b", re.IGNORECASE)),
+    ("min", re.compile(r"\b(minimum|min|lowest|smallest|least)\b", re.IGNORECASE)),
+]
+STOPWORDS = {
+    "the", "and", "are", "for", "how", "many", "much", "what", "which", "who", "with", "have", "has", "that", "this",
+    "there", "their", "does", "did", "all", "any", "number", "count", "total", "sum", "average", "avg", "mean",
+    "maximum", "max", "minimum", "min", "highest", "lowest", "largest", "smallest", "most", "least", "list", "every",
+    "each", "per", "from", "into", "than", "more", "less", "get", "use", "uses", "used", "can", "table", "tables",
+    "row", "rows", "value", "values", "is", "of", "in", "on", "a", "an", "to", "by", "be",
+}
+TRUTHY = {"yes", "y", "x", "✓", "✔", "true", "1", "allowed", "enabled", "full", "read/write"}
+_WORD = re.compile(r"[a-z0-9][a-z0-9_/-]*")
+
+
+@dataclass
+class TableAnswer:
+    record: TableRecord
+    operation: str  # count | sum | mean | max | min | list
+    column: Optional[str]
+    filters: List[str] = field(default_factory=list)
+    value: Optional[object] = None
+    rows: pd.DataFrame = field(default_factory=pd.DataFrame)
+
+    def describe(self) -> str:
+        where = f" where {' and '.join(self.filters)}" if self.filters else ""
+        target = f" of {self.column}" if self.column else " of rows"
+        return f"{self.operation}{target}{where}"
+
+    def context(self) -> str:
+        """Small passage for the LLM: what was computed over which table, the result and the rows behind it"""
+        page = f", page {self.record.page}" if self.record.page else ""
+        lines = [f"[TABLE RESULT from {os.path.basename(self.record.source)}{page}, "
+                 f"table with columns: {', '.join(self.record.columns)}]",
+                 f"Computed: {self.describe()}"]
+        if self.value is not None:
+            lines.append(f"Result: {self.value}")
+        if not self.rows.empty:
+            shown = self.rows.head(MAX_RESULT_ROWS)
+            lines.append(f"Matching rows ({len(self.rows)}{', first ' + str(MAX_RESULT_ROWS) if len(self.rows) > MAX_RESULT_ROWS else ''}):")
+            lines.append(shown.to_string(index=False))
+        return "\n".join(lines)
+
+
+def is_tabular_question(question: str) -> bool:
+    return bool(TABULAR_PATTERN.search(question))
+
+
+def _terms(text: str) -> List[str]:
+    return [word for word in _WORD.findall(text.lower()) if len(word) > 2 and word not in STOPWORDS]
+
+
+def _stem(word: str) -> str:
+    return word[:-1] if word.endswith("s") and len(word) > 3 else word
+
+
+def _matches(term: str, text: str) -> bool:
+    return re.search(rf"\b{re.escape(_stem(term))}", text.lower()) is not None
+
+
+def _is_numeric(series: pd.Series) -> bool:
+    return pd.api.types.is_numeric_dtype(series)
+
+
+def _is_flag_column(series: pd.Series) -> bool:
+    if _is_numeric(series):
+        return False
+    values = {str(value).strip().lower() for value in series.dropna() if str(value).strip()}
+    return bool(values) and len(values) <= 3 and bool(values & TRUTHY)
+
+
+def _operation(question: str) -> str:
+    for name, pattern in OPERATIONS:
+        if pattern.search(question):
+            return name
+    return "list"
+
+
+def plan_and_run(question: str, record: TableRecord, frame: pd.DataFrame) -> Optional[TableAnswer]:
+    """Read the operation, target column and filters from the question and run them on one table"""
+    operation = _operation(question)
+    terms = _terms(question)
+    column_terms = {column: _terms(column) for column in frame.columns}
+    mentioned_columns = [column for column, words in column_terms.items()
+                         if any(_stem(term) == _stem(word) for term in terms for word in words)]
+
+    # Numeric target for sum/mean/max/min: a mentioned numeric column, else the only numeric column
+    column = None
+    if operation in ("sum", "mean", "max", "min"):
+        numeric = [name for name in frame.columns if _is_numeric(frame[name])]
+        candidates = [name for name in mentioned_columns if name in numeric] or (numeric if len(numeric) == 1 else [])
+        if not candidates:
+            if operation in ("max", "min"):
+                operation = "list"
+            else:
+                return None
+        else:
+            column = candidates[0]
+
+    # Filters: a flag column named in the question ("admin" -> Admin = Yes), or question words found in cells
+    mask = pd.Series(True, index=frame.index)
+    filters = []
+    header_words = {_stem(word) for words in column_terms.values() for word in words}
+    for name in mentioned_columns:
+        if name != column and _is_flag_column(frame[name]):
+            mask &= frame[name].astype(str).str.strip().str.lower().isin(TRUTHY)
+            filters.append(f"{name} is set")
+    for term in terms:
+        if _stem(term) in header_words:
+            continue
+        term_mask = pd.Series(False, index=frame.index)
+        matched_columns = []
+        for name in frame.columns:
+            if _is_numeric(frame[name]):
+                continue
+            hits = frame[name].astype(str).map(lambda cell: _matches(term, cell))
+            if hits.any():
+                term_mask |= hits
+                matched_columns.append(name)
+        # A word found in every row does not narrow anything down
+        if matched_columns and not term_mask.all():
+            mask &= term_mask
+            filters.append(f"{' or '.join(matched_columns)} mentions '{term}'")
+
+    rows = frame[mask]
+    if operation == "count":
+        value = int(len(rows))
+    elif operation in ("sum", "mean"):
+        values = rows[column].dropna()
+        if values.empty:
+            return None
+        value = values.sum() if operation == "sum" else round(float(values.mean()), 4)
+    elif operation in ("max", "min"):
+        values = rows[column].dropna()
+        if values.empty:
+            return None
+        value = values.max() if operation == "max" else values.min()
+        rows = rows[rows[column] == value]
+    else:
+        # A listing is only an answer when the question's words picked out some rows; "which module is
+        # responsible for X" with no matching cells is a lookup the text chunks answer better
+        if rows.empty or len(rows) == len(frame):
+            return None
+        value = None
+    if hasattr(value, "item"):
+        value = value.item()
+    return TableAnswer(record, operation, column, filters, value, rows)
+
+
+def _table_score(question_terms: List[str], record: TableRecord, frame: pd.DataFrame) -> int:
+    header = " ".join(record.columns).lower()
+    cells = " ".join(frame.astype(str).to_numpy().ravel().tolist()).lower()
+    score = 0
+    for term in set(question_terms):
+        if _matches(term, header):
+            score += 2
+        elif _matches(term, cells):
+            score += 1
+    return score
+
+
+def _retrieved_table_keys(results: List[Tuple[Document, float]]) -> set:
+    return {(str(doc.metadata.get("source")), doc.metadata.get("page"), doc.metadata.get("content_type"),
+             doc.metadata.get("table_index") or doc.metadata.get("image_index"))
+            for doc, _ in results}
+
+
+def answer_table_question(question: str, results: List[Tuple[Document, float]],
+                          store: Optional[TableStore] = None) -> Optional[TableAnswer]:
+    """Computed answer from the best matching table of the retrieved sources, or None to use the text path"""
+    if not TABLE_QA_ENABLED or not is_tabular_question(question):
+        return None
+    store = store or get_table_store()
+    records = store.records({doc.metadata.get("source") for doc, _ in results})
+    if not records:
+        return None
+
+    terms = _terms(question)
+    retrieved = _retrieved_table_keys(results)
+    scored = []
+    for record in records:
+        try:
+            frame = store.load(record)
+        except FileNotFoundError:
+            continue  # Replaced by a re-ingest since the catalog was read
+        score = _table_score(terms, record, frame)
+        if (record.source, record.page, record.content_type, record.table_index) in retrieved:
+            score += RETRIEVED_TABLE_BONUS
+        if score >= MIN_TABLE_SCORE:
+            scored.append((score, record, frame))
+
+    for _, record, frame in sorted(scored, key=lambda item: -item[0]):
+        answer = plan_and_run(question, record, frame)
+        if answer is not None:
+            return answer
+    return None
@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Structured store for extracted tables
+Native PDF, image and DOCX tables are kept as typed DataFrames (Parquet when pyarrow is installed, pickle
+otherwise) with their source, page and origin in a SQLite catalog, so table questions can be answered by
+filtering and aggregating the table itself instead of prompting with its flattened text.
+Each index version has its own store beside its vectors and parents, written by the same build or upsert
+"""
+
+import os
+import re
+import json
+import sqlite3
+import uuid
+import hashlib
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import pandas as pd
+from index_versions import current_version, table_store_path
+
+try:
+    import pyarrow  # noqa: F401
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
+TABLE_STORE_PATH = os.environ.get("TABLE_STORE_PATH", "table_store")  # Used before the first versioned build
+TABLE_STORE_ENABLED = os.environ.get("TABLE_STORE", "1") != "0"
+NUMERIC_SHARE = 0.8  # Share of non-empty cells that must parse as numbers for a column to become numeric
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tables (
+    table_id TEXT PRIMARY KEY,
+    source TEXT,
+    page INTEGER,
+    content_type TEXT,
+    table_index INTEGER,
+    columns TEXT,
+    n_rows INTEGER,
+    file TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_tables_source ON tables (source);
+"""
+
+_NUMBER_CLEANUP = re.compile(r"[,\s$€£%]")
+
+# Tables of each source as (DataFrame, metadata with page, content_type and table_index)
+TablesBySource = Dict[str, List[Tuple[pd.DataFrame, Dict]]]
+
+
+@dataclass
+class TableRecord:
+    table_id: str
+    source: str
+    page: Optional[int]
+    content_type: str
+    table_index: Optional[int]
+    columns: List[str]
+    n_rows: int
+    file: str
+
+
+def _header_names(cells: Sequence) -> List[str]:
+    """Non-empty, unique column names"""
+    names, seen = [], Counter()
+    for i, cell in enumerate(cells):
+        name = re.sub(r"\s+", " ", str(cell)).strip() if cell is not None else ""
+        if not name or name.lower() in ("nan", "none") or name.startswith("Unnamed:"):
+            name = f"column_{i + 1}"
+        seen[name] += 1
+        names.append(name if seen[name] == 1 else f"{name}_{seen[name]}")
+    return names
+
+
+def _coerce_column(series: pd.Series) -> pd.Series:
+    """Numbers such as '1,200', '$35', '12%' or '(4)' become numeric when most cells parse"""
+    values = series.fillna("").astype(str).str.strip()
+    non_empty = values != ""
+    if not non_empty.any():
+        return values
+    cleaned = values.str.replace(_NUMBER_CLEANUP, "", regex=True).str.replace(r"^\((.*)\)$", r"-\1", regex=True)
+    numbers = pd.to_numeric(cleaned, errors="coerce")
+    if numbers[non_empty].notna().mean() < NUMERIC_SHARE:
+        return values
+    if numbers.dropna().mod(1).eq(0).all():
+        return numbers.astype("Int64")
+    return numbers
+
+
+def normalize_frame(frame: pd.DataFrame) -> pd.DataFrame:
+    """Clean header names, drop empty rows and columns, and type numeric columns"""
+    frame = frame.copy()
+    frame.columns = _header_names(frame.columns)
+    frame = frame.map(lambda cell: re.sub(r"\s+", " ", cell).strip() if isinstance(cell, str) else cell)
+    frame = frame.replace("", pd.NA).dropna(how="all").dropna(axis=1, how="all")
+    for column in frame.columns:
+        frame[column] = _coerce_column(frame[column])
+    return frame.reset_index(drop=True)
+
+
+def rows_to_frame(rows: List[List[str]]) -> pd.DataFrame:
+    """DataFrame from extracted rows, using the first row as the header"""
+    width = max((len(row) for row in rows), default=0)
+    padded = [list(row) + [""] * (width - len(row)) for row in rows]
+    if len(padded) < 2:
+        return pd.DataFrame()
+    return normalize_frame(pd.DataFrame(padded[1:], columns=padded[0]))
+
+
+def default_table_store_path(version: Optional[str] = None) -> str:
+    """Table store of the given (default: live) version, else the unversioned store of older deployments"""
+    version = version or current_version()
+    if version and os.path.isdir(table_store_path(version)):
+        return table_store_path(version)
+    return TABLE_STORE_PATH
+
+
+class TableStore:
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or default_table_store_path()
+        Path(path).mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        return sqlite3.connect(os.path.join(self.path, "tables.db"), timeout=30)
+
+    def replace_source(self, source: str, tables: List[Tuple[pd.DataFrame, Dict]]):
+        """Store a document's tables, replacing whatever was stored for it before"""
+        prefix = hashlib.sha1(str(source).encode("utf-8")).hexdigest()[:12]
+        # Each write gets fresh file names, so other processes never read a half-written file or a cached frame
+        # for a path that now holds different data; old files are removed only after the catalog points away
+        generation = uuid.uuid4().hex[:8]
+        rows = []
+        for i, (frame, metadata) in enumerate(tables):
+            if frame.empty or len(frame.columns) < 2:
+                continue
+            table_id = f"{prefix}-{i + 1}"
+            file_name = f"{table_id}-{generation}" + (".parquet" if PARQUET_AVAILABLE else ".pkl")
+            file_path = os.path.join(self.path, file_name)
+            # Parquet needs string column names and one type per column
+            if PARQUET_AVAILABLE:
+                frame.to_parquet(file_path, index=False)
+            else:
+                frame.to_pickle(file_path)
+            rows.append((table_id, str(source), metadata.get("page"), metadata.get("content_type"),
+                         metadata.get("table_index") or metadata.get("image_index"), json.dumps(list(frame.columns)), len(frame), file_name))
+
+        with self._lock, self._connect() as conn:
+            stale = [file for (file,) in conn.execute("SELECT file FROM tables WHERE source = ?", (str(source),))]
+            conn.execute("DELETE FROM tables WHERE source = ?", (str(source),))
+            conn.executemany("INSERT OR REPLACE INTO tables VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        for file in set(stale) - {row[-1] for row in rows}:
+            try:
+                os.unlink(os.path.join(self.path, file))
+            except FileNotFoundError:
+                pass
+        load_frame.cache_clear()
+
+    def records(self, sources: Optional[Sequence[str]] = None) -> List[TableRecord]:
+        """Catalog entries, optionally only for the given sources"""
+        query = "SELECT * FROM tables"
+        params: Tuple = ()
+        if sources is not None:
+            sources = sorted({str(source) for source in sources})
+            if not sources:
+                return []
+            query += f" WHERE source IN ({','.join('?' * len(sources))})"
+            params = tuple(sources)
+        with self._connect() as conn:
+            rows = conn.execute(query + " ORDER BY source, page, table_index", params).fetchall()
+        return [TableRecord(row[0], row[1], row[2], row[3], row[4], json.loads(row[5]), row[6], row[7]) for row in rows]
+
+    def load(self, record: TableRecord) -> pd.DataFrame:
+        return load_frame(os.path.join(self.path, record.file))
+
+    def all_tables(self) -> TablesBySource:
+        """Every stored table grouped by source, for carrying the store into bundles and new versions"""
+        tables: TablesBySource = {}
+        for record in self.records():
+            metadata = {"page": record.page, "content_type": record.content_type, "table_index": record.table_index}
+            tables.setdefault(record.source, []).append((self.load(record), metadata))
+        return tables
+
+
+def write_tables(path: str, tables: TablesBySource):
+    """Store the tables of each source at path, replacing what was stored there for those sources"""
+    if not TABLE_STORE_ENABLED:
+        return
+    store = TableStore(path)
+    for source, source_tables in tables.items():
+        store.replace_source(source, source_tables)
+
+
+@lru_cache(maxsize=64)
+def load_frame(file_path: str) -> pd.DataFrame:
+    if file_path.endswith(".parquet"):
+        return pd.read_parquet(file_path)
+    return pd.read_pickle(file_path)
+
+
+def get_table_store() -> TableStore:
+    """Store of the live index version; follows promotions made by other processes"""
+    return _open_table_store(default_table_store_path())
+
+
+@lru_cache(maxsize=4)
+def _open_table_store(path: str) -> TableStore:
+    return TableStore(path)
@@ -0,0 +1,530 @@
+#!/usr/bin/env python3
+"""
+Vector store abstraction used by every entry point
+ChromaVectorStore wraps the persistent Chroma collection; FlatVectorStore is a memory-mapped float32 matrix
+with a JSONL metadata sidecar, searched with a blocked NumPy matmul and argpartition top-k
+"""
+
+import os
+import json
+import shutil
+import threading
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional, Set, Tuple
+
+import numpy as np
+from langchain.schema import Document
+from index_versions import current_version, vector_path
+from dedup import rehome_metadata
+
+CHROMA_PATH = "chroma"
+FLAT_INDEX_PATH = "flat_index"
+VECTOR_STORE_BACKEND = os.environ.get("VECTOR_STORE", "chroma")  # chroma | flat
+EMBEDDING_BACKEND = os.environ.get("EMBEDDING_BACKEND", "torch")  # torch | onnx
+
+EMBEDDING_MODEL_PATH = os.path.expanduser("~/.cache/huggingface/hub/models--sentence-transformers--all-MiniLM-L6-v2/snapshots/c9745ed1d9f207416be6d2e6f8de32d1f16199bf")
+
+# HNSW settings applied when the Chroma collection is created (defaults match Chroma's own)
+HNSW_SPACE = os.environ.get("CHROMA_HNSW_SPACE", "l2")  # l2 | cosine | ip
+HNSW_M = int(os.environ.get("CHROMA_HNSW_M", "16"))
+HNSW_CONSTRUCTION_EF = int(os.environ.get("CHROMA_HNSW_CONSTRUCTION_EF", "100"))
+HNSW_SEARCH_EF = int(os.environ.get("CHROMA_HNSW_SEARCH_EF", "10"))
+
+EMBED_BATCH_SIZE = 256
+CHROMA_ADD_BATCH_SIZE = 5000  # Below Chroma's max batch size for a single add
+FLAT_ADD_BATCH_SIZE = 65536  # Rows per append when bulk-loading pre-computed vectors
+SEARCH_BLOCK_ROWS = 65536  # Rows scored per matmul block, bounds temporary memory during search
+
+
+@lru_cache(maxsize=1)
+def get_embedding_function():
+    """Local MiniLM embeddings (local model path avoids network requests), loaded once per process.
+    EMBEDDING_BACKEND=onnx uses the exported ONNX model and skips the torch import entirely."""
+    if EMBEDDING_BACKEND == "onnx":
+        try:
+            from onnx_embeddings import OnnxEmbeddings
+            return OnnxEmbeddings()
+        except RuntimeError as e:
+            print(f"⚠️ ONNX embeddings unavailable ({e}), falling back to torch")
+    from langchain_huggingface import HuggingFaceEmbeddings
+    return HuggingFaceEmbeddings(model_name=EMBEDDING_MODEL_PATH)
+
+
+def embedding_model_name() -> str:
+    """Identifies the vector space; bundles and shards built with different models must not be mixed"""
+    return os.path.basename(EMBEDDING_MODEL_PATH.split("/snapshots/")[0]).replace("models--", "").replace("--", "/")
+
+
+def embed_texts(embedding_function, texts: List[str]) -> np.ndarray:
+    """L2-normalised float32 embeddings, computed in batches of EMBED_BATCH_SIZE"""
+    vectors = []
+    for i in range(0, len(texts), EMBED_BATCH_SIZE):
+        vectors.extend(embedding_function.embed_documents(texts[i:i + EMBED_BATCH_SIZE]))
+    matrix = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.maximum(norms, 1e-12)
+
+
+def relevance_from_cosine(scores: np.ndarray, space: str = None) -> np.ndarray:
+    """Cosine similarities of normalised vectors on the relevance scale LangChain's Chroma wrapper reports for the
+    configured HNSW space, so ROUTER_MIN_SCORE and the quality filter mean the same thing on every backend.
+    l2: Chroma returns squared distance 2 - 2cos and LangChain maps it to 1 - d / sqrt(2); cosine and ip: cos."""
+    if (space or HNSW_SPACE) == "l2":
+        return 1.0 - (2.0 - 2.0 * np.asarray(scores)) / np.sqrt(2.0)
+    return np.asarray(scores)
+
+
+def hnsw_metadata(space: str = None, m: int = None, construction_ef: int = None, search_ef: int = None) -> Dict:
+    """Chroma collection metadata for the HNSW index; unset arguments use the configured defaults"""
+    return {
+        "hnsw:space": space or HNSW_SPACE,
+        "hnsw:M": m or HNSW_M,
+        "hnsw:construction_ef": construction_ef or HNSW_CONSTRUCTION_EF,
+        "hnsw:search_ef": search_ef or HNSW_SEARCH_EF,
+    }
+
+
+class VectorStore:
+    """Interface shared by the vector store backends"""
+    path: str
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def count(self) -> int:
+        raise NotImplementedError
+
+    def add_documents(self, documents: List[Document]):
+        raise NotImplementedError
+
+    def delete_sources(self, sources: Set[str]) -> int:
+        """Remove every vector whose metadata source is in sources; returns how many were removed.
+        A deduplicated chunk that also stands for a surviving source is kept and re-pointed at that source."""
+        raise NotImplementedError
+
+    def metadata_records(self) -> Tuple[List[str], List[str], List[Dict]]:
+        """(ids, texts, metadatas) for everything in the store, without the vectors"""
+        raise NotImplementedError
+
+    def update_metadatas(self, ids: List[str], metadatas: List[Dict]):
+        """Replace the metadata of existing entries; their vectors are kept"""
+        raise NotImplementedError
+
+    def rebuild(self, documents: List[Document]):
+        """Replace the whole store with these documents"""
+        raise NotImplementedError
+
+    def rebuild_from_vectors(self, ids: List[str], texts: List[str], metadatas: List[Dict], vectors: np.ndarray):
+        """Replace the whole store with pre-computed embeddings; nothing is re-embedded"""
+        raise NotImplementedError
+
+    def export_vectors(self) -> Tuple[List[str], List[str], List[Dict], np.ndarray]:
+        """(ids, texts, metadatas, float32 vectors) for everything in the store"""
+        raise NotImplementedError
+
+    def similarity_search_with_relevance_scores(self, query: str, k: int = 4) -> List[Tuple[Document, float]]:
+        raise NotImplementedError
+
+    def close(self):
+        """Release memory and file handles held for this store; it reopens lazily if used again"""
+
+    def batch_similarity_search_with_relevance_scores(self, queries: List[str], k: int = 4) -> List[List[Tuple[Document, float]]]:
+        """Results per query; backends override this to embed and search all queries in one pass"""
+        return [self.similarity_search_with_relevance_scores(query, k=k) for query in queries]
+
+
+class ChromaVectorStore(VectorStore):
+    def __init__(self, embedding_function, path: str = CHROMA_PATH, hnsw_config: Optional[Dict] = None):
+        self.embedding_function = embedding_function
+        self.path = path
+        self.hnsw_config = hnsw_config or hnsw_metadata()
+        self._db = None
+
+    @property
+    def db(self):
+        if self._db is None:
+            from langchain_community.vectorstores import Chroma
+            self._db = Chroma(persist_directory=self.path, embedding_function=self.embedding_function)
+        return self._db
+
+    def count(self) -> int:
+        return self.db._collection.count()
+
+    def close(self):
+        # chromadb caches one system (SQLite connection, HNSW segments) per path for the life of the process;
+        # drop and stop this path's system so a retired index version does not stay loaded
+        if self._db is None:
+            return
+        client, self._db = self._db._client, None
+        systems = getattr(client, "_identifer_to_system", None)
+        system = systems.pop(getattr(client, "_identifier", None), None) if systems is not None else None
+        if system is not None:
+            try:
+                system.stop()
+            except Exception as e:
+                print(f"⚠️ Could not stop Chroma system for {self.path}: {e}")
+
+    def stored_hnsw_config(self) -> Dict:
+        """HNSW settings the persisted collection was built with (not the env defaults)"""
+        metadata = self.db._collection.metadata or {}
+        return {key: value for key, value in metadata.items() if key.startswith("hnsw:")}
+
+    def add_documents(self, documents: List[Document]):
+        self.db.add_documents(documents)
+
+    def delete_sources(self, sources: Set[str]) -> int:
+        collection = self.db._collection
+        owned = collection.get(where={"source": {"$in": sorted(sources)}}, include=["metadatas"])
+        linked = collection.get(where={"duplicate_count": {"$gt": 0}}, include=["metadatas"])
+        delete_ids, update_ids, update_metadatas = [], [], []
+        for doc_id, metadata in zip(owned["ids"] + linked["ids"], owned["metadatas"] + linked["metadatas"]):
+            if doc_id in update_ids or doc_id in delete_ids:
+                continue
+            updated = rehome_metadata(metadata or {}, sources)
+            if updated is None:
+                delete_ids.append(doc_id)
+            elif updated is not metadata:
+                update_ids.append(doc_id)
+                update_metadatas.append(updated)
+        if update_ids:
+            collection.update(ids=update_ids, metadatas=update_metadatas)
+        if delete_ids:
+            collection.delete(ids=delete_ids)
+        return len(delete_ids)
+
+    def metadata_records(self) -> Tuple[List[str], List[str], List[Dict]]:
+        collection = self.db._collection
+        ids, texts, metadatas = [], [], []
+        for offset in range(0, collection.count(), CHROMA_ADD_BATCH_SIZE):
+            page = collection.get(include=["documents", "metadatas"], limit=CHROMA_ADD_BATCH_SIZE, offset=offset)
+            ids.extend(page["ids"])
+            texts.extend(page["documents"])
+            metadatas.extend(metadata or {} for metadata in page["metadatas"])
+        return ids, texts, metadatas
+
+    def update_metadatas(self, ids: List[str], metadatas: List[Dict]):
+        for start in range(0, len(ids), CHROMA_ADD_BATCH_SIZE):
+            self.db._collection.update(ids=ids[start:start + CHROMA_ADD_BATCH_SIZE],
+                                       metadatas=metadatas[start:start + CHROMA_ADD_BATCH_SIZE])
+
+    def rebuild(self, documents: List[Document]):
+        from langchain_community.vectorstores import Chroma
+        # Check if database exists and is accessible
+        if os.path.exists(self.path):
+            try:
+                self.count()  # Test connection
+                print(f"Existing database is accessible, clearing it...")
+            except Exception as e:
+                print(f"Existing database is corrupted ({e}), removing it...")
+            self._db = None
+            shutil.rmtree(self.path)
+
+        # Create new database with the configured HNSW parameters
+        self._db = Chroma.from_documents(documents, self.embedding_function, persist_directory=self.path,
+                                         collection_metadata=self.hnsw_config)
+
+    def rebuild_from_vectors(self, ids: List[str], texts: List[str], metadatas: List[Dict], vectors: np.ndarray):
+        from langchain_community.vectorstores import Chroma
+        self._db = None
+        if os.path.exists(self.path):
+            shutil.rmtree(self.path)
+        self._db = Chroma(persist_directory=self.path, embedding_function=self.embedding_function,
+                          collection_metadata=self.hnsw_config)
+        for start in range(0, len(ids), CHROMA_ADD_BATCH_SIZE):
+            end = start + CHROMA_ADD_BATCH_SIZE
+            self._db._collection.add(ids=ids[start:end], documents=texts[start:end], metadatas=metadatas[start:end],
+                                     embeddings=np.asarray(vectors[start:end], dtype=np.float32).tolist())
+
+    def export_vectors(self) -> Tuple[List[str], List[str], List[Dict], np.ndarray]:
+        collection = self.db._collection
+        count = collection.count()
+        ids, texts, metadatas, vectors = [], [], [], None
+        for offset in range(0, count, CHROMA_ADD_BATCH_SIZE):
+            page = collection.get(include=["documents", "metadatas", "embeddings"], limit=CHROMA_ADD_BATCH_SIZE, offset=offset)
+            embeddings = np.asarray(page["embeddings"], dtype=np.float32)
+            if vectors is None:
+                vectors = np.empty((count, embeddings.shape[1]), dtype=np.float32)
+            vectors[len(ids):len(ids) + len(embeddings)] = embeddings
+            ids.extend(page["ids"])
+            texts.extend(page["documents"])
+            metadatas.extend(metadata or {} for metadata in page["metadatas"])
+        return ids, texts, metadatas, vectors[:len(ids)] if vectors is not None else np.zeros((0, 0), dtype=np.float32)
+
+    def similarity_search_with_relevance_scores(self, query: str, k: int = 4) -> List[Tuple[Document, float]]:
+        return self.db.similarity_search_with_relevance_scores(query, k=k)
+
+    def batch_similarity_search_with_relevance_scores(self, queries: List[str], k: int = 4) -> List[List[Tuple[Document, float]]]:
+        """Batched embedding forward passes, then one multi-query collection lookup"""
+        if not queries:
+            return []
+        vectors = []
+        for i in range(0, len(queries), EMBED_BATCH_SIZE):
+            vectors.extend(self.embedding_function.embed_documents(queries[i:i + EMBED_BATCH_SIZE]))
+        result = self.db._collection.query(query_embeddings=vectors, n_results=k,
+                                           include=["documents", "metadatas", "distances"])
+        relevance = self.db._select_relevance_score_fn()
+        return [[(Document(page_content=text, metadata=metadata or {}), relevance(distance))
+                 for text, metadata, distance in zip(texts, metadatas, distances)]
+                for texts, metadatas, distances in zip(result["documents"], result["metadatas"], result["distances"])]
+
+
+class FlatVectorStore(VectorStore):
+    """Exact cosine search over normalised float32 vectors memory-mapped from disk.
+    Worker processes opening the same index share its pages through the OS page cache.
+    Relevance scores are reported on Chroma's scale for CHROMA_HNSW_SPACE (see relevance_from_cosine)."""
+
+    def __init__(self, embedding_function, path: str = FLAT_INDEX_PATH):
+        self.embedding_function = embedding_function
+        self.path = path
+        self._lock = threading.Lock()
+        self._vectors: Optional[np.memmap] = None
+        self._offsets: Optional[np.ndarray] = None
+        self._manifest: Optional[Dict] = None
+
+    @property
+    def _vectors_path(self) -> Path:
+        return Path(self.path) / "vectors.f32"
+
+    @property
+    def _metadata_path(self) -> Path:
+        return Path(self.path) / "metadata.jsonl"
+
+    @property
+    def _offsets_path(self) -> Path:
+        return Path(self.path) / "metadata.idx"
+
+    @property
+    def _manifest_path(self) -> Path:
+        return Path(self.path) / "manifest.json"
+
+    def exists(self) -> bool:
+        return self._manifest_path.exists()
+
+    def _read_manifest(self) -> Dict:
+        with open(self._manifest_path) as f:
+            return json.load(f)
+
+    def _write_manifest(self, manifest: Dict):
+        temp_path = self._manifest_path.with_suffix(".json.tmp")
+        with open(temp_path, "w") as f:
+            json.dump(manifest, f)
+        os.replace(temp_path, self._manifest_path)
+
+    def _open(self):
+        """(Re)map the index when it changed on disk; only rows listed in the manifest are visible"""
+        manifest = self._read_manifest()
+        if self._manifest == manifest:
+            return
+        count, dim = manifest["count"], manifest["dim"]
+        self._vectors = np.memmap(self._vectors_path, dtype=np.float32, mode="r", shape=(count, dim)) if count else None
+        self._offsets = np.fromfile(self._offsets_path, dtype=np.uint64, count=count + 1)
+        self._manifest = manifest
+
+    def count(self) -> int:
+        return self._read_manifest()["count"] if self.exists() else 0
+
+    def close(self):
+        with self._lock:
+            self._vectors = None
+            self._offsets = None
+            self._manifest = None
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        return embed_texts(self.embedding_function, texts)
+
+    def add_vectors(self, ids: List[str], texts: List[str], metadatas: List[Dict], vectors: np.ndarray):
+        """Append pre-computed vectors; the manifest is replaced last so readers never see partial rows"""
+        with self._lock:
+            Path(self.path).mkdir(parents=True, exist_ok=True)
+            manifest = self._read_manifest() if self.exists() else {"count": 0, "dim": int(vectors.shape[1])}
+            if manifest["count"] and manifest["dim"] != vectors.shape[1]:
+                raise ValueError(f"Vector dimension {vectors.shape[1]} does not match index dimension {manifest['dim']}")
+            count = manifest["count"]
+
+            # Truncate anything past the committed rows left behind by an interrupted write
+            with open(self._vectors_path, "ab") as f:
+                f.truncate(count * manifest["dim"] * 4)
+                f.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+
+            offsets = np.fromfile(self._offsets_path, dtype=np.uint64, count=count + 1) if count else np.zeros(1, dtype=np.uint64)
+            position = int(offsets[-1])
+            new_offsets = []
+            with open(self._metadata_path, "ab") as f:
+                f.truncate(position)
+                for doc_id, text, metadata in zip(ids, texts, metadatas):
+                    line = (json.dumps({"id": doc_id, "text": text, "metadata": metadata}) + "\n").encode("utf-8")
+                    f.write(line)
+                    position += len(line)
+                    new_offsets.append(position)
+            temp_offsets = self._offsets_path.with_suffix(".idx.tmp")
+            np.concatenate([offsets, np.asarray(new_offsets, dtype=np.uint64)]).tofile(temp_offsets)
+            os.replace(temp_offsets, self._offsets_path)
+
+            manifest["count"] = count + len(ids)
+            self._write_manifest(manifest)
+
+    def add_documents(self, documents: List[Document]):
+        if not documents:
+            return
+        texts = [doc.page_content for doc in documents]
+        start = self.count()
+        ids = [str(start + i) for i in range(len(documents))]
+        self.add_vectors(ids, texts, [doc.metadata for doc in documents], self._embed(texts))
+
+    def delete_sources(self, sources: Set[str]) -> int:
+        """Rewrite the index without those sources; kept vectors are copied, not re-embedded"""
+        if not self.exists():
+            return 0
+        with self._lock:
+            self._open()
+            with open(self._metadata_path, "rb") as f:
+                records = [json.loads(line) for line in f]
+            metadatas = [rehome_metadata(record["metadata"], sources) for record in records]
+            keep = [row for row, metadata in enumerate(metadatas) if metadata is not None]
+            removed = len(records) - len(keep)
+            if not removed and all(metadata is record["metadata"] for metadata, record in zip(metadatas, records)):
+                return 0
+            self._rewrite([str(i) for i in range(len(keep))], [records[row]["text"] for row in keep],
+                          [metadatas[row] for row in keep], np.asarray(self._vectors[keep]))
+        return removed
+
+    def metadata_records(self) -> Tuple[List[str], List[str], List[Dict]]:
+        if not self.exists():
+            return [], [], []
+        with self._lock:
+            self._open()
+            with open(self._metadata_path, "rb") as f:
+                records = [json.loads(line) for _, line in zip(range(self._manifest["count"]), f)]
+        return [record["id"] for record in records], [record["text"] for record in records], \
+            [record["metadata"] for record in records]
+
+    def update_metadatas(self, ids: List[str], metadatas: List[Dict]):
+        """Rewrite the index with new metadata for those ids; vectors are copied unchanged"""
+        if not ids:
+            return
+        updates = dict(zip(ids, metadatas))
+        with self._lock:
+            self._open()
+            with open(self._metadata_path, "rb") as f:
+                records = [json.loads(line) for _, line in zip(range(self._manifest["count"]), f)]
+            self._rewrite([record["id"] for record in records], [record["text"] for record in records],
+                          [updates.get(record["id"], record["metadata"]) for record in records], np.asarray(self._vectors))
+
+    def _rewrite(self, ids: List[str], texts: List[str], metadatas: List[Dict], vectors: np.ndarray):
+        """Write these rows into a sibling directory and swap it in, so a crash never loses the index; needs _lock"""
+        temp_path = f"{self.path}.{os.getpid()}.tmp"
+        old_path = f"{self.path}.{os.getpid()}.old"
+        shutil.rmtree(temp_path, ignore_errors=True)
+        FlatVectorStore(self.embedding_function, temp_path).add_vectors(ids, texts, metadatas, vectors)
+        self._vectors = None
+        self._manifest = None
+        os.replace(self.path, old_path)
+        os.replace(temp_path, self.path)
+        shutil.rmtree(old_path, ignore_errors=True)
+
+    def rebuild(self, documents: List[Document]):
+        with self._lock:
+            if os.path.exists(self.path):
+                shutil.rmtree(self.path)
+            self._manifest = None
+        self.add_documents(documents)
+
+    def rebuild_from_vectors(self, ids: List[str], texts: List[str], metadatas: List[Dict], vectors: np.ndarray):
+        with self._lock:
+            if os.path.exists(self.path):
+                shutil.rmtree(self.path)
+            self._manifest = None
+        for start in range(0, len(ids), FLAT_ADD_BATCH_SIZE):
+            end = start + FLAT_ADD_BATCH_SIZE
+            batch = np.asarray(vectors[start:end], dtype=np.float32)
+            self.add_vectors(ids[start:end], texts[start:end], metadatas[start:end],
+                             batch / np.maximum(np.linalg.norm(batch, axis=1, keepdims=True), 1e-12))
+
+    def export_vectors(self) -> Tuple[List[str], List[str], List[Dict], np.ndarray]:
+        if not self.exists():
+            return [], [], [], np.zeros((0, 0), dtype=np.float32)
+        with self._lock:
+            self._open()
+            count = self._manifest["count"]
+            vectors = np.array(self._vectors) if count else np.zeros((0, self._manifest["dim"]), dtype=np.float32)
+            with open(self._metadata_path, "rb") as f:
+                records = [json.loads(line) for _, line in zip(range(count), f)]
+        return [record["id"] for record in records], [record["text"] for record in records], \
+            [record["metadata"] for record in records], vectors
+
+    def _document(self, row: int) -> Document:
+        start, end = int(self._offsets[row]), int(self._offsets[row + 1])
+        with open(self._metadata_path, "rb") as f:
+            f.seek(start)
+            record = json.loads(f.read(end - start))
+        return Document(page_content=record["text"], metadata=record["metadata"])
+
+    def search_by_vectors(self, queries: np.ndarray, k: int = 4) -> List[List[Tuple[int, float]]]:
+        """Top-k (row, cosine score) per query for a batch of normalised query vectors"""
+        with self._lock:
+            self._open()
+        if self._vectors is None:
+            return [[] for _ in range(len(queries))]
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        count = self._vectors.shape[0]
+        k = min(k, count)
+        if k <= 0:
+            return [[] for _ in range(len(queries))]
+
+        best_scores = np.full((len(queries), 0), -np.inf, dtype=np.float32)
+        best_rows = np.zeros((len(queries), 0), dtype=np.int64)
+        for block_start in range(0, count, SEARCH_BLOCK_ROWS):
+            block = self._vectors[block_start:block_start + SEARCH_BLOCK_ROWS]
+            scores = np.concatenate([best_scores, queries @ block.T], axis=1)
+            rows = np.concatenate([best_rows, np.broadcast_to(np.arange(block_start, block_start + len(block)), (len(queries), len(block)))], axis=1)
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            best_scores = np.take_along_axis(scores, top, axis=1)
+            best_rows = np.take_along_axis(rows, top, axis=1)
+
+        order = np.argsort(-best_scores, axis=1)
+        best_scores = np.take_along_axis(best_scores, order, axis=1)
+        best_rows = np.take_along_axis(best_rows, order, axis=1)
+        return [list(zip(rows.tolist(), scores.tolist())) for rows, scores in zip(best_rows, best_scores)]
+
+    def similarity_search_with_relevance_scores(self, query: str, k: int = 4) -> List[Tuple[Document, float]]:
+        query_vector = np.asarray(self.embedding_function.embed_query(query), dtype=np.float32)
+        query_vector /= max(float(np.linalg.norm(query_vector)), 1e-12)
+        hits = self.search_by_vectors(query_vector[None, :], k=k)[0]
+        return [(self._document(row), float(relevance_from_cosine(score))) for row, score in hits]
+
+    def batch_similarity_search_with_relevance_scores(self, queries: List[str], k: int = 4) -> List[List[Tuple[Document, float]]]:
+        if not queries:
+            return []
+        return [[(self._document(row), float(relevance_from_cosine(score))) for row, score in hits]
+                for hits in self.search_by_vectors(self._embed(queries), k=k)]
+
+
+def default_store_path(backend: str = VECTOR_STORE_BACKEND) -> str:
+    """Live versioned index when one has been promoted, else the legacy unversioned directory"""
+    version = current_version()
+    if version:
+        return vector_path(version, backend)
+    return FLAT_INDEX_PATH if backend == "flat" else CHROMA_PATH
+
+
+def validate_store(store: VectorStore, expected_count: int, smoke_queries: List[str]):
+    """Raise unless the store holds expected_count vectors and every smoke query returns a hit"""
+    count = store.count()
+    if count != expected_count:
+        raise RuntimeError(f"Index validation failed: expected {expected_count} vectors, found {count}")
+    for query in smoke_queries:
+        if not store.similarity_search_with_relevance_scores(query, k=1):
+            raise RuntimeError(f"Index validation failed: no results for smoke query {query[:50]!r}")
+
+
+def open_vector_store(embedding_function=None, backend: str = VECTOR_STORE_BACKEND, path: Optional[str] = None,
+                      hnsw_config: Optional[Dict] = None) -> VectorStore:
+    """Vector store for the configured backend (VECTOR_STORE=chroma|flat), at the live version by default"""
+    embedding_function = embedding_function or get_embedding_function()
+    path = path or default_store_path(backend)
+    if backend == "flat":
+        return FlatVectorStore(embedding_function, path)
+    if backend == "chroma":
+        return ChromaVectorStore(embedding_function, path, hnsw_config)
+    raise ValueError(f"Unknown vector store backend: {backend}")
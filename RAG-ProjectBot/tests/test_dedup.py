@@ -0,0 +1,85 @@
+import sys
+import json
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+import numpy as np
+import pytest
+from langchain.schema import Document
+from dedup import dedup_chunks, find_duplicates, rehome_metadata, chunk_sources, SIGNATURE_KEY
+from index_writer import link_stored_duplicates
+from vector_store import FlatVectorStore
+
+SHARED = ("The approval workflow routes every purchase request above the department limit to the finance "
+          "controller, who can approve, reject or return it to the requester with comments.")
+EDITED = SHARED.replace("with comments", "with written comments")
+OTHER = "Reports are generated nightly and emailed to each module owner as a PDF attachment."
+
+
+def test_find_duplicates_links_exact_and_near_copies():
+    representative, counts = find_duplicates([SHARED, OTHER, SHARED.upper(), EDITED], threshold=0.7)
+    assert representative == [0, 1, 0, 0]
+    assert counts == {"exact": 1, "near": 1}
+
+
+def test_dedup_chunks_lists_every_source_and_stores_signature():
+    chunks = [Document(page_content=SHARED, metadata={"source": "brd_v1.pdf", "page": 3}),
+              Document(page_content=SHARED, metadata={"source": "brd_v2.pdf", "page": 4})]
+    kept, stats = dedup_chunks(chunks)
+    assert stats["saved"] == 1
+    assert chunk_sources(kept[0].metadata) == [{"source": "brd_v1.pdf", "page": 3}, {"source": "brd_v2.pdf", "page": 4}]
+    assert kept[0].metadata["duplicate_count"] == 1
+    assert kept[0].metadata[SIGNATURE_KEY]
+
+
+def test_rehome_metadata():
+    metadata = {"source": "a.pdf", "page": 1, "duplicate_count": 2,
+                "all_sources": json.dumps([{"source": "a.pdf", "page": 1}, {"source": "b.pdf", "page": 7},
+                                           {"source": "c.pdf", "page": None}])}
+    assert rehome_metadata(metadata, {"d.pdf"}) is metadata
+    assert rehome_metadata(metadata, {"a.pdf", "b.pdf", "c.pdf"}) is None
+    rehomed = rehome_metadata(metadata, {"a.pdf"})
+    assert (rehomed["source"], rehomed["page"], rehomed["duplicate_count"]) == ("b.pdf", 7, 1)
+    rehomed = rehome_metadata(metadata, {"a.pdf", "b.pdf"})
+    assert rehomed["source"] == "c.pdf" and "page" not in rehomed
+
+
+def flat_store(path, chunks):
+    store = FlatVectorStore(None, str(path))
+    vectors = np.eye(len(chunks), 4, dtype=np.float32)
+    store.add_vectors([str(i) for i in range(len(chunks))], [chunk.page_content for chunk in chunks],
+                      [chunk.metadata for chunk in chunks], vectors)
+    return store
+
+
+@pytest.fixture
+def shared_store(tmp_path):
+    kept, _ = dedup_chunks([Document(page_content=SHARED, metadata={"source": "brd_v1.pdf", "page": 3}),
+                            Document(page_content=SHARED, metadata={"source": "brd_v2.pdf", "page": 4}),
+                            Document(page_content=OTHER, metadata={"source": "brd_v1.pdf", "page": 5})])
+    return flat_store(tmp_path / "flat", kept)
+
+
+def test_delete_sources_keeps_chunks_shared_with_surviving_sources(shared_store):
+    assert shared_store.delete_sources({"brd_v1.pdf"}) == 1
+    _, texts, metadatas = shared_store.metadata_records()
+    assert texts == [SHARED]
+    assert (metadatas[0]["source"], metadatas[0]["page"], metadatas[0]["duplicate_count"]) == ("brd_v2.pdf", 4, 0)
+    assert shared_store.delete_sources({"brd_v2.pdf"}) == 1
+    assert shared_store.count() == 0
+
+
+def test_upsert_links_new_chunks_to_stored_duplicates(shared_store):
+    # Re-ingesting brd_v1 after it was deleted: its shared chunk is linked to the rehomed copy, not re-added
+    shared_store.delete_sources({"brd_v1.pdf"})
+    new_chunks, linked = link_stored_duplicates(shared_store, [
+        Document(page_content=SHARED, metadata={"source": "brd_v1.pdf", "page": 3}),
+        Document(page_content=OTHER, metadata={"source": "brd_v1.pdf", "page": 5}),
+    ])
+    assert linked == 1
+    assert [chunk.page_content for chunk in new_chunks] == [OTHER]
+    _, texts, metadatas = shared_store.metadata_records()
+    assert texts == [SHARED]
+    assert chunk_sources(metadatas[0]) == [{"source": "brd_v2.pdf", "page": 4}, {"source": "brd_v1.pdf", "page": 3}]
+    assert metadatas[0]["duplicate_count"] == 1
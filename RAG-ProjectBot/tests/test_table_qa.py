@@ -0,0 +1,48 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+import pytest
+from langchain.schema import Document
+from table_store import TableStore, rows_to_frame
+from table_qa import answer_table_question
+
+SOURCE = "data/books/spec.pdf"
+MODULES = [["Module", "Owner", "Phase"],
+           ["Accounts", "Identity team", "1"],
+           ["Billing", "Finance team", "2"],
+           ["Reports", "Analytics team", "2"],
+           ["Notifications", "Platform team", "1"]]
+ROLES = [["Role", "Access Level"], ["Operator", "Admin"], ["Owner", "Admin"], ["Viewer", "Read-only"]]
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = TableStore(str(tmp_path / "tables"))
+    store.replace_source(SOURCE, [(rows_to_frame(MODULES), {"page": 4, "content_type": "docx_table", "table_index": 1}),
+                                  (rows_to_frame(ROLES), {"page": 5, "content_type": "docx_table", "table_index": 2})])
+    return store
+
+
+def results():
+    return [(Document(page_content="modules", metadata={"source": SOURCE, "page": 4}), 0.6)]
+
+
+@pytest.mark.parametrize("question", [
+    "Which module is responsible for password reset?",
+    "Which modules are in scope for phase 2?",
+    "What does the Billing module do?",
+])
+def test_lookup_questions_use_text_path(store, question):
+    assert answer_table_question(question, results(), store) is None
+
+
+def test_count_question_uses_table(store):
+    answer = answer_table_question("How many roles have admin access?", results(), store)
+    assert answer is not None and answer.operation == "count" and answer.value == 2
+
+
+def test_list_with_narrowing_filter_uses_table(store):
+    answer = answer_table_question("List all modules owned by the Finance team", results(), store)
+    assert answer is not None and list(answer.rows["Module"]) == ["Billing"]
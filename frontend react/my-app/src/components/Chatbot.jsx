@@ -89,7 +89,7 @@ export function Chatbot() {
       const response = await fetch('http://localhost:8000/query', {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ question: input.trim() })
+        body: JSON.stringify({ question: input.trim(), session_id: currentSessionId })
       })
 
       if (response.ok) {